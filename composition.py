@@ -0,0 +1,122 @@
+# composition.py - per-sequence base composition shared by filters and dG
+import numpy as np
+
+# Base codes used by the filters and the dG engine; U is an "other" base,
+# as in the DG37_VALUES lookups (U dimers add 0)
+BASE_CODES = {"A": 0, "C": 1, "G": 2, "T": 3}
+OTHER_CODE = 4
+NB_CODES = 5
+
+_CODE_LOOKUP = np.full(256, OTHER_CODE, dtype=np.uint8)
+for _base, _code in BASE_CODES.items():
+    _CODE_LOOKUP[ord(_base)] = _code
+    _CODE_LOOKUP[ord(_base.lower())] = _code
+
+# Letters counted by Bio.SeqUtils.gc_fraction(ambiguous="remove")
+_GC_LETTERS = np.frombuffer(b"GCSgcs", dtype=np.uint8)
+_AT_LETTERS = np.frombuffer(b"ATWUatwu", dtype=np.uint8)
+
+
+def encode_sequence(seq):
+    """Convert a nucleotide string to uint8 base codes (A=0 C=1 G=2 T=3 other=4)"""
+    return _CODE_LOOKUP[np.frombuffer(seq.encode("ascii"), dtype=np.uint8)]
+
+
+def _cumulative(flags):
+    """Prefix sums with a leading 0 so window counts are cum[end] - cum[start]"""
+    return np.concatenate(([0], np.cumsum(flags, dtype=np.int64)))
+
+
+def _run_lengths(is_base):
+    """Length of the homopolymer run ending at each position (0 if other base)"""
+    n = len(is_base)
+    idx = np.arange(1, n + 1)
+    # Position (1-based) of the last base that was NOT part of the run
+    last_break = np.maximum.accumulate(np.where(is_base, 0, idx))
+    return np.where(is_base, idx - last_break, 0)
+
+
+class SequenceComposition:
+    """
+    Cumulative A/C/G/T counts and homopolymer run lengths for one sequence
+    Any window's base counts, GC content and AAAA/CCCC stack flags are then
+    O(1) lookups, whatever the probe size. Window queries take 0-based start
+    positions and lengths (scalars or broadcastable NumPy arrays).
+    """
+
+    def __init__(self, seq, masked_bases=None, stack_size=4, spec_window=6):
+        self.sequence = seq.upper()
+        self.length = len(self.sequence)
+        self.codes = encode_sequence(self.sequence)
+
+        # Cumulative counts: one row per base code (A, C, G, T, other)
+        self.cum_counts = np.zeros((NB_CODES, self.length + 1), dtype=np.int64)
+        for code in range(NB_CODES):
+            self.cum_counts[code] = _cumulative(self.codes == code)
+
+        raw = np.frombuffer(self.sequence.encode("ascii"), dtype=np.uint8)
+        self.cum_gc = _cumulative(np.isin(raw, _GC_LETTERS))
+        self.cum_gc_length = self.cum_gc + _cumulative(np.isin(raw, _AT_LETTERS))
+
+        # Run lengths for AAAA/CCCC detection: a window [s, e) holds a stack
+        # iff some run of >= stack_size ends inside [s + stack_size - 1, e)
+        self.stack_size = stack_size
+        self.run_lengths = {}
+        self.cum_stack_ends = {}
+        for base in ("A", "C"):
+            runs = _run_lengths(self.codes == BASE_CODES[base])
+            self.run_lengths[base] = runs
+            self.cum_stack_ends[base] = _cumulative(runs >= stack_size)
+
+        # 6-nt windows with > 50% C, recorded at their start position
+        self.spec_window = spec_window
+        c_in_window = (
+            self.cum_counts[BASE_CODES["C"], spec_window:]
+            - self.cum_counts[BASE_CODES["C"], :-spec_window]
+        )
+        self.cum_c_rich = _cumulative(c_in_window / spec_window > 0.5)
+
+        # Optional dustmasker mask (True = masked base)
+        self.cum_masked = None
+        if masked_bases is not None:
+            self.cum_masked = _cumulative(masked_bases)
+
+        self._dimer_index = None
+
+    @property
+    def dimer_index(self):
+        """Index of each dinucleotide (5 * first + second) for dG table lookups"""
+        if self._dimer_index is None:
+            codes = self.codes.astype(np.intp)
+            self._dimer_index = codes[:-1] * NB_CODES + codes[1:]
+        return self._dimer_index
+
+    def count(self, base, starts, lengths):
+        """Number of `base` in each window"""
+        cum = self.cum_counts[BASE_CODES[base]]
+        return cum[starts + lengths] - cum[starts]
+
+    def gc_fraction(self, starts, lengths):
+        """GC content of each window, same convention as Bio gc_fraction"""
+        ends = starts + lengths
+        gc = self.cum_gc[ends] - self.cum_gc[starts]
+        gc_length = self.cum_gc_length[ends] - self.cum_gc_length[starts]
+        gc = np.asarray(gc, dtype=float)
+        return np.divide(gc, gc_length, out=np.zeros_like(gc), where=gc_length > 0)
+
+    def has_stack(self, base, starts, lengths):
+        """True where the window contains a run of stack_size x `base`"""
+        cum = self.cum_stack_ends[base]
+        return cum[starts + lengths] > cum[starts + self.stack_size - 1]
+
+    def has_c_rich_window(self, starts, lengths):
+        """True where the window contains a 6-nt sub-window with > 50% C"""
+        cum = self.cum_c_rich
+        return cum[starts + lengths - self.spec_window + 1] > cum[starts]
+
+    def masked_fraction(self, starts, lengths):
+        """Fraction of dustmasker-masked bases in each window (0 if no mask)"""
+        if self.cum_masked is None:
+            return np.zeros(np.broadcast(starts, lengths).shape)
+        cum = self.cum_masked
+        return (cum[starts + lengths] - cum[starts]) / lengths
@@ -1,4 +1,8 @@
 # config.py
+import hashlib
+import json
+from collections.abc import Mapping
+
 # Exact parameter values from R script
 DEFAULT_SETTINGS = {
     "score_min": 0.9,
@@ -11,10 +15,41 @@ DEFAULT_SETTINGS = {
     "min_probe_per_transcript": 0,
     "pnas_filter_option": [1, 2, 4],
     "salt_conc": 0.115,
+    # Thermodynamic model (see NN_PARAMETER_SETS) and hybridization temperature
+    "thermo_model": "sugimoto_rna_dna",
+    "temperature": 37.0,
     # SIMPLIFIED: Use fixed dG37 value
     "fixed_dg37_value": -32.0,  # Always use -32 like R script behavior
     # RESTORED: Optional dustmasker filter (matches R script's MaskedFilter)
     "use_dustmasker": True,  # Default FALSE (matching R script MaskedFilter <- FALSE)
+    # Filter-before-select: apply GC/PNAS/dustmasker flags to every candidate
+    # window before the greedy selection (False = R script behavior)
+    "filter_before_select": False,
+    # Optional Tm / hairpin / homodimer stage after process_probes_for_output
+    "structure_scoring": False,
+    "min_hairpin_dg": -3.0,  # kcal/mol, most stable hairpin allowed
+    "min_homodimer_dg": -9.0,  # kcal/mol, most stable self-dimer allowed
+    "oligo_conc": 2.5e-7,  # M, probe concentration for Tm
+    "structure_jobs": None,  # worker processes (None = all CPUs)
+    # Sequences longer than this are scored and selected this many start
+    # positions at a time (bounded memory, identical probes; None = never)
+    "long_sequence_chunk": 200000,
+    # Consolidated output: SQLite file receiving every input's probes
+    # (None = Probes_<name>/ folder with ALL/FILT TSVs next to each input)
+    "output_store": None,
+    # Worker processes designing input files in parallel over one shared
+    # (memory-mapped) copy of all sequences (1 = in-process, one at a time)
+    "design_jobs": 1,
+    # Records with more start positions are scored in pieces of this many
+    # positions on several workers (None = each record on one worker)
+    "schedule_split_length": 50000,
+    # Directory of already designed sequences, reused when the sequence,
+    # design settings and code are unchanged (None = always design)
+    "design_cache": None,
+    "design_cache_size": 256 * 2**20,  # bytes, least recently used evicted
+    # Prefix of the batch statistics tables written at the end of a run
+    # (None = summary printed only)
+    "stats_report": None,
 }
 
 # FLAP sequences - exact from R script
@@ -43,3 +78,188 @@ DG37_VALUES = {
     "TG": -1.0,
     "TT": -0.4,
 }
+
+# Nearest-neighbour parameter sets for thermodynamics.get_thermo_model
+# Dimers are read 5'->3' on the probe strand (T stands for U in RNA sets).
+# "dG37" sets only define free energies at 37C; "dH"/"dS" sets (kcal/mol,
+# cal/K/mol, at 1 M Na+) can be evaluated at any temperature.
+NN_PARAMETER_SETS = {
+    # Current Oligostan model (R script DG37 values + its salt correction)
+    "sugimoto_rna_dna": {
+        "dG37": DG37_VALUES,
+        "salt_model": "oligostan",
+    },
+    # SantaLucia (1998) unified DNA/DNA parameters
+    "santalucia_dna_dna": {
+        "dH": {
+            "AA": -7.9,
+            "TT": -7.9,
+            "AT": -7.2,
+            "TA": -7.2,
+            "CA": -8.5,
+            "TG": -8.5,
+            "GT": -8.4,
+            "AC": -8.4,
+            "CT": -7.8,
+            "AG": -7.8,
+            "GA": -8.2,
+            "TC": -8.2,
+            "CG": -10.6,
+            "GC": -9.8,
+            "GG": -8.0,
+            "CC": -8.0,
+        },
+        "dS": {
+            "AA": -22.2,
+            "TT": -22.2,
+            "AT": -20.4,
+            "TA": -21.3,
+            "CA": -22.7,
+            "TG": -22.7,
+            "GT": -22.4,
+            "AC": -22.4,
+            "CT": -21.0,
+            "AG": -21.0,
+            "GA": -22.2,
+            "TC": -22.2,
+            "CG": -27.2,
+            "GC": -24.4,
+            "GG": -19.9,
+            "CC": -19.9,
+        },
+        # Initiation, applied once per duplex end, by terminal base
+        "terminal_dH": {"A": 2.3, "T": 2.3, "C": 0.1, "G": 0.1},
+        "terminal_dS": {"A": 4.1, "T": 4.1, "C": -2.8, "G": -2.8},
+        "init_dH": 0.0,
+        "init_dS": 0.0,
+        "salt_model": "santalucia",
+    },
+    # Xia et al. (1998) RNA/RNA parameters
+    "xia_rna_rna": {
+        "dH": {
+            "AA": -6.82,
+            "TT": -6.82,
+            "AT": -9.38,
+            "TA": -7.69,
+            "CT": -10.48,
+            "AG": -10.48,
+            "CA": -10.44,
+            "TG": -10.44,
+            "GT": -11.40,
+            "AC": -11.40,
+            "GA": -12.44,
+            "TC": -12.44,
+            "CG": -10.64,
+            "GG": -13.39,
+            "CC": -13.39,
+            "GC": -14.88,
+        },
+        "dS": {
+            "AA": -19.0,
+            "TT": -19.0,
+            "AT": -26.7,
+            "TA": -20.5,
+            "CT": -27.1,
+            "AG": -27.1,
+            "CA": -26.9,
+            "TG": -26.9,
+            "GT": -29.5,
+            "AC": -29.5,
+            "GA": -32.5,
+            "TC": -32.5,
+            "CG": -26.7,
+            "GG": -32.7,
+            "CC": -32.7,
+            "GC": -36.9,
+        },
+        # Terminal A-U penalty per duplex end, plus one initiation term
+        "terminal_dH": {"A": 3.72, "T": 3.72, "C": 0.0, "G": 0.0},
+        "terminal_dS": {"A": 10.5, "T": 10.5, "C": 0.0, "G": 0.0},
+        "init_dH": 3.61,
+        "init_dS": -1.5,
+        "salt_model": "santalucia",
+    },
+}
+
+
+def _frozen(value):
+    """Hashable copy of a settings value (lists become tuples)"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_frozen(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _frozen(item)) for key, item in value.items()))
+    return value
+
+
+class DesignSettings(Mapping):
+    """
+    Immutable, hashable settings of one design run
+    Resolved once (DEFAULT_SETTINGS plus overrides) and passed to every
+    stage, so several configurations can run side by side in one process.
+    Reads like a dict (settings["min_gc"], settings.get(...), **settings) or
+    attributes (settings.min_gc); list values are stored as tuples. Equal
+    settings have equal hashes, so a DesignSettings can key in-memory caches
+    and group requests; fingerprint() is the stable key across processes.
+    """
+
+    __slots__ = ("_values", "_hash")
+
+    def __init__(self, values=None, **overrides):
+        merged = dict(DEFAULT_SETTINGS)
+        merged.update(values or {})
+        merged.update(overrides)
+        object.__setattr__(
+            self, "_values", {key: _frozen(value) for key, value in merged.items()}
+        )
+        object.__setattr__(self, "_hash", None)
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        raise AttributeError("DesignSettings are immutable (use replace())")
+
+    def __hash__(self):
+        if self._hash is None:
+            object.__setattr__(self, "_hash", hash(frozenset(self._values.items())))
+        return self._hash
+
+    def __eq__(self, other):
+        if isinstance(other, DesignSettings):
+            return self._values == other._values
+        return NotImplemented
+
+    def __reduce__(self):
+        return DesignSettings, (self._values,)
+
+    def __repr__(self):
+        return f"DesignSettings({self._values!r})"
+
+    def replace(self, **changes):
+        """Copy with some settings changed"""
+        return DesignSettings(self._values, **changes)
+
+    def fingerprint(self):
+        """SHA-256 of the settings, the same in every process"""
+        text = json.dumps(self._values, sort_keys=True, default=str)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+
+def design_settings(settings=None):
+    """DesignSettings of settings: a DesignSettings, or a dict of changes to
+    DEFAULT_SETTINGS (None = DEFAULT_SETTINGS as they are now)"""
+    if isinstance(settings, DesignSettings):
+        return settings
+    return DesignSettings(settings)
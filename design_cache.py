@@ -0,0 +1,253 @@
+# design_cache.py - on-disk cache of whole-sequence probe designs
+import functools
+import hashlib
+import json
+import os
+import pickle
+import shutil
+
+from config import DesignSettings
+
+# Cached designs live here unless another directory is given
+DESIGN_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "oligostan", "designs"
+)
+
+# Bump when the cached table layout changes
+DESIGN_CACHE_VERSION = 1
+
+# Settings that change the probe table of a sequence (the structure stage
+# runs after the cache and has its own cache)
+DESIGN_SETTINGS = [
+    "score_min",
+    "taille_sonde_min",
+    "taille_sonde_max",
+    "distance_min_inter_sonde",
+    "min_gc",
+    "max_gc",
+    "max_masked_percent",
+    "pnas_filter_option",
+    "salt_conc",
+    "thermo_model",
+    "temperature",
+    "fixed_dg37_value",
+    "use_dustmasker",
+    "filter_before_select",
+]
+
+# Modules whose source is part of the key, so a code change invalidates
+# every entry designed by the old code
+CODE_MODULES = [
+    "oligostan_core.py",
+    "thermodynamics.py",
+    "filters.py",
+    "composition.py",
+    "probe_batch.py",
+    "incremental_design.py",
+    "config.py",
+    "main.py",
+]
+
+# Marks DesignState entries among the cached designs
+_STATE_SUFFIX = ".state"
+
+# A full cache is evicted down to this fraction of max_bytes, so it is not
+# rescanned on every store
+EVICTION_TARGET = 0.9
+
+# Per-instance activity counters (see DesignCache.stats); incremental
+# counts designs redone from a previous DesignState of the same record
+CACHE_COUNTERS = ["hits", "misses", "stores", "evictions", "incremental"]
+
+
+@functools.lru_cache(maxsize=1)
+def code_version():
+    """SHA-256 of the design modules' source"""
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for module in CODE_MODULES:
+        with open(os.path.join(directory, module), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _settings_digest(settings):
+    """SHA-256 of the design settings and code the cached designs depend on"""
+    subset = {key: settings.get(key) for key in DESIGN_SETTINGS}
+    if subset["use_dustmasker"]:
+        # Without dustmasker every probe passes the masking filter
+        subset["dustmasker_found"] = shutil.which("dustmasker") is not None
+    text = json.dumps([DESIGN_CACHE_VERSION, code_version(), subset], sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+# DesignSettings are hashable: their digest is computed once per run
+_cached_settings_digest = functools.lru_cache(maxsize=32)(_settings_digest)
+
+
+def _key(settings, *parts):
+    if isinstance(settings, DesignSettings):
+        digest = _cached_settings_digest(settings)
+    else:
+        digest = _settings_digest(settings)
+    text = json.dumps([digest, *parts])
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def design_key(sequence, settings):
+    """Cache key of sequence (as designed, i.e. reverse complemented)"""
+    return _key(settings, hashlib.sha256(sequence.encode()).hexdigest())
+
+
+def state_key(record, settings):
+    """Cache key of the latest DesignState of a record (e.g. "gene:0")"""
+    return _key(settings, "state", record) + _STATE_SUFFIX
+
+
+class DesignCache:
+    """
+    Probe tables of already designed sequences, one pickle file per entry
+    Keyed by the sequence, the DESIGN_SETTINGS values and code_version(), so
+    a hit is the table a fresh design would produce (probe names are
+    rewritten for the requesting record). The latest DesignState of each
+    record is kept too, so an edited sequence is redesigned incrementally.
+    Least recently used entries are evicted once the directory exceeds
+    max_bytes: the directory is scanned when the cache is opened and on
+    eviction only, stores update a running total. Safe to share between
+    processes: entries are written atomically, and each eviction rescans
+    the entries of every process.
+    """
+
+    def __init__(self, cache_dir=DESIGN_CACHE_DIR, max_bytes=256 * 2**20):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.incremental = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._entries())
+
+    def counters(self):
+        return {name: getattr(self, name) for name in CACHE_COUNTERS}
+
+    def add_counters(self, counters):
+        """Add counters of another DesignCache (e.g. a worker process's)"""
+        for name in CACHE_COUNTERS:
+            setattr(self, name, getattr(self, name) + counters[name])
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".pkl")
+
+    def _read(self, key):
+        path = self._path(key)
+        with open(path, "rb") as f:
+            value = pickle.load(f)
+        os.utime(path)  # Recently used
+        return value
+
+    def _write(self, key, value):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            replaced_size = os.stat(path).st_size
+        except OSError:
+            replaced_size = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                size = f.tell()
+            os.replace(tmp_path, path)
+        except Exception as e:
+            # Caching is only an optimisation
+            print(f"Warning: could not write design cache entry: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        self._total_bytes += size - replaced_size
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+        return True
+
+    def lookup(self, sequence, settings, name):
+        """(True, probe table or None) on a hit, (False, None) on a miss"""
+        try:
+            table = self._read(design_key(sequence, settings))
+        except Exception:
+            # Missing, evicted meanwhile or unreadable: design again
+            self.misses += 1
+            return False, None
+
+        self.hits += 1
+        if table is not None:
+            table["ProbesNames"] = [f"{name} probe {i+1}" for i in range(len(table))]
+        return True, table
+
+    def store(self, sequence, settings, table):
+        if self._write(design_key(sequence, settings), table):
+            self.stores += 1
+
+    def lookup_state(self, record, settings):
+        """Latest incremental_design.DesignState of record, or None"""
+        try:
+            state = self._read(state_key(record, settings))
+        except Exception:
+            return None
+        self.incremental += 1
+        return state
+
+    def store_state(self, record, settings, state):
+        self._write(state_key(record, settings), state)
+
+    def _entries(self):
+        """[(last use, size, path)] of the cached designs"""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".pkl"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        """Remove least recently used entries once over max_bytes, down to
+        EVICTION_TARGET of it"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            target = self.max_bytes * EVICTION_TARGET
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                self.evictions += 1
+        # Resynchronised with the stores of other processes
+        self._total_bytes = total
+
+    def clear(self):
+        for _, _, path in self._entries():
+            os.remove(path)
+        self._total_bytes = 0
+
+    def stats(self):
+        entries = self._entries()
+        states = [path for _, _, path in entries if path.endswith(".state.pkl")]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "incremental": self.incremental,
+            "entries": len(entries) - len(states),
+            "states": len(states),
+            "bytes": sum(size for _, size, _ in entries),
+        }
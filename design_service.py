@@ -0,0 +1,443 @@
+# design_service.py - long-running local probe design service (HTTP or Unix socket)
+import argparse
+import collections
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from config import DEFAULT_SETTINGS, design_settings
+from design_cache import DESIGN_SETTINGS, DesignCache
+from main import build_output_tables, design_record, design_records, design_sequences
+from secondary_structure import add_secondary_structure_scores
+from sequence_utils import reverse_complement
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Micro-batching: a batch is closed at MAX_BATCH requests or MAX_WAIT_MS
+# after its first request arrived, whichever comes first
+MAX_BATCH = 32
+MAX_WAIT_MS = 5.0
+
+# Seconds an HTTP request waits for its designs before a 504 answer
+REQUEST_TIMEOUT = 600.0
+
+# Latency percentiles are computed over the last LATENCY_WINDOW requests
+LATENCY_WINDOW = 1000
+
+# Used to warm the thermodynamic tables and code paths at start-up
+_WARMUP_SEQUENCE = "ACGT" * 30
+
+# Settings a request may change for its own design
+REQUEST_SETTINGS = DESIGN_SETTINGS + [
+    "structure_scoring",
+    "min_hairpin_dg",
+    "min_homodimer_dg",
+    "oligo_conc",
+]
+
+
+class DesignRequestError(ValueError):
+    """Malformed design request (HTTP 400)"""
+
+
+def parse_design_request(payload):
+    """(name, sequence) of a {"name": ..., "sequence": ...} request (name None
+    if not given)"""
+    if not isinstance(payload, dict):
+        raise DesignRequestError("A design request must be a JSON object")
+    sequence = payload.get("sequence")
+    if not isinstance(sequence, str) or not sequence.strip():
+        raise DesignRequestError("'sequence' must be a non-empty string")
+    sequence = "".join(sequence.split())
+    if not sequence.isascii() or not sequence.isalpha():
+        raise DesignRequestError("'sequence' must only contain nucleotide letters")
+    name = payload.get("name")
+    if name is not None and not isinstance(name, str):
+        raise DesignRequestError("'name' must be a string")
+    return name, sequence
+
+
+def request_settings(payload, settings):
+    """DesignSettings of a request: settings with its "settings" changes"""
+    changes = payload.get("settings")
+    if changes is None:
+        return settings
+    if not isinstance(changes, dict):
+        raise DesignRequestError("'settings' must be a JSON object")
+    unknown = sorted(set(changes) - set(REQUEST_SETTINGS))
+    if unknown:
+        raise DesignRequestError(f"Unknown or fixed settings: {', '.join(unknown)}")
+    return settings.replace(**changes)
+
+
+class ServiceMetrics:
+    """Request and batch counters plus a rolling latency window (thread-safe)"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.latencies = collections.deque(maxlen=window)
+
+    def record_batch(self, size):
+        with self.lock:
+            self.batches += 1
+            self.batched_requests += size
+
+    def record_request(self, seconds, ok=True):
+        with self.lock:
+            self.requests += 1
+            if not ok:
+                self.errors += 1
+            self.latencies.append(seconds)
+
+    def snapshot(self):
+        with self.lock:
+            uptime = time.monotonic() - self.started
+            latencies = np.array(self.latencies) * 1000
+            snapshot = {
+                "uptime_s": round(uptime, 3),
+                "requests": self.requests,
+                "errors": self.errors,
+                "batches": self.batches,
+                "mean_batch_size": (
+                    self.batched_requests / self.batches if self.batches else 0.0
+                ),
+                "throughput_rps": self.requests / uptime if uptime > 0 else 0.0,
+            }
+        if len(latencies):
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            snapshot["latency_ms"] = {
+                "p50": float(p50),
+                "p95": float(p95),
+                "p99": float(p99),
+                "max": float(latencies.max()),
+            }
+        else:
+            snapshot["latency_ms"] = None
+        return snapshot
+
+
+def _records(df):
+    return [] if df is None else df.to_dict("records")
+
+
+class DesignService:
+    """
+    Warm probe designer serving concurrent requests in micro-batches
+    Requests are queued by submit() and designed by one worker thread, which
+    collects up to max_batch requests (waiting at most max_wait_ms after the
+    first) and designs them together: thermodynamic tables, imports and the
+    structure cache stay warm between batches, and the window scoring and
+    optional structure stage run once over the requests of the batch
+    sharing their settings. Each request gets the tables main.py would write
+    for a FASTA file holding its sequence, designed with settings (a
+    DesignSettings, default DEFAULT_SETTINGS) or its own. An optional
+    DesignCache answers repeated sequences without designing them, and
+    redesigns an edited sequence sent under the same name incrementally.
+    """
+
+    def __init__(
+        self, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, cache=None, settings=None
+    ):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.cache = cache
+        self.settings = design_settings(settings)
+        self.metrics = ServiceMetrics()
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self, warmup=True):
+        if self.alive():
+            # e.g. "with service.start():"
+            return self
+        if warmup:
+            seq_data = {"id": "warmup", "name": "warmup", "sequence": _WARMUP_SEQUENCE}
+            design_sequences([seq_data], settings=self.settings)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def alive(self):
+        """True while the worker thread designs queued requests"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def submit(self, name, sequence, settings=None):
+        """Future of the design of one sequence (given like a FASTA record)
+        name None: an anonymous "query", whose design state is not kept
+        settings (optional): DesignSettings of this request"""
+        future = Future()
+        settings = self.settings if settings is None else design_settings(settings)
+        self._queue.put(((time.monotonic(), name, sequence, settings), future))
+        return future
+
+    def design(self, name, sequence, timeout=None, settings=None):
+        return self.submit(name, sequence, settings).result(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                self._design_batch(batch)
+            except Exception as e:
+                # Never leave a request waiting: the worker serves the next batch
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _design_batch(self, batch):
+        self.metrics.record_batch(len(batch))
+
+        # Requests of the batch sharing their settings (which are hashable)
+        groups = {}
+        for i, ((_, _, _, settings), _) in enumerate(batch):
+            groups.setdefault(settings, []).append(i)
+
+        # Probe tables of each request, structure stage left for the batch
+        tables = [None] * len(batch)
+        for settings, members in groups.items():
+            group_records = []
+            indexes = []
+            for i in members:
+                _, name, sequence, _ = batch[i][0]
+                group_records.append(
+                    {
+                        "id": name or "query",
+                        "name": name or "query",
+                        "sequence": reverse_complement(sequence.upper()),
+                    }
+                )
+                # Anonymous requests would all share the "query" design state
+                indexes.append(None if name is None else 0)
+            try:
+                group_tables = design_records(
+                    group_records, indexes, self.cache, settings
+                )
+            except Exception:
+                # Designed one by one, so only the failing requests fail
+                group_tables = []
+                for i, seq_data, index in zip(members, group_records, indexes):
+                    try:
+                        group_tables.append(
+                            design_record(seq_data, index, self.cache, settings)
+                        )
+                    except Exception as e:
+                        batch[i][1].set_exception(e)
+                        group_tables.append(None)
+            for i, table in zip(members, group_tables):
+                tables[i] = table
+
+        records = [_records(df) for df in tables]
+
+        # Structure stage once per configuration
+        for settings, members in groups.items():
+            if not settings.get("structure_scoring", False):
+                continue
+            group_records = [record for i in members for record in records[i]]
+            futures = [batch[i][1] for i in members]
+            try:
+                # In this process: no process pool started for every batch
+                add_secondary_structure_scores(
+                    group_records, **dict(settings, structure_jobs=1)
+                )
+            except Exception as e:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+
+        for ((submitted, name, _, settings), future), table in zip(batch, records):
+            if not future.done():
+                try:
+                    all_df, filtered_df = build_output_tables(
+                        pd.DataFrame(table) if table else None, settings
+                    )
+                    future.set_result(
+                        {
+                            "name": name or "query",
+                            "nb_probes": len(table),
+                            "probes": _records(all_df),
+                            "filtered": _records(filtered_df),
+                        }
+                    )
+                except Exception as e:
+                    future.set_exception(e)
+            ok = future.exception() is None
+            self.metrics.record_request(time.monotonic() - submitted, ok)
+
+
+def _json_default(value):
+    # NumPy scalars left in the records
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class DesignRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET /health, GET /metrics, POST /design
+    /design takes one request object or a list of them (answered in order).
+    """
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, default=_json_default).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            if self.server.service.alive():
+                self._send_json(200, {"status": "ok"})
+            else:
+                self._send_json(503, {"status": "worker stopped"})
+        elif self.path == "/metrics":
+            service = self.server.service
+            metrics = service.metrics.snapshot()
+            if service.cache is not None:
+                metrics["design_cache"] = service.cache.stats()
+            self._send_json(200, metrics)
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/design":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"null")
+            many = isinstance(payload, list)
+            service = self.server.service
+            requests = [
+                (*parse_design_request(item), request_settings(item, service.settings))
+                for item in (payload if many else [payload])
+            ]
+        except (ValueError, DesignRequestError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        futures = [
+            service.submit(name, sequence, settings)
+            for name, sequence, settings in requests
+        ]
+        deadline = time.monotonic() + self.server.request_timeout
+        try:
+            results = [
+                future.result(max(deadline - time.monotonic(), 0)) for future in futures
+            ]
+        except FutureTimeoutError:
+            self._send_json(504, {"error": "design timed out"})
+            return
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+        self._send_json(200, results if many else results[0])
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            print(f"{self.command} {self.path}: {format % args}")
+
+
+class ThreadingUnixHTTPServer(
+    socketserver.ThreadingMixIn, socketserver.UnixStreamServer
+):
+    daemon_threads = True
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None):
+    """HTTP server for service on host:port, or on a Unix socket if given"""
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, DesignRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), DesignRequestHandler)
+    server.service = service
+    server.verbose = False
+    server.request_timeout = REQUEST_TIMEOUT
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve Oligostan probe design over local HTTP"
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--socket", help="listen on this Unix socket instead")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    parser.add_argument(
+        "--design-cache",
+        default=DEFAULT_SETTINGS["design_cache"],
+        help="reuse designs cached in this directory",
+    )
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    cache = None
+    if args.design_cache:
+        cache = DesignCache(args.design_cache, DEFAULT_SETTINGS["design_cache_size"])
+    service = DesignService(args.max_batch, args.max_wait_ms, cache).start()
+    server = make_server(service, args.host, args.port, args.socket)
+    server.verbose = args.verbose
+    where = args.socket or f"http://{args.host}:{server.server_address[1]}"
+    print(f"Oligostan design service listening on {where}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
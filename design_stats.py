@@ -0,0 +1,192 @@
+# design_stats.py - probe density, coverage and filter statistics of a batch
+import numpy as np
+
+from probe_batch import PNAS_FLAGS
+
+# Filter columns whose failures are counted (those present in the tables)
+FILTER_RULES = (
+    ["GCFilter"] + PNAS_FLAGS + ["PNASFilter", "MaskedFilter", "StructureFilter"]
+)
+
+# Histogram bin edges: gaps (nt) between consecutive FILT probes, and the
+# fraction of each transcript covered by FILT probes
+GAP_BINS = [0, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, np.inf]
+COVERAGE_BINS = [0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
+
+# Transcripts are named like DesignCache records: "<name>:<record index>"
+TRANSCRIPT_COLUMNS = [
+    "Transcript",
+    "Length",
+    "AllProbes",
+    "FiltProbes",
+    "ProbesPerKb",
+    "Coverage",
+    "MaxGap",
+]
+
+
+def covered_bases(starts, ends):
+    """Bases covered by the union of [start, end) intervals"""
+    if len(starts) == 0:
+        return 0
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order], ends[order]
+    # Part of each interval past every earlier interval's end
+    reach = np.maximum.accumulate(ends)
+    previous = np.concatenate(([starts[0]], reach[:-1]))
+    return int(np.maximum(ends - np.maximum(starts, previous), 0).sum())
+
+
+class DesignStats:
+    """
+    Streaming statistics of the probes designed in a batch
+    add_records() is called with each input's probe table while it is still
+    in memory, so nothing is read back from the outputs. Keeps one small row
+    per transcript and running totals; merge() adds the statistics gathered
+    by another process.
+    """
+
+    def __init__(self):
+        self.transcripts = []
+        self.nb_transcripts_without_probes = 0
+        self.total_bases = 0
+        self.covered_bases = 0
+        self.all_probes = 0
+        self.filt_probes = 0
+        self.rule_failures = {rule: 0 for rule in FILTER_RULES}
+        self.gap_counts = np.zeros(len(GAP_BINS) - 1, dtype=np.int64)
+        self.coverage_counts = np.zeros(len(COVERAGE_BINS) - 1, dtype=np.int64)
+
+    def add_records(self, sequences, nb_probes, table, passed):
+        """
+        Add the records of one input
+        sequences: read_fasta_sequences records; nb_probes: probes of each
+        record, whose rows follow each other in table (None if no probes);
+        passed: FILT mask of table's rows (see filters.output_filter_mask)
+        """
+        passed = np.asarray(passed, dtype=bool)
+        first = 0
+        for index, (seq_data, count) in enumerate(zip(sequences, nb_probes)):
+            rows = slice(first, first + count)
+            first += count
+            if count:
+                record_table = table.iloc[rows]
+                record_passed = np.asarray(passed[rows], dtype=bool)
+            else:
+                record_table, record_passed = None, np.zeros(0, dtype=bool)
+            self._add_record(
+                f"{seq_data['name']}:{index}",
+                len(seq_data["sequence"]),
+                record_table,
+                record_passed,
+            )
+
+    def _add_record(self, transcript, length, table, passed):
+        nb_all = 0 if table is None else len(table)
+        nb_filt = int(passed.sum())
+        covered, max_gap = 0, 0
+        if nb_all:
+            for rule in FILTER_RULES:
+                if rule in table.columns:
+                    self.rule_failures[rule] += int((table[rule] != 1).sum())
+
+            # theEndPos - theStartPos = ProbeSize: half-open [start, end)
+            starts = table["theStartPos"].to_numpy()[passed]
+            ends = table["theEndPos"].to_numpy()[passed]
+            covered = covered_bases(starts, ends)
+            if nb_filt > 1:
+                order = np.argsort(starts, kind="stable")
+                gaps = np.maximum(starts[order][1:] - ends[order][:-1], 0)
+                self.gap_counts += np.histogram(gaps, bins=GAP_BINS)[0]
+                max_gap = int(gaps.max())
+        if nb_filt == 0:
+            self.nb_transcripts_without_probes += 1
+
+        coverage = covered / length if length else 0.0
+        self.coverage_counts += np.histogram([coverage], bins=COVERAGE_BINS)[0]
+        self.total_bases += length
+        self.covered_bases += covered
+        self.all_probes += nb_all
+        self.filt_probes += nb_filt
+        self.transcripts.append(
+            [
+                transcript,
+                length,
+                nb_all,
+                nb_filt,
+                1000 * nb_filt / length if length else 0.0,
+                coverage,
+                max_gap,
+            ]
+        )
+
+    def merge(self, other):
+        """Add the statistics of another DesignStats (e.g. a worker's)"""
+        self.transcripts.extend(other.transcripts)
+        self.nb_transcripts_without_probes += other.nb_transcripts_without_probes
+        self.total_bases += other.total_bases
+        self.covered_bases += other.covered_bases
+        self.all_probes += other.all_probes
+        self.filt_probes += other.filt_probes
+        for rule in FILTER_RULES:
+            self.rule_failures[rule] += other.rule_failures[rule]
+        self.gap_counts += other.gap_counts
+        self.coverage_counts += other.coverage_counts
+
+    def summary(self):
+        """Batch-level totals and pass rates"""
+        nb_transcripts = len(self.transcripts)
+        summary = {
+            "transcripts": nb_transcripts,
+            "transcripts_without_probes": self.nb_transcripts_without_probes,
+            "bases": self.total_bases,
+            "all_probes": self.all_probes,
+            "filt_probes": self.filt_probes,
+            "pass_rate": self.filt_probes / self.all_probes if self.all_probes else 0.0,
+            "probes_per_kb": (
+                1000 * self.filt_probes / self.total_bases if self.total_bases else 0.0
+            ),
+            "coverage": (
+                self.covered_bases / self.total_bases if self.total_bases else 0.0
+            ),
+        }
+        for rule in FILTER_RULES:
+            summary[f"failed_{rule}"] = self.rule_failures[rule]
+        return summary
+
+    def transcript_table(self):
+        import pandas as pd
+
+        return pd.DataFrame(self.transcripts, columns=TRANSCRIPT_COLUMNS)
+
+    def histograms(self):
+        """Histogram data: (histogram, bin start, bin end, count) rows"""
+        import pandas as pd
+
+        rows = [
+            ["gap", GAP_BINS[i], GAP_BINS[i + 1], int(count)]
+            for i, count in enumerate(self.gap_counts)
+        ]
+        rows += [
+            ["coverage", COVERAGE_BINS[i], COVERAGE_BINS[i + 1], int(count)]
+            for i, count in enumerate(self.coverage_counts)
+        ]
+        return pd.DataFrame(rows, columns=["Histogram", "BinStart", "BinEnd", "Count"])
+
+    def write(self, prefix):
+        """<prefix>_summary/_transcripts/_histograms.txt, returns their paths"""
+        import pandas as pd
+
+        paths = [
+            f"{prefix}_{part}.txt" for part in ("summary", "transcripts", "histograms")
+        ]
+        summary = self.summary()
+        # object column: counts stay integers next to the rates
+        summary = pd.DataFrame(
+            {"Stat": list(summary), "Value": pd.Series(summary.values(), dtype=object)}
+        )
+        for path, table in zip(
+            paths, (summary, self.transcript_table(), self.histograms())
+        ):
+            table.to_csv(path, sep="\t", index=False)
+        return paths
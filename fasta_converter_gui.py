@@ -1,10 +1,12 @@
 # fasta_converter_gui.py
 
-import pandas as pd
 import os
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 
+from fasta_export import list_table_columns, convert_table_to_fasta
+from gui_tasks import BackgroundTask
+
 
 class FastaConverterGUI:
     def __init__(self, root):
@@ -18,8 +20,8 @@ class FastaConverterGUI:
         self.header_column = tk.StringVar()
         self.sequence_column = tk.StringVar()
         self.output_file = tk.StringVar()
-        self.df = None
         self.columns = []
+        self.task = None
 
         self.create_widgets()
 
@@ -94,14 +96,25 @@ class FastaConverterGUI:
             row=0, column=1
         )
 
-        # Convert button
+        # Convert and cancel buttons
+        button_frame = ttk.Frame(main_frame)
+        button_frame.grid(row=7, column=0, columnspan=2, pady=20)
+
         self.convert_btn = ttk.Button(
-            main_frame,
+            button_frame,
             text="Convert to FASTA",
             command=self.convert_to_fasta,
             state="disabled",
         )
-        self.convert_btn.grid(row=7, column=0, columnspan=2, pady=20)
+        self.convert_btn.pack(side=tk.LEFT, padx=(0, 5))
+
+        self.cancel_btn = ttk.Button(
+            button_frame,
+            text="Cancel",
+            command=self.cancel_conversion,
+            state="disabled",
+        )
+        self.cancel_btn.pack(side=tk.LEFT)
 
         # Progress bar
         self.progress = ttk.Progressbar(main_frame, mode="indeterminate")
@@ -138,6 +151,7 @@ class FastaConverterGUI:
             filetypes=[
                 ("CSV files", "*.csv"),
                 ("Excel files", "*.xlsx"),
+                ("Tab-separated files", "*.tsv *.txt"),
                 ("All files", "*.*"),
             ],
         )
@@ -158,15 +172,8 @@ class FastaConverterGUI:
         try:
             filename = self.input_file.get()
 
-            # Read file to get column names
-            if filename.endswith(".xlsx"):
-                self.df = pd.read_excel(filename)
-            elif filename.endswith(".csv"):
-                self.df = pd.read_csv(filename)
-            else:
-                raise ValueError("File must be .xlsx or .csv")
-
-            self.columns = list(self.df.columns)
+            # Read only the header row to get column names
+            self.columns = list_table_columns(filename)
 
             # Update comboboxes
             self.header_combo["values"] = self.columns
@@ -189,9 +196,7 @@ class FastaConverterGUI:
                     self.sequence_column.set(col)
                     break
 
-            self.log_message(
-                f"Loaded {len(self.df)} rows with columns: {', '.join(self.columns)}"
-            )
+            self.log_message(f"Found columns: {', '.join(self.columns)}")
             self.check_ready_to_convert()
 
         except Exception as e:
@@ -228,52 +233,72 @@ class FastaConverterGUI:
             self.convert_btn.config(state="disabled")
 
     def convert_to_fasta(self):
-        """Convert the selected data to FASTA format"""
-        try:
-            self.progress.start()
-            self.convert_btn.config(state="disabled")
-
-            # Get selected columns
-            header_col = self.header_column.get()
-            seq_col = self.sequence_column.get()
-            output_path = self.output_file.get()
-
-            # Validate columns exist
-            if header_col not in self.df.columns:
-                raise ValueError(f"Header column '{header_col}' not found in file")
-            if seq_col not in self.df.columns:
-                raise ValueError(f"Sequence column '{seq_col}' not found in file")
-
-            self.log_message(f"Converting {len(self.df)} sequences...")
-            self.log_message(f"Header column: {header_col}")
-            self.log_message(f"Sequence column: {seq_col}")
-
-            # Write FASTA file
-            with open(output_path, "w") as fasta_file:
-                for index, row in self.df.iterrows():
-                    header = str(row[header_col]).strip()
-                    sequence = str(row[seq_col]).strip()
-
-                    # Skip empty rows
-                    if pd.isna(row[header_col]) or pd.isna(row[seq_col]):
-                        continue
-
-                    fasta_file.write(f">{header}\n")
-                    fasta_file.write(f"{sequence}\n")
-
-            self.progress.stop()
-            self.convert_btn.config(state="normal")
-
-            success_msg = f"Success! FASTA file saved as: {output_path}"
-            self.log_message(success_msg)
-            messagebox.showinfo("Conversion Complete", success_msg)
+        """Convert the selected data to FASTA format on a worker thread"""
+        # Read the Tk variables here, the worker must not touch widgets
+        input_path = self.input_file.get()
+        header_col = self.header_column.get()
+        seq_col = self.sequence_column.get()
+        output_path = self.output_file.get()
+
+        self.log_message(f"Header column: {header_col}")
+        self.log_message(f"Sequence column: {seq_col}")
+
+        self.progress.start()
+        self.convert_btn.config(state="disabled")
+        self.cancel_btn.config(state="normal")
+
+        self.task = BackgroundTask(
+            self.root,
+            self.conversion_worker,
+            args=(input_path, header_col, seq_col, output_path),
+            on_done=lambda nb_records: self.conversion_done(nb_records, output_path),
+            on_error=self.conversion_failed,
+            on_cancel=lambda: self.conversion_cancelled(output_path),
+            on_log=self.log_message,
+        ).start()
+
+    def conversion_worker(self, task, input_path, header_col, seq_col, output_path):
+        """Runs on the worker thread; reports through task only"""
+
+        def report(nb_records, nb_rows):
+            task.log(f"Read {nb_rows} rows, wrote {nb_records} sequences")
+            task.check_cancelled()
+
+        return convert_table_to_fasta(
+            input_path, header_col, seq_col, output_path, progress_callback=report
+        )
 
-        except Exception as e:
-            self.progress.stop()
-            self.convert_btn.config(state="normal")
-            error_msg = f"Error during conversion: {str(e)}"
-            self.log_message(error_msg)
-            messagebox.showerror("Conversion Error", error_msg)
+    def cancel_conversion(self):
+        if self.task is not None:
+            self.log_message("Cancelling...")
+            self.task.cancel()
+
+    def finish_conversion(self):
+        self.task = None
+        self.progress.stop()
+        self.cancel_btn.config(state="disabled")
+        self.convert_btn.config(state="normal")
+
+    def conversion_done(self, nb_records, output_path):
+        self.finish_conversion()
+        self.log_message(f"Converted {nb_records} sequences")
+
+        success_msg = f"Success! FASTA file saved as: {output_path}"
+        self.log_message(success_msg)
+        messagebox.showinfo("Conversion Complete", success_msg)
+
+    def conversion_failed(self, error):
+        self.finish_conversion()
+        error_msg = f"Error during conversion: {str(error)}"
+        self.log_message(error_msg)
+        messagebox.showerror("Conversion Error", error_msg)
+
+    def conversion_cancelled(self, output_path):
+        self.finish_conversion()
+        # Do not leave a truncated FASTA file behind
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        self.log_message("Conversion cancelled, partial output removed")
 
 
 def main():
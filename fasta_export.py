@@ -0,0 +1,109 @@
+# fasta_export.py - table (CSV/TSV/Excel) to FASTA conversion without the GUI
+import argparse
+import os
+import pandas as pd
+
+DEFAULT_CHUNKSIZE = 200000
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+def _table_format(file_path):
+    """Return ("excel", None) or ("text", separator) from the file extension"""
+    lower = file_path.lower()
+    if lower.endswith(".xlsx"):
+        return "excel", None
+    if lower.endswith(".csv"):
+        return "text", ","
+    if lower.endswith((".txt", ".tsv")):
+        # Oligostan outputs (Probes_*_ALL/FILT.txt) are tab separated
+        return "text", "\t"
+    raise ValueError("File must be .xlsx, .csv, .tsv or .txt")
+
+
+def list_table_columns(file_path):
+    """Column names of a table, reading only its header row"""
+    kind, sep = _table_format(file_path)
+    if kind == "excel":
+        return list(pd.read_excel(file_path, nrows=0).columns)
+    return list(pd.read_csv(file_path, sep=sep, nrows=0).columns)
+
+
+def iter_table_chunks(file_path, columns, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield DataFrames holding only `columns`, read as strings, chunk by chunk"""
+    columns = list(dict.fromkeys(columns))
+    kind, sep = _table_format(file_path)
+    dtypes = {col: str for col in columns}
+
+    if kind == "excel":
+        # Excel cannot be streamed by pandas; at least skip unused columns
+        yield pd.read_excel(file_path, usecols=columns, dtype=dtypes)
+        return
+
+    yield from pd.read_csv(
+        file_path, sep=sep, usecols=columns, dtype=dtypes, chunksize=chunksize
+    )
+
+
+def fasta_text(headers, sequences):
+    """FASTA records for two aligned string Series, built column-wise"""
+    keep = headers.notna() & sequences.notna()
+    records = ">" + headers[keep].str.strip() + "\n" + sequences[keep].str.strip()
+    if len(records) == 0:
+        return "", 0
+    return records.str.cat(sep="\n") + "\n", len(records)
+
+
+def convert_table_to_fasta(
+    file_path,
+    header_col,
+    seq_col,
+    output_path,
+    chunksize=DEFAULT_CHUNKSIZE,
+    progress_callback=None,
+):
+    """
+    Write one FASTA record per row (rows missing either value are skipped)
+    Only the two needed columns are read, chunk by chunk, and each chunk is
+    written with a single buffered write. progress_callback(records_written,
+    rows_read) is called after every chunk. Returns the number of records.
+    """
+    columns = list_table_columns(file_path)
+    for role, col in (("Header", header_col), ("Sequence", seq_col)):
+        if col not in columns:
+            raise ValueError(f"{role} column '{col}' not found in file")
+
+    nb_records = 0
+    nb_rows = 0
+    with open(output_path, "w", buffering=WRITE_BUFFER_SIZE) as fasta_file:
+        for chunk in iter_table_chunks(file_path, [header_col, seq_col], chunksize):
+            text, nb_chunk_records = fasta_text(chunk[header_col], chunk[seq_col])
+            fasta_file.write(text)
+            nb_records += nb_chunk_records
+            nb_rows += len(chunk)
+
+            if progress_callback is not None:
+                progress_callback(nb_records, nb_rows)
+
+    return nb_records
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert a CSV/TSV/Excel table to FASTA"
+    )
+    parser.add_argument("input", help=".csv, .tsv/.txt or .xlsx table")
+    parser.add_argument("--header", required=True, help="FASTA header column")
+    parser.add_argument("--sequence", required=True, help="sequence column")
+    parser.add_argument("-o", "--output", help="output FASTA (default: input.fasta)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args()
+
+    output_path = args.output or os.path.splitext(args.input)[0] + ".fasta"
+    nb_records = convert_table_to_fasta(
+        args.input, args.header, args.sequence, output_path, args.chunksize
+    )
+    print(f"Wrote {nb_records} sequences to: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
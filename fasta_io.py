@@ -0,0 +1,443 @@
+# fasta_io.py - compressed FASTA streams and indexed record access
+import bisect
+import contextlib
+import io
+import os
+import shutil
+import struct
+import subprocess
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+FASTA_EXTENSIONS = [".fa", ".fasta", ".fas", ".fna"]
+COMPRESSION_EXTENSIONS = [".gz", ".bgz", ".bz2", ".zst"]
+
+# File dialog pattern of plain and compressed FASTA files
+FASTA_FILE_PATTERNS = " ".join(
+    f"*{extension}{compression}"
+    for extension in FASTA_EXTENSIONS
+    for compression in [""] + COMPRESSION_EXTENSIONS
+)
+
+# Threads decoding bgzip blocks (and pigz/lbzip2 threads)
+DECOMPRESS_THREADS = os.cpu_count() or 1
+
+# bgzip blocks inflated per task: 64 blocks are at most 4 MB of sequence
+BGZF_BATCH = 64
+
+# Multi-threaded decompressors used when installed: (command, thread option)
+GZIP_COMMANDS = [("pigz", "-p")]
+BZIP2_COMMANDS = [("lbzip2", "-n"), ("pbzip2", "-p")]
+ZSTD_COMMANDS = [("zstd", None)]
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_BZIP2_MAGIC = b"BZh"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_BGZF_HEADER = struct.Struct("<4BI2BH")  # ID1 ID2 CM FLG MTIME XFL OS XLEN
+
+
+def fasta_base_name(path):
+    """File name without its compression and FASTA extensions"""
+    name = os.path.basename(path)
+    root, extension = os.path.splitext(name)
+    if extension.lower() in COMPRESSION_EXTENSIONS:
+        name = root
+    return os.path.splitext(name)[0]
+
+
+def compression_of(path):
+    """None, "bgzf", "gzip", "bz2" or "zstd", from the file's magic bytes"""
+    with open(path, "rb") as f:
+        head = f.read(18)
+    if head.startswith(_GZIP_MAGIC):
+        # bgzip: gzip member with a "BC" extra subfield holding the block size
+        if len(head) == 18 and head[3] & 4 and head[12:14] == b"BC":
+            return "bgzf"
+        return "gzip"
+    if head.startswith(_BZIP2_MAGIC):
+        return "bz2"
+    if head.startswith(_ZSTD_MAGIC):
+        return "zstd"
+    return None
+
+
+@contextlib.contextmanager
+def open_fasta(path, threads=None):
+    """
+    Text handle of a plain, gzip, bgzip, bzip2 or zstd FASTA file
+    The file is decompressed while it is read, never to disk. bgzip blocks
+    are inflated on threads threads (default DECOMPRESS_THREADS); other
+    gzip, bzip2 and zstd files go through pigz, lbzip2/pbzip2 or zstd when
+    installed, decompressing alongside the parser, else through Python's
+    modules (zstd needs the zstandard package or the zstd command).
+    """
+    threads = threads or DECOMPRESS_THREADS
+    compression = compression_of(path)
+    if compression is None:
+        with open(path) as handle:
+            yield handle
+        return
+
+    if compression == "bgzf":
+        raw = io.BufferedReader(BgzfReader(path, threads), 1 << 20)
+        with io.TextIOWrapper(raw) as handle:
+            yield handle
+        return
+
+    commands = {"gzip": GZIP_COMMANDS, "bz2": BZIP2_COMMANDS, "zstd": ZSTD_COMMANDS}
+    for command, thread_option in commands[compression]:
+        if shutil.which(command):
+            arguments = [command, "-dc"]
+            if thread_option is not None:
+                arguments += [thread_option, str(threads)]
+            with command_reader(arguments + [path]) as handle:
+                yield handle
+            return
+
+    if compression == "gzip":
+        import gzip
+
+        with gzip.open(path, "rt") as handle:
+            yield handle
+    elif compression == "bz2":
+        import bz2
+
+        with bz2.open(path, "rt") as handle:
+            yield handle
+    else:
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError(
+                f"{path} is zstd-compressed: install the zstandard package "
+                "or the zstd command to read it"
+            ) from None
+        with open(path, "rb") as f:
+            stream = zstandard.ZstdDecompressor().stream_reader(f)
+            with io.TextIOWrapper(stream) as handle:
+                yield handle
+
+
+@contextlib.contextmanager
+def command_reader(arguments):
+    """Text handle of a decompression command's output (e.g. pigz -dc)"""
+    process = subprocess.Popen(
+        arguments, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    try:
+        with io.TextIOWrapper(process.stdout) as handle:
+            yield handle
+    except BaseException:
+        # Reading stopped early: the command's output is no longer needed
+        process.kill()
+        process.wait()
+        raise
+    finally:
+        error = process.stderr.read().decode(errors="replace").strip()
+        process.stderr.close()
+    if process.wait() != 0:
+        raise OSError(f"{arguments[0]} failed: {error}")
+
+
+def _read_bgzf_block(f):
+    """(compressed size, deflate data, CRC32, size) of the next block, or None"""
+    header = f.read(_BGZF_HEADER.size)
+    if not header:
+        return None
+    id1, id2, _, flags, _, _, _, extra_size = _BGZF_HEADER.unpack(header)
+    if (id1, id2) != (0x1F, 0x8B) or not flags & 4:
+        raise ValueError("Not a bgzip block (compress with bgzip)")
+    extra = f.read(extra_size)
+    block_size = None
+    position = 0
+    while position + 4 <= len(extra):
+        subfield, length = extra[position : position + 2], extra[position + 2]
+        length |= extra[position + 3] << 8
+        if subfield == b"BC" and length == 2:
+            block_size = struct.unpack_from("<H", extra, position + 4)[0] + 1
+        position += 4 + length
+    if block_size is None:
+        raise ValueError("Not a bgzip block (compress with bgzip)")
+    data = f.read(block_size - extra_size - 20)
+    crc, size = struct.unpack("<2I", f.read(8))
+    return block_size, data, crc, size
+
+
+def _inflate_blocks(blocks):
+    parts = []
+    for data, crc, size in blocks:
+        part = zlib.decompress(data, -15)
+        if len(part) != size or zlib.crc32(part) != crc:
+            raise ValueError("Corrupted bgzip block")
+        parts.append(part)
+    return b"".join(parts)
+
+
+class BgzfReader(io.RawIOBase):
+    """
+    Decompressed bytes of a bgzip file, its blocks inflated in parallel
+    bgzip blocks are independent deflate streams, so batches of BGZF_BATCH
+    blocks are inflated on a thread pool (zlib releases the GIL) while the
+    file is read ahead, pigz-style, and returned in order.
+    """
+
+    def __init__(self, path, threads=DECOMPRESS_THREADS):
+        self._file = open(path, "rb")
+        self._pool = ThreadPoolExecutor(max(threads, 1))
+        self._pending = deque()
+        self._ahead = 2 * max(threads, 1)
+        self._buffer = memoryview(b"")
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def _read_batch(self):
+        blocks = []
+        while len(blocks) < BGZF_BATCH:
+            block = _read_bgzf_block(self._file)
+            if block is None:
+                self._eof = True
+                break
+            blocks.append(block[1:])
+        return blocks
+
+    def readinto(self, buffer):
+        while not len(self._buffer):
+            while not self._eof and len(self._pending) < self._ahead:
+                blocks = self._read_batch()
+                if blocks:
+                    self._pending.append(self._pool.submit(_inflate_blocks, blocks))
+            if not self._pending:
+                return 0
+            self._buffer = memoryview(self._pending.popleft().result())
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            for future in self._pending:
+                future.cancel()
+            self._pool.shutdown()
+            self._file.close()
+        super().close()
+
+
+def bgzf_block_offsets(path):
+    """[(compressed offset, uncompressed offset)] of every bgzip block
+    Read from the block headers and trailers: nothing is inflated."""
+    offsets = []
+    compressed = uncompressed = 0
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(_BGZF_HEADER.size)
+            if not header:
+                break
+            extra_size = _BGZF_HEADER.unpack(header)[-1]
+            extra = f.read(extra_size)
+            position = extra.find(b"BC\x02\x00")
+            if position < 0:
+                raise ValueError(f"{path} is not bgzip-compressed")
+            block_size = struct.unpack_from("<H", extra, position + 4)[0] + 1
+            f.seek(compressed + block_size - 4)
+            size = struct.unpack("<I", f.read(4))[0]
+            offsets.append((compressed, uncompressed))
+            compressed += block_size
+            uncompressed += size
+    return offsets
+
+
+def _write_gzi(offsets, path):
+    """bgzip -i index (the first block, at 0/0, is implicit)"""
+    with open(path, "wb") as f:
+        f.write(struct.pack("<Q", len(offsets) - 1))
+        for compressed, uncompressed in offsets[1:]:
+            f.write(struct.pack("<2Q", compressed, uncompressed))
+
+
+def _read_gzi(path):
+    with open(path, "rb") as f:
+        (count,) = struct.unpack("<Q", f.read(8))
+        values = struct.unpack(f"<{2 * count}Q", f.read(16 * count))
+    return [(0, 0)] + list(zip(values[::2], values[1::2]))
+
+
+def _binary_lines(path, compression):
+    """(offset, line) of the decompressed file, line with its line ending"""
+    if compression == "bgzf":
+        stream = io.BufferedReader(BgzfReader(path), 1 << 20)
+    else:
+        stream = open(path, "rb")
+    with stream:
+        offset = 0
+        for line in stream:
+            yield offset, line
+            offset += len(line)
+
+
+def scan_fasta_index(path, compression=None):
+    """
+    samtools faidx rows (name, length, offset, line bases, line width)
+    Every line of a record but its last must have the same length.
+    """
+    rows = []
+    record = None
+    last_line = False
+    for offset, line in _binary_lines(path, compression):
+        if line.startswith(b">"):
+            if record is not None:
+                rows.append(tuple(record))
+            name = line[1:].split(None, 1)[0].decode() if line[1:].strip() else ""
+            record = [name, 0, offset + len(line), 0, 0]
+            last_line = False
+            continue
+        if record is None:
+            continue
+        bases = len(line.rstrip(b"\r\n"))
+        if record[3] == 0:
+            record[3], record[4] = bases, len(line)
+        elif (last_line and bases) or bases > record[3]:
+            raise ValueError(
+                f"{path}: lines of record {record[0]} differ in length, "
+                "the index needs equal line lengths"
+            )
+        elif bases != record[3] or len(line) != record[4]:
+            last_line = True
+        record[1] += bases
+    if record is not None:
+        rows.append(tuple(record))
+    return rows
+
+
+def index_is_current(path):
+    """True if the .fai (and .gzi of bgzip files) of path are not older than it"""
+    index_paths = [path + ".fai"]
+    if compression_of(path) == "bgzf":
+        index_paths.append(path + ".gzi")
+    modified = os.stat(path).st_mtime_ns
+    return all(
+        os.path.exists(index_path) and os.stat(index_path).st_mtime_ns >= modified
+        for index_path in index_paths
+    )
+
+
+class FastaIndex:
+    """
+    Random access to the records of a plain or bgzip FASTA file
+    Uses the samtools faidx index (<file>.fai, plus bgzip's <file>.gzi for
+    compressed files), built and saved next to the file if missing or older
+    than the file (kept in memory if the directory is read-only). fetch()
+    reads only the blocks holding a record, so single-record requests do not
+    scan the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.compression = compression_of(path)
+        if self.compression not in (None, "bgzf"):
+            raise ValueError(
+                f"{path}: indexed access needs a plain or bgzip-compressed FASTA "
+                f"file, not {self.compression}"
+            )
+        self.rows = self._load_fai()
+        self.names = {row[0]: i for i, row in enumerate(self.rows)}
+        self.block_offsets = None
+        if self.compression == "bgzf":
+            self.block_offsets = self._load_gzi()
+            self._uncompressed = [block[1] for block in self.block_offsets]
+
+    def _load_fai(self):
+        fai_path = self.path + ".fai"
+        if os.path.exists(fai_path) and not self._stale(fai_path):
+            with open(fai_path) as f:
+                return [
+                    (name, int(length), int(offset), int(bases), int(width))
+                    for name, length, offset, bases, width in (
+                        line.rstrip("\n").split("\t")[:5] for line in f if line.strip()
+                    )
+                ]
+        rows = scan_fasta_index(self.path, self.compression)
+        with contextlib.suppress(OSError):
+            with open(fai_path, "w") as f:
+                f.writelines("\t".join(map(str, row)) + "\n" for row in rows)
+        return rows
+
+    def _load_gzi(self):
+        gzi_path = self.path + ".gzi"
+        if os.path.exists(gzi_path) and not self._stale(gzi_path):
+            return _read_gzi(gzi_path)
+        offsets = bgzf_block_offsets(self.path)
+        with contextlib.suppress(OSError):
+            _write_gzi(offsets, gzi_path)
+        return offsets
+
+    def _stale(self, index_path):
+        # Indexed before the file was last modified: offsets may have moved
+        return os.stat(index_path).st_mtime_ns < os.stat(self.path).st_mtime_ns
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _read(self, offset, size):
+        """size decompressed bytes from offset"""
+        if self.compression is None:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                return f.read(size)
+
+        block = bisect.bisect_right(self._uncompressed, offset) - 1
+        compressed, uncompressed = self.block_offsets[block]
+        parts = []
+        skip = offset - uncompressed
+        with open(self.path, "rb") as f:
+            f.seek(compressed)
+            while size > 0:
+                found = _read_bgzf_block(f)
+                if found is None:
+                    break
+                part = _inflate_blocks([found[1:]])[skip:]
+                skip = 0
+                parts.append(part[:size])
+                size -= len(part)
+        return b"".join(parts)
+
+    def fetch(self, record):
+        """Sequence of a record, by name or by number in the file"""
+        if isinstance(record, str):
+            record = self.names[record]
+        name, length, offset, bases, width = self.rows[record]
+        if not length:
+            return ""
+        # Bases plus the line ends between them
+        size = length + (length - 1) // bases * (width - bases)
+        sequence = self._read(offset, size).decode(errors="replace")
+        sequence = sequence.replace("\n", "").replace("\r", "")
+        if len(sequence) != length or ">" in sequence:
+            raise ValueError(
+                f"{self.path}: record {name} does not match its index, "
+                f"rebuild it (python fasta_io.py {self.path})"
+            )
+        return sequence
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Index FASTA files (plain or bgzip) for record access"
+    )
+    parser.add_argument("files", nargs="+", help="FASTA files to index")
+    args = parser.parse_args()
+    for path in args.files:
+        for index_path in (path + ".fai", path + ".gzi"):
+            if os.path.exists(index_path):
+                os.remove(index_path)
+        index = FastaIndex(path)
+        print(f"{path}: {len(index)} records indexed")
+
+
+if __name__ == "__main__":
+    main()
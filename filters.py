@@ -2,16 +2,21 @@
 import subprocess
 import tempfile
 import os
-from Bio import SeqIO
-from Bio.Seq import Seq
+import numpy as np
 
-try:
-    from Bio.SeqUtils import gc_fraction
-except ImportError:
-    from Bio.SeqUtils import GC
+# Biopython is only imported by the per-sequence helpers that use it, so the
+# design core (and a batch job) starts without it
+
+
+def gc_fraction(seq):
+    """Bio.SeqUtils gc_fraction (GC/100 on older Biopython)"""
+    try:
+        from Bio.SeqUtils import gc_fraction as bio_gc_fraction
+    except ImportError:
+        from Bio.SeqUtils import GC
 
-    def gc_fraction(seq):
         return GC(seq) / 100
+    return bio_gc_fraction(seq)
 
 
 def is_ok_4_pnas_filter(seq, filter_to_be_used=[1, 2, 3, 4, 5]):
@@ -72,15 +77,14 @@ def is_ok_4_gc_filter(seq, min_gc=0.4, max_gc=0.6):
     return min_gc <= gc_content <= max_gc
 
 
-def dustmasker_filter(sequences, max_masked_percent=0.1):
+def run_dustmasker(sequences):
     """
-    RESTORED: dustmasker filter to replace RepeatMasker
-    Returns tuple: (filter_results, masked_percentages)
-    filter_results: list of booleans (True = pass, False = fail)
-    masked_percentages: list of masked percentages for each sequence
+    Run dustmasker on a list of sequences
+    Returns the masked sequences (lowercase = masked) or None if dustmasker
+    is unavailable or failed, so callers can fall back to passing everything
     """
     if not sequences:
-        return [], []
+        return []
 
     # Create temporary input file
     with tempfile.NamedTemporaryFile(
@@ -108,52 +112,28 @@ def dustmasker_filter(sequences, max_masked_percent=0.1):
             text=True,
         )
 
-        # Parse masked sequences and calculate masked percentages
-        masked_percentages = []
-        filter_results = []
-
         if result.returncode == 0 and os.path.exists(temp_output_path):
+            from Bio import SeqIO
+
             # Parse dustmasker output
-            masked_sequences = []
-            for record in SeqIO.parse(temp_output_path, "fasta"):
-                masked_sequences.append(str(record.seq))
-
-            # Calculate masked percentages
-            for i, (original_seq, masked_seq) in enumerate(
-                zip(sequences, masked_sequences)
-            ):
-                if len(masked_seq) > 0:
-                    # Count lowercase nucleotides (masked regions)
-                    total_length = len(masked_seq)
-                    masked_count = sum(1 for char in masked_seq if char.islower())
-                    masked_percent = (
-                        masked_count / total_length if total_length > 0 else 0
-                    )
-                else:
-                    masked_percent = 0
-
-                masked_percentages.append(masked_percent)
-                # Pass filter if masked percentage is below threshold
-                filter_results.append(masked_percent <= max_masked_percent)
+            return [
+                str(record.seq) for record in SeqIO.parse(temp_output_path, "fasta")
+            ]
 
-        else:
-            # dustmasker failed - pass all sequences (like R script behavior)
-            print(f"Warning: dustmasker failed (return code: {result.returncode})")
-            print(f"stderr: {result.stderr}")
-            masked_percentages = [0.0] * len(sequences)
-            filter_results = [True] * len(sequences)
+        # dustmasker failed - pass all sequences (like R script behavior)
+        print(f"Warning: dustmasker failed (return code: {result.returncode})")
+        print(f"stderr: {result.stderr}")
+        return None
 
     except FileNotFoundError:
         # dustmasker not found - pass all sequences (graceful degradation)
         print("Warning: dustmasker not found. Skipping repeat masking filter.")
-        masked_percentages = [0.0] * len(sequences)
-        filter_results = [True] * len(sequences)
+        return None
 
     except Exception as e:
         # Any other error - pass all sequences
         print(f"Warning: dustmasker error: {e}")
-        masked_percentages = [0.0] * len(sequences)
-        filter_results = [True] * len(sequences)
+        return None
 
     finally:
         # Clean up temp files
@@ -162,4 +142,153 @@ def dustmasker_filter(sequences, max_masked_percent=0.1):
         if os.path.exists(temp_output_path):
             os.unlink(temp_output_path)
 
+
+def dustmasker_filter(sequences, max_masked_percent=0.1):
+    """
+    RESTORED: dustmasker filter to replace RepeatMasker
+    Returns tuple: (filter_results, masked_percentages)
+    filter_results: list of booleans (True = pass, False = fail)
+    masked_percentages: list of masked percentages for each sequence
+    """
+    if not sequences:
+        return [], []
+
+    masked_sequences = run_dustmasker(sequences)
+    if masked_sequences is None:
+        return [True] * len(sequences), [0.0] * len(sequences)
+
+    # Calculate masked percentages
+    masked_percentages = []
+    filter_results = []
+    for original_seq, masked_seq in zip(sequences, masked_sequences):
+        if len(masked_seq) > 0:
+            # Count lowercase nucleotides (masked regions)
+            total_length = len(masked_seq)
+            masked_count = sum(1 for char in masked_seq if char.islower())
+            masked_percent = masked_count / total_length if total_length > 0 else 0
+        else:
+            masked_percent = 0
+
+        masked_percentages.append(masked_percent)
+        # Pass filter if masked percentage is below threshold
+        filter_results.append(masked_percent <= max_masked_percent)
+
     return filter_results, masked_percentages
+
+
+def dustmasker_mask_sequence(sequence):
+    """
+    Run dustmasker once on a whole target sequence
+    Returns a boolean array (True = masked base) or None if dustmasker failed
+    """
+    masked_sequences = run_dustmasker([sequence])
+    if not masked_sequences:
+        return None
+
+    masked = np.frombuffer(masked_sequences[0].encode("ascii"), dtype=np.uint8)
+    return (masked >= ord("a")) & (masked <= ord("z"))
+
+
+FILTER_KEYS = (
+    "GCFilter",
+    "aCompFilter",
+    "aStackFilter",
+    "cCompFilter",
+    "cStackFilter",
+    "cSpecStackFilter",
+    "PNASFilter",
+    "MaskedFilter",
+)
+
+PNAS_RULE_KEYS = {
+    1: "aCompFilter",
+    2: "aStackFilter",
+    3: "cCompFilter",
+    4: "cStackFilter",
+    5: "cSpecStackFilter",
+}
+
+
+def composition_filter_flags(
+    composition,
+    starts,
+    lengths,
+    min_gc=0.4,
+    max_gc=0.6,
+    pnas_filter_option=[1, 2, 4],
+    max_masked_percent=0.1,
+):
+    """
+    GC/PNAS/masking filters for arbitrary windows of a SequenceComposition
+    starts (0-based) and lengths are broadcast against each other, and every
+    rule is an O(1) prefix-sum lookup per window. Returns a dict of boolean
+    arrays keyed like the filter columns of process_probes_for_output.
+    """
+    starts = np.asarray(starts)
+    lengths = np.asarray(lengths)
+
+    # Same float expressions as the per-probe rules
+    a_comp = composition.count("A", starts, lengths) / lengths
+    c_comp = composition.count("C", starts, lengths) / lengths
+    gc_content = composition.gc_fraction(starts, lengths)
+
+    flags = {
+        "GCFilter": (min_gc <= gc_content) & (gc_content <= max_gc),
+        "aCompFilter": a_comp < 0.28,
+        "aStackFilter": ~composition.has_stack("A", starts, lengths),
+        "cCompFilter": (0.22 < c_comp) & (c_comp < 0.28),
+        "cStackFilter": ~composition.has_stack("C", starts, lengths),
+        "cSpecStackFilter": ~composition.has_c_rich_window(starts, lengths),
+        "MaskedFilter": composition.masked_fraction(starts, lengths)
+        <= max_masked_percent,
+    }
+
+    pnas = np.ones(np.broadcast(starts, lengths).shape, dtype=bool)
+    for rule in pnas_filter_option:
+        pnas &= flags[PNAS_RULE_KEYS[rule]]
+    flags["PNASFilter"] = pnas
+
+    return flags
+
+
+def window_filter_flags(
+    composition,
+    probe_lengths,
+    nb_positions,
+    min_gc=0.4,
+    max_gc=0.6,
+    pnas_filter_option=[1, 2, 4],
+    max_masked_percent=0.1,
+):
+    """
+    Filters for every candidate window of a sequence
+    Rows are start positions (0-based, nb_positions of them) and columns are
+    probe_lengths, i.e. the same layout as the score matrix built in
+    get_probes_from_rna_dg37.
+    """
+    if nb_positions <= 0:
+        return {
+            key: np.zeros((0, len(probe_lengths)), dtype=bool) for key in FILTER_KEYS
+        }
+
+    return composition_filter_flags(
+        composition,
+        np.arange(nb_positions)[:, None],
+        np.asarray(probe_lengths)[None, :],
+        min_gc=min_gc,
+        max_gc=max_gc,
+        pnas_filter_option=pnas_filter_option,
+        max_masked_percent=max_masked_percent,
+    )
+
+
+def output_filter_mask(df, use_dustmasker=False):
+    """Probes of an output table kept in its FILT table
+    GC and PNAS filters, plus dustmasker when used and the secondary-structure
+    filter when that stage was run"""
+    passed = (df["GCFilter"] == 1) & (df["PNASFilter"] == 1)
+    if use_dustmasker:
+        passed &= df["MaskedFilter"] == 1
+    if "StructureFilter" in df.columns:
+        passed &= df["StructureFilter"] == 1
+    return passed
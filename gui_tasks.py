@@ -0,0 +1,116 @@
+# gui_tasks.py - run long GUI jobs on a worker thread, reporting through a queue
+import queue
+import threading
+
+POLL_INTERVAL_MS = 100
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task by check_cancelled() once cancel() was requested"""
+
+
+class BackgroundTask:
+    """
+    Run target(task, *args) on a worker thread without blocking Tk
+    The worker never touches widgets: task.log() and task.progress() put
+    messages on a queue that poll() drains on the Tk thread, re-scheduling
+    itself with root.after() until the task has finished. on_done(result),
+    on_error(exception) and on_cancel() are also called on the Tk thread.
+    """
+
+    def __init__(
+        self,
+        root,
+        target,
+        args=(),
+        on_done=None,
+        on_error=None,
+        on_cancel=None,
+        on_log=None,
+        on_progress=None,
+        poll_interval=POLL_INTERVAL_MS,
+    ):
+        self.root = root
+        self.target = target
+        self.args = args
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_cancel = on_cancel
+        self.on_log = on_log
+        self.on_progress = on_progress
+        self.poll_interval = poll_interval
+        self.finished = False
+
+        self._queue = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        self.root.after(self.poll_interval, self.poll)
+        return self
+
+    def cancel(self):
+        """Ask the worker to stop at its next check_cancelled()"""
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise TaskCancelled()
+
+    # Called from the worker thread
+    def log(self, message):
+        self._queue.put(("log", message))
+
+    def progress(self, done, total=None):
+        self._queue.put(("progress", (done, total)))
+
+    def _run(self):
+        try:
+            result = self.target(self, *self.args)
+        except TaskCancelled:
+            self._queue.put(("cancelled", None))
+        except Exception as e:
+            self._queue.put(("error", e))
+        else:
+            self._queue.put(("done", result))
+
+    # Called on the Tk thread
+    def poll(self):
+        """Dispatch queued messages; returns True once the task has finished"""
+        latest_progress = None
+        outcome = None
+        while outcome is None:
+            try:
+                kind, payload = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "log":
+                if self.on_log is not None:
+                    self.on_log(payload)
+            elif kind == "progress":
+                # Only the most recent progress of a batch is worth drawing
+                latest_progress = payload
+            else:
+                outcome = (kind, payload)
+
+        if latest_progress is not None and self.on_progress is not None:
+            self.on_progress(*latest_progress)
+
+        if outcome is None:
+            self.root.after(self.poll_interval, self.poll)
+            return False
+
+        self.finished = True
+        kind, payload = outcome
+        if kind == "done" and self.on_done is not None:
+            self.on_done(payload)
+        elif kind == "error" and self.on_error is not None:
+            self.on_error(payload)
+        elif kind == "cancelled" and self.on_cancel is not None:
+            self.on_cancel()
+        return True
@@ -0,0 +1,320 @@
+# incremental_design.py - redesign a sequence after small edits
+import numpy as np
+
+from oligostan_core import (
+    composition_masked_bases,
+    greedy_select,
+    iter_window_scores,
+)
+from probe_batch import ProbeBatch
+from thermodynamics import get_thermo_model
+
+# Selection parameters of get_probe_batch recorded in a DesignState
+SELECTION_DEFAULTS = {
+    "min_size_probe": 26,
+    "max_size_probe": 32,
+    "desired_dg": -32,
+    "min_score_value": 0.9,
+    "inc_betw_prob": 2,
+}
+
+
+class DesignState:
+    """
+    What redesign() needs from a previous design of one sequence
+    The best size, score and dG of every start position (before the score
+    threshold), the per-base dustmasker flags if any, the selected probes and
+    the selection parameters. Thermodynamic model and window filters are not
+    stored; redesign must be given the same ones.
+    """
+
+    __slots__ = (
+        "sequence",
+        "masked_bases",
+        "sizes",
+        "scores",
+        "dgs",
+        "batch",
+        "params",
+    )
+
+    def __init__(self, sequence, masked_bases, sizes, scores, dgs, batch, params):
+        self.sequence = sequence
+        self.masked_bases = masked_bases
+        # Probe sizes fit in a byte; scores and dG stay float64 (exact reuse)
+        self.sizes = np.asarray(sizes, dtype=np.int8)
+        self.scores = np.asarray(scores, dtype=np.float64)
+        self.dgs = np.asarray(dgs, dtype=np.float64)
+        self.batch = batch
+        self.params = params
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+def _selection_params(params):
+    return {name: params.get(name, value) for name, value in SELECTION_DEFAULTS.items()}
+
+
+def _check_window_mask(window_mask):
+    if window_mask is not None and not callable(window_mask):
+        raise ValueError(
+            "Incremental designs need window_mask as a function of the "
+            "SequenceComposition (see build_window_filter_mask)"
+        )
+
+
+def _window_scores(seq, masked_bases, params, **kwargs):
+    """Concatenated (sizes, scores, dgs) of iter_window_scores"""
+    sizes, scores, dgs = [], [], []
+    for _, chunk_sizes, chunk_scores, chunk_dgs in iter_window_scores(
+        seq,
+        params["min_size_probe"],
+        params["max_size_probe"],
+        params["desired_dg"],
+        masked_bases=masked_bases,
+        **kwargs,
+    ):
+        sizes.append(chunk_sizes)
+        scores.append(chunk_scores)
+        dgs.append(chunk_dgs)
+    if not sizes:
+        return np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0)
+    return np.concatenate(sizes), np.concatenate(scores), np.concatenate(dgs)
+
+
+def design_with_state(
+    seq,
+    masked_bases=None,
+    composition=None,
+    window_mask=None,
+    thermo_model=None,
+    chunk_size=None,
+    **params,
+):
+    """
+    (ProbeBatch, DesignState) of seq; the batch equals get_probe_batch's
+    masked_bases or composition (optional) carry the dustmasker flags; the
+    other arguments are those of get_probe_batch.
+    """
+    _check_window_mask(window_mask)
+    params = _selection_params(params)
+    if thermo_model is None:
+        thermo_model = get_thermo_model()
+    if masked_bases is None and composition is not None:
+        masked_bases = composition_masked_bases(composition, 0, len(seq))
+
+    sizes, scores, dgs = _window_scores(
+        seq,
+        masked_bases,
+        params,
+        window_mask=window_mask,
+        composition=composition,
+        thermo_model=thermo_model,
+        chunk_size=chunk_size,
+    )
+    return _select_with_state(
+        seq, masked_bases, sizes, scores, dgs, params, thermo_model
+    )
+
+
+def _select_with_state(seq, masked_bases, sizes, scores, dgs, params, thermo_model):
+    """(ProbeBatch, DesignState) of seq from its window scores"""
+    selected = list(
+        greedy_select(sizes, scores, params["min_score_value"], params["inc_betw_prob"])
+    )
+    batch = ProbeBatch(
+        seq,
+        [probe[0] for probe in selected],
+        [probe[1] for probe in selected],
+        [probe[2] for probe in selected],
+    )
+    batch.set_dg37(dgs[batch.positions - 1], thermo_model)
+    return batch, DesignState(seq, masked_bases, sizes, scores, dgs, batch, params)
+
+
+def design_many_with_state(
+    sequences,
+    masked_bases=None,
+    window_mask=None,
+    thermo_model=None,
+    chunk_size=None,
+    **params,
+):
+    """
+    design_with_state of each sequence, from one window scoring pass
+    The sequences are scored laid end to end, so short sequences share the
+    per-call cost of the dG engine; windows overlapping two sequences are
+    never used. masked_bases (optional): dustmasker flags of each sequence.
+    """
+    _check_window_mask(window_mask)
+    params = _selection_params(params)
+    if thermo_model is None:
+        thermo_model = get_thermo_model()
+    if masked_bases is None or any(masked is None for masked in masked_bases):
+        masked_bases = [None] * len(sequences)
+        joint_masked = None
+    else:
+        joint_masked = np.concatenate(masked_bases) if sequences else None
+
+    sizes, scores, dgs = _window_scores(
+        "".join(sequences),
+        joint_masked,
+        params,
+        window_mask=window_mask,
+        thermo_model=thermo_model,
+        chunk_size=chunk_size,
+    )
+    designs = []
+    start = 0
+    for seq, masked in zip(sequences, masked_bases):
+        # Start positions whose longest window fits in seq
+        end = start + max(len(seq) - params["max_size_probe"] + 1, 0)
+        designs.append(
+            _select_with_state(
+                seq,
+                masked,
+                sizes[start:end],
+                scores[start:end],
+                dgs[start:end],
+                params,
+                thermo_model,
+            )
+        )
+        start += len(seq)
+    return designs
+
+
+def _unchanged_ends(old, new, old_masked, new_masked):
+    """Lengths of the common prefix and suffix (bases and dustmasker flags)"""
+    limit = min(len(old), len(new))
+    old_codes = np.frombuffer(old.encode("ascii"), dtype=np.uint8)
+    new_codes = np.frombuffer(new.encode("ascii"), dtype=np.uint8)
+
+    same_head = old_codes[:limit] == new_codes[:limit]
+    same_tail = old_codes[len(old) - limit :] == new_codes[len(new) - limit :]
+    if old_masked is not None:
+        same_head &= old_masked[:limit] == new_masked[:limit]
+        same_tail &= old_masked[len(old) - limit :] == new_masked[len(new) - limit :]
+
+    different = np.flatnonzero(~same_head)
+    prefix = int(different[0]) if len(different) else limit
+    different = np.flatnonzero(~same_tail[::-1])
+    suffix = int(different[0]) if len(different) else limit
+    # Prefix and suffix must not overlap (e.g. repeats around an insertion)
+    return prefix, min(suffix, limit - prefix)
+
+
+def redesign(
+    state,
+    seq,
+    masked_bases=None,
+    composition=None,
+    window_mask=None,
+    thermo_model=None,
+    chunk_size=None,
+    **params,
+):
+    """
+    design_with_state(seq, ...) reusing state, the design of a similar sequence
+    Only start positions whose windows overlap an edited base are scored
+    again. Probes starting before them are kept as they were, and once the
+    greedy walk is past the edit and reaches a pointer of the old walk, the
+    old probes are reused shifted by the length change. The result is
+    identical to a full design. Other selection parameters, a dustmasker
+    mask appearing or disappearing, or a sequence shorter than a probe fall
+    back to a full design.
+    """
+    _check_window_mask(window_mask)
+    if thermo_model is None:
+        thermo_model = get_thermo_model()
+    if masked_bases is None and composition is not None:
+        masked_bases = composition_masked_bases(composition, 0, len(seq))
+
+    selection = _selection_params(params)
+    max_size = selection["max_size_probe"]
+    old = state.sequence
+    nb_old = len(old) - max_size + 1
+    nb_new = len(seq) - max_size + 1
+    if (
+        selection != state.params
+        or (masked_bases is None) != (state.masked_bases is None)
+        or nb_old <= 0
+        or nb_new <= 0
+        or not (old.isascii() and seq.isascii())
+    ):
+        return design_with_state(
+            seq,
+            masked_bases,
+            composition,
+            window_mask,
+            thermo_model,
+            chunk_size,
+            **selection,
+        )
+
+    prefix, suffix = _unchanged_ends(old, seq, state.masked_bases, masked_bases)
+    shift = len(seq) - len(old)
+
+    # Start positions [first, end) have a window touching an edited base;
+    # positions from end on lie in the unchanged suffix (old position - shift)
+    first = max(0, prefix - max_size + 1)
+    end = max(first, min(nb_new, len(seq) - suffix))
+    edited_sizes, edited_scores, edited_dgs = _window_scores(
+        seq[first : end + max_size - 1],
+        None if masked_bases is None else masked_bases[first : end + max_size - 1],
+        selection,
+        window_mask=window_mask,
+        thermo_model=thermo_model,
+        chunk_size=chunk_size,
+    )
+    sizes = np.concatenate(
+        (state.sizes[:first], edited_sizes, state.sizes[end - shift :])
+    )
+    scores = np.concatenate(
+        (state.scores[:first], edited_scores, state.scores[end - shift :])
+    )
+    dgs = np.concatenate((state.dgs[:first], edited_dgs, state.dgs[end - shift :]))
+
+    # Probes starting before the edited windows are selected exactly as before
+    old_batch = state.batch
+    inc_betw_prob = selection["inc_betw_prob"]
+    keep = int(np.searchsorted(old_batch.positions - 1, first))
+    probe_sizes = old_batch.sizes[:keep].tolist()
+    probe_scores = list(old_batch.scores[:keep])
+    probe_positions = old_batch.positions[:keep].tolist()
+    pointeur = 0
+    if keep:
+        pointeur = probe_positions[-1] + probe_sizes[-1] + inc_betw_prob
+
+    # Pointer after each old probe -> index of the next old probe
+    old_pointers = old_batch.positions + old_batch.sizes + inc_betw_prob
+    next_probe = {int(p): j + 1 for j, p in enumerate(old_pointers)}
+
+    def resume_old_walk(pointeur):
+        """True (and old probes appended) if the old walk continues from here"""
+        j = next_probe.get(pointeur - shift)
+        if pointeur <= end or j is None:
+            return False
+        probe_sizes.extend(old_batch.sizes[j:].tolist())
+        probe_scores.extend(old_batch.scores[j:])
+        probe_positions.extend((old_batch.positions[j:] + shift).tolist())
+        return True
+
+    if not resume_old_walk(pointeur):
+        for probe_size, score, position, pointeur in greedy_select(
+            sizes, scores, selection["min_score_value"], inc_betw_prob, pointeur
+        ):
+            probe_sizes.append(probe_size)
+            probe_scores.append(score)
+            probe_positions.append(position)
+            if resume_old_walk(pointeur):
+                break
+
+    batch = ProbeBatch(seq, probe_sizes, probe_scores, probe_positions)
+    batch.set_dg37(dgs[batch.positions - 1], thermo_model)
+    return batch, DesignState(seq, masked_bases, sizes, scores, dgs, batch, selection)
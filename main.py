@@ -1,90 +1,576 @@
 # main.py - UPDATED with dustmasker functionality restored
-import tkinter as tk
-from tkinter import filedialog, messagebox
-from rich.progress import track
+import argparse
+import functools
 import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
 from sequence_utils import read_fasta_sequences, create_output_directory
+from fasta_io import FASTA_FILE_PATTERNS, fasta_base_name
 from oligostan_core import (
     optimize_dg37_selection,
-    get_probes_from_rna_dg37,
-    process_probes_for_output,
+    build_sequence_composition,
+    build_window_filter_mask,
+    composition_masked_bases,
+    get_probe_batch,
+    greedy_select,
+    iter_window_scores,
+    score_probe_batch,
 )
+from probe_batch import ProbeBatch
 from filters import (
     is_ok_4_pnas_filter,
     is_ok_4_gc_filter,
     dustmasker_filter,
+    dustmasker_mask_sequence,
+    output_filter_mask,
 )  # FIXED: Added back dustmasker_filter
-from config import DEFAULT_SETTINGS, FLAP_SEQUENCES
+from thermodynamics import thermo_model_from_settings
+from secondary_structure import add_secondary_structure_scores
+from config import DEFAULT_SETTINGS, FLAP_SEQUENCES, design_settings
+from run_journal import RunJournal, atomic_write, DEFAULT_JOURNAL
+from output_store import ProbeStore, NO_PROBES_MESSAGE
+from shared_arrays import SharedTranscriptome
+from design_cache import DesignCache
+from incremental_design import design_many_with_state, design_with_state, redesign
+from design_stats import DesignStats, FILTER_RULES
+from scheduler import (
+    STRUCTURE_TASK_PROBES,
+    TaskQueue,
+    position_count,
+    record_cost,
+    run_longest_first,
+    select_cost,
+    split_ranges,
+    structure_cost,
+    window_cost,
+)
 
 
 def select_fasta_files():
     """GUI file selection"""
+    # tkinter is only needed when no file was given on the command line
+    import tkinter as tk
+    from tkinter import filedialog
+
     root = tk.Tk()
     root.withdraw()
 
     files = filedialog.askopenfilenames(
         title="Select FASTA files for probe design",
-        filetypes=[("FASTA files", "*.fa *.fasta *.fas"), ("All files", "*.*")],
+        filetypes=[("FASTA files", FASTA_FILE_PATTERNS), ("All files", "*.*")],
     )
 
     root.destroy()
     return files
 
 
-def process_single_file(file_path):
-    """Process a single FASTA file"""
+def process_single_file(file_path, store=None, cache=None, stats=None, settings=None):
+    """Process a single FASTA file, returns the output files written
+    store (optional): ProbeStore receiving the tables instead of TSV files
+    cache (optional): DesignCache of already designed sequences
+    stats (optional): DesignStats accumulating the batch statistics
+    settings (optional): DesignSettings of the run (default: DEFAULT_SETTINGS)"""
+    settings = design_settings(settings)
     try:
         # Read sequences
         sequences = read_fasta_sequences(file_path)
+        probes_data = design_sequences(
+            sequences, cache=cache, stats=stats, settings=settings
+        )
+        return write_file_outputs(file_path, probes_data, store, settings)
+
+    except Exception as e:
+        raise Exception(f"Error processing {file_path}: {str(e)}")
 
-        # Create output directory
-        output_dir = create_output_directory(file_path)
-        base_name = os.path.splitext(os.path.basename(file_path))[0]
 
-        # Use fixed dG37 value (simplified approach)
-        optimal_dg37 = DEFAULT_SETTINGS["fixed_dg37_value"]
-
-        # Generate probes with fixed dG37
-        all_probes_data = []
-        for seq_data in sequences:
-            probes = get_probes_from_rna_dg37(
-                seq_data["sequence"],
-                min_size_probe=DEFAULT_SETTINGS["taille_sonde_min"],
-                max_size_probe=DEFAULT_SETTINGS["taille_sonde_max"],
-                desired_dg=optimal_dg37,
-                min_score_value=DEFAULT_SETTINGS["score_min"],
-                inc_betw_prob=DEFAULT_SETTINGS["distance_min_inter_sonde"],
+def design_sequences(
+    sequences, score_structures=True, cache=None, stats=None, settings=None
+):
+    """Probe DataFrame of read_fasta_sequences records (None if no probes)
+    score_structures=False leaves the structure stage to the caller (e.g. to
+    run it once over several designs); with a DesignCache, sequences already
+    designed with the same settings are not designed again and edited ones
+    are redesigned incrementally from their record's previous design. A
+    DesignStats receives the per-record statistics of the final table.
+    settings: DesignSettings (or dict) used by every stage, DEFAULT_SETTINGS
+    if not given."""
+    settings = design_settings(settings)
+    probe_tables = []
+    nb_probes = []  # Rows of each record in the concatenated table
+    for index, seq_data in enumerate(sequences):
+        table = design_record(seq_data, index, cache, settings)
+        if table is not None:
+            probe_tables.append(table)
+        nb_probes.append(0 if table is None else len(table))
+
+    all_probes_data = None
+    if probe_tables:
+        all_probes_data = pd.concat(probe_tables, ignore_index=True)
+
+        # Optional Tm / hairpin / homodimer scoring stage (works on records)
+        if score_structures and settings.get("structure_scoring", False):
+            all_probes_data = pd.DataFrame(structure_records(all_probes_data, settings))
+
+    if stats is not None:
+        add_design_stats(stats, sequences, nb_probes, all_probes_data, settings)
+    return all_probes_data
+
+
+def design_record(seq_data, index=0, cache=None, settings=None):
+    """Probe table of one read_fasta_sequences record (None if no probes),
+    before the structure stage; index is the record's number in its file,
+    naming its design state in the DesignCache (None: no design state)"""
+    settings = design_settings(settings)
+    if cache is not None:
+        found, table = cache.lookup(seq_data["sequence"], settings, seq_data["name"])
+        if found:
+            return table
+    state = _lookup_state(seq_data, index, cache, settings)
+    return _design_record(seq_data, index, cache, settings, state)
+
+
+def design_records(records, indexes=None, cache=None, settings=None):
+    """
+    design_record tables of several records sharing settings
+    Records the cache does not answer, without a previous design state and
+    no longer than long_sequence_chunk are selected from one window scoring
+    pass over all of them (see design_many_with_state).
+    indexes: design_record index of each record (default 0, 1, ...)
+    """
+    settings = design_settings(settings)
+    if indexes is None:
+        indexes = range(len(records))
+    chunk_size = settings.get("long_sequence_chunk")
+
+    tables = [None] * len(records)
+    together = []
+    for i, (seq_data, index) in enumerate(zip(records, indexes)):
+        if cache is not None:
+            found, tables[i] = cache.lookup(
+                seq_data["sequence"], settings, seq_data["name"]
             )
+            if found:
+                continue
+        state = _lookup_state(seq_data, index, cache, settings)
+        if state is not None or (chunk_size and len(seq_data["sequence"]) > chunk_size):
+            tables[i] = _design_record(seq_data, index, cache, settings, state)
+        else:
+            together.append((i, index))
+    if not together:
+        return tables
+
+    compositions = [
+        build_sequence_composition(records[i]["sequence"], **settings)
+        for i, _ in together
+    ]
+    selection = _selection_settings(settings)
+    selection["masked_bases"] = [
+        composition_masked_bases(composition, 0, composition.length)
+        for composition in compositions
+    ]
+    designs = design_many_with_state(
+        [records[i]["sequence"] for i, _ in together], **selection
+    )
+    for (i, index), composition, (batch, state) in zip(together, compositions, designs):
+        tables[i] = _record_table(
+            records[i], index, cache, settings, batch, state, composition
+        )
+    return tables
+
+
+def _lookup_state(seq_data, index, cache, settings):
+    """Previous DesignState of a record (None: none, or not kept)"""
+    if cache is None or index is None:
+        return None
+    return cache.lookup_state(f"{seq_data['name']}:{index}", settings)
+
+
+def _design_record(seq_data, index, cache, settings, state):
+    """design_record once the cache has no table for seq_data"""
+    selection = _selection_settings(settings)
+    if selection["chunk_size"] and len(seq_data["sequence"]) > selection["chunk_size"]:
+        # Long sequence: compositions and masks are built per chunk
+        composition = None
+        if selection["window_mask"] is not None and settings["use_dustmasker"]:
+            selection["masked_bases"] = dustmasker_mask_sequence(
+                seq_data["sequence"].upper()
+            )
+    else:
+        # Base composition shared by the dG engine and every filter
+        composition = build_sequence_composition(seq_data["sequence"], **settings)
+    selection["composition"] = composition
+
+    if cache is None or index is None:
+        batch, state = get_probe_batch(seq_data["sequence"], **selection), None
+    elif state is None:
+        batch, state = design_with_state(seq_data["sequence"], **selection)
+    else:
+        # Previous design of this record, redone only where it changed
+        batch, state = redesign(state, seq_data["sequence"], **selection)
+    return _record_table(seq_data, index, cache, settings, batch, state, composition)
+
+
+def _record_table(seq_data, index, cache, settings, batch, state, composition):
+    """Scored table of a designed record, stored with its state in the cache"""
+    if cache is not None and state is not None:
+        cache.store_state(f"{seq_data['name']}:{index}", settings, state)
+    table = _probe_table(batch, seq_data, settings, composition)
+    if cache is not None:
+        cache.store(seq_data["sequence"], settings, table)
+    return table
+
+
+def _selection_settings(settings):
+    """get_probe_batch arguments of settings (no composition)"""
+    # Optional filter-before-select mode
+    window_mask = None
+    if settings.get("filter_before_select", False):
+        window_mask = functools.partial(
+            build_window_filter_mask,
+            min_size_probe=settings["taille_sonde_min"],
+            max_size_probe=settings["taille_sonde_max"],
+            **settings,
+        )
+
+    return dict(
+        min_size_probe=settings["taille_sonde_min"],
+        max_size_probe=settings["taille_sonde_max"],
+        # Use fixed dG37 value (simplified approach)
+        desired_dg=settings["fixed_dg37_value"],
+        min_score_value=settings["score_min"],
+        inc_betw_prob=settings["distance_min_inter_sonde"],
+        window_mask=window_mask,
+        # Thermodynamic model compiled once per run (cached)
+        thermo_model=thermo_model_from_settings(**settings),
+        chunk_size=settings.get("long_sequence_chunk"),
+        masked_bases=None,
+    )
 
-            if probes:
-                # UPDATED: Pass dustmasker parameters
-                all_probes_data.extend(
-                    process_probes_for_output(
-                        probes, seq_data, optimal_dg37, **DEFAULT_SETTINGS
-                    )
-                )
 
-        # Generate output files
-        generate_output_files(all_probes_data, output_dir, base_name)
+def _probe_table(batch, seq_data, settings, composition=None):
+    """Scored output table of a selected ProbeBatch (None if empty)"""
+    if not len(batch):
+        return None
+    # UPDATED: Pass dustmasker parameters
+    score_probe_batch(batch, composition=composition, **settings)
+    return batch.to_dataframe(seq_data["name"], settings["fixed_dg37_value"])
+
+
+def record_window_scores(seq, first, end, settings):
+    """
+    (sizes, scores, dgs) of the start positions [first, end) of seq
+    The window scores of a long record can be computed in pieces (see
+    select_record); they equal those of its whole design.
+    """
+    selection = _selection_settings(settings)
+    max_size = selection["max_size_probe"]
+    sizes, scores, dgs = [], [], []
+    for _, chunk_sizes, chunk_scores, chunk_dgs in iter_window_scores(
+        seq[first : end + max_size - 1],
+        selection["min_size_probe"],
+        max_size,
+        selection["desired_dg"],
+        window_mask=selection["window_mask"],
+        thermo_model=selection["thermo_model"],
+        chunk_size=selection["chunk_size"],
+    ):
+        sizes.append(chunk_sizes)
+        scores.append(chunk_scores)
+        dgs.append(chunk_dgs)
+    return np.concatenate(sizes), np.concatenate(scores), np.concatenate(dgs)
+
+
+def select_record(seq_data, sizes, scores, dgs, settings):
+    """design_record's table from the window scores of all start positions"""
+    selection = _selection_settings(settings)
+    selected = list(
+        greedy_select(
+            sizes,
+            scores,
+            selection["min_score_value"],
+            selection["inc_betw_prob"],
+        )
+    )
+    batch = ProbeBatch(
+        seq_data["sequence"],
+        [probe[0] for probe in selected],
+        [probe[1] for probe in selected],
+        [probe[2] for probe in selected],
+    )
+    batch.set_dg37(dgs[batch.positions - 1], selection["thermo_model"])
+    # Probe flags only depend on the probe's own bases: no full composition
+    return _probe_table(batch, seq_data, settings)
 
-        return True
 
-    except Exception as e:
-        raise Exception(f"Error processing {file_path}: {str(e)}")
+def structure_records(table, settings, **params):
+    """Records of a probe table with the Tm / hairpin / homodimer stage"""
+    records = table.to_dict("records")
+    add_secondary_structure_scores(records, **dict(settings, **params))
+    return records
 
 
-def generate_output_files(probes_data, output_dir, file_base_name):
-    """Generate CSV files with exact column structure as R script"""
-    if not probes_data:
-        # Write empty file if no probes found
-        with open(
-            os.path.join(output_dir, f"Probes_{file_base_name}_FILT.txt"), "w"
-        ) as f:
-            f.write("No probes found after filtering. Change filtering parameters.\n")
-        return
+def add_design_stats(stats, sequences, nb_probes, probes_data, settings):
+    """Add the records of one input (nb_probes rows each) to a DesignStats"""
+    passed = None
+    if probes_data is not None:
+        passed = output_filter_mask(probes_data, settings.get("use_dustmasker", False))
+    # Tables are still in memory: no output has to be read back
+    stats.add_records(sequences, nb_probes, probes_data, passed)
+
+
+def write_file_outputs(file_path, probes_data, store=None, settings=None):
+    """Write the ALL/FILT tables of one input, returns the output files written"""
+    base_name = fasta_base_name(file_path)
+
+    # Consolidated output: one store for the whole batch
+    if store is not None:
+        store.write_source(
+            file_path, base_name, *build_output_tables(probes_data, settings)
+        )
+        return []
+
+    # Generate output files
+    output_dir = create_output_directory(file_path)
+    return generate_output_files(probes_data, output_dir, base_name, settings)
+
+
+# Shared sequence set, settings and design cache of a design worker process
+# (see design_files_parallel)
+_worker_transcriptome = None
+_worker_settings = None
+_worker_cache = None
+
+
+def _init_design_worker(handle, settings, cache_config=None):
+    global _worker_transcriptome, _worker_settings, _worker_cache
+    _worker_settings = settings
+    _worker_transcriptome = SharedTranscriptome.attach(handle)
+    if cache_config is not None:
+        _worker_cache = DesignCache(*cache_config)
+
+
+def _shared_record(i):
+    name = _worker_transcriptome.names[i]
+    return {"id": name, "name": name, "sequence": _worker_transcriptome.sequence(i)}
+
+
+def _record_task(i, index, with_structures):
+    """Table of shared record i (index in its file), and cache activity"""
+    counters = None
+    if _worker_cache is None:
+        table = design_record(_shared_record(i), settings=_worker_settings)
+    else:
+        # Cache activity of this record, added to the parent's counters
+        before = _worker_cache.counters()
+        table = design_record(_shared_record(i), index, _worker_cache, _worker_settings)
+        after = _worker_cache.counters()
+        counters = {name: after[name] - before[name] for name in after}
+    return _small_table_structures(table, with_structures), counters
+
+
+def _window_scores_task(i, first, end):
+    return record_window_scores(
+        _worker_transcriptome.sequence(i), first, end, _worker_settings
+    )
+
+
+def _select_task(i, sizes, scores, dgs, with_structures):
+    table = select_record(_shared_record(i), sizes, scores, dgs, _worker_settings)
+    return _small_table_structures(table, with_structures)
+
+
+def _small_table_structures(table, with_structures):
+    """Structure stage right away, unless the table is scored in pieces"""
+    if table is None or not with_structures or len(table) > STRUCTURE_TASK_PROBES:
+        return table
+    return structure_records(table, _worker_settings, structure_jobs=1)
+
+
+def _structure_task(table):
+    return structure_records(table, _worker_settings, structure_jobs=1)
+
+
+def design_files_parallel(files, jobs, cache=None, stats=None, settings=None):
+    """
+    Design several FASTA files on jobs worker processes
+    All sequences are read once into a SharedTranscriptome; each worker maps
+    it read-only and receives record numbers, so memory does not grow with
+    the number of workers. Records are scheduled largest estimated cost
+    first (see scheduler.py): records longer than schedule_split_length
+    start positions are scored in pieces, and probe tables longer than
+    STRUCTURE_TASK_PROBES go through the structure stage in pieces. Outputs
+    are identical to design_sequences. Workers share the directory of cache
+    (a DesignCache) and report to its counters; statistics are added to
+    stats (a DesignStats); workers get settings (a DesignSettings). Yields
+    (file_path, probe DataFrame or None, exception or None) as files finish.
+    """
+    settings = design_settings(settings)
+    names, seqs, file_records = [], [], {}
+    for file_path in files:
+        try:
+            sequences = read_fasta_sequences(file_path)
+        except Exception as e:
+            yield file_path, None, Exception(f"Error processing {file_path}: {e}")
+            continue
+        file_records[file_path] = list(range(len(seqs), len(seqs) + len(sequences)))
+        names.extend(seq_data["name"] for seq_data in sequences)
+        seqs.extend(seq_data["sequence"] for seq_data in sequences)
+    lengths = [len(seq) for seq in seqs]
+
+    transcriptome = SharedTranscriptome.from_sequences(names, seqs)
+    del seqs
+    cache_config = None
+    if cache is not None:
+        cache_config = (cache.cache_dir, cache.max_bytes)
+    with_structures = settings.get("structure_scoring", False)
+    # A cached record keeps its design state, so it is designed whole; so is
+    # one masked by a single dustmasker run before scoring
+    split_length = settings.get("schedule_split_length")
+    if cache is not None or (
+        settings.get("filter_before_select", False) and settings["use_dustmasker"]
+    ):
+        split_length = None
+
+    queue = TaskQueue()
+    results = {}  # Shared record -> table (or structure records) when done
+    remaining = {file_path: len(records) for file_path, records in file_records.items()}
+    pieces = {}  # Shared record -> results of its pieces still coming in
+    file_of = {}
+    for file_path, records in file_records.items():
+        for index, i in enumerate(records):
+            file_of[i] = file_path
+            ranges = split_ranges(position_count(lengths[i], settings), split_length)
+            if len(ranges) < 2:
+                queue.push(
+                    record_cost(lengths[i], settings),
+                    ("record", i),
+                    _record_task,
+                    i,
+                    index,
+                    with_structures,
+                )
+                continue
+            pieces[i] = [None] * len(ranges)
+            for piece, (first, end) in enumerate(ranges):
+                queue.push(
+                    window_cost(end - first, settings),
+                    ("windows", i, piece),
+                    _window_scores_task,
+                    i,
+                    first,
+                    end,
+                )
+
+    def record_done(i, table):
+        """Queue the structure stage in pieces, or keep the finished table"""
+        if with_structures and isinstance(table, pd.DataFrame):
+            ranges = split_ranges(len(table), STRUCTURE_TASK_PROBES)
+            pieces[i] = [None] * len(ranges)
+            for piece, (first, end) in enumerate(ranges):
+                queue.push(
+                    structure_cost(end - first),
+                    ("structures", i, piece),
+                    _structure_task,
+                    table.iloc[first:end],
+                )
+        else:
+            record_finished(i, table)
+
+    def record_finished(i, table):
+        results[i] = table
+        remaining[file_of[i]] -= 1
+
+    def piece_done(i, piece, result):
+        """True once all pieces of record i are in"""
+        pieces[i][piece] = result
+        return all(result is not None for result in pieces[i])
+
+    failed = set()
+    with transcriptome, ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_design_worker,
+        initargs=(transcriptome.handle(), settings, cache_config),
+    ) as pool:
+        for file_path, records in file_records.items():
+            if not records:
+                yield file_path, _file_probes_data(
+                    [], [], transcriptome, stats, settings
+                ), None
+
+        # One task queued ahead keeps the workers busy between dispatches
+        for task, future in run_longest_first(pool, queue, jobs + 1):
+            kind, i = task[:2]
+            file_path = file_of[i]
+            if file_path in failed:
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                failed.add(file_path)
+                yield file_path, None, Exception(f"Error processing {file_path}: {e}")
+                continue
+
+            if kind == "record":
+                table, cache_counters = result
+                if cache_counters is not None:
+                    cache.add_counters(cache_counters)
+                record_done(i, table)
+            elif kind == "windows" and piece_done(i, task[2], result):
+                sizes, scores, dgs = (np.concatenate(part) for part in zip(*pieces[i]))
+                del pieces[i]
+                queue.push(
+                    select_cost(lengths[i], settings),
+                    ("select", i),
+                    _select_task,
+                    i,
+                    sizes,
+                    scores,
+                    dgs,
+                    with_structures,
+                )
+            elif kind == "select":
+                record_done(i, result)
+            elif kind == "structures" and piece_done(i, task[2], result):
+                record_finished(
+                    i, [record for part in pieces.pop(i) for record in part]
+                )
+
+            if remaining[file_path] == 0:
+                tables = [results.pop(j) for j in file_records[file_path]]
+                yield file_path, _file_probes_data(
+                    tables, file_records[file_path], transcriptome, stats, settings
+                ), None
+
+
+def _file_probes_data(tables, records, transcriptome, stats, settings):
+    """design_sequences output of one input from its records' tables"""
+    nb_probes = [0 if table is None else len(table) for table in tables]
+    tables = [table for table in tables if table is not None]
+    probes_data = None
+    if tables and isinstance(tables[0], list):
+        # Structure stage records, turned into a table like design_sequences
+        probes_data = pd.DataFrame([record for table in tables for record in table])
+    elif tables:
+        probes_data = pd.concat(tables, ignore_index=True)
+    if stats is not None:
+        sequences = [
+            {"name": transcriptome.names[i], "sequence": transcriptome.sequence(i)}
+            for i in records
+        ]
+        add_design_stats(stats, sequences, nb_probes, probes_data, settings)
+    return probes_data
+
+
+def build_output_tables(probes_data, settings=None):
+    """(ALL, FILT) DataFrames with exact column structure as R script
+    probes_data: probe DataFrame or list of process_probes_for_output dicts
+    (None, None) when no probes were found; settings (DesignSettings or dict,
+    default DEFAULT_SETTINGS) decide which filters make FILT"""
+    if probes_data is None or len(probes_data) == 0:
+        return None, None
 
     # Create DataFrame
     df = pd.DataFrame(probes_data)
@@ -92,42 +578,104 @@ def generate_output_files(probes_data, output_dir, file_base_name):
     # Sort by PNAS compliance (descending)
     df = df.sort_values("NbOfPNAS", ascending=False)
 
+    # Filter for final results - UPDATED: Include dustmasker in filter logic
+    # (and the secondary-structure stage results, when it was run)
+    use_dustmasker = design_settings(settings).get("use_dustmasker", False)
+    filtered_df = df[output_filter_mask(df, use_dustmasker)]
+
+    return df, filtered_df
+
+
+def generate_output_files(probes_data, output_dir, file_base_name, settings=None):
+    """Generate CSV files with exact column structure as R script
+    Files are written atomically (temp file + rename); returns their paths"""
+    filt_filename = os.path.join(output_dir, f"Probes_{file_base_name}_FILT.txt")
+    df, filtered_df = build_output_tables(probes_data, settings)
+    if df is None:
+        # Write empty file if no probes found
+        with atomic_write(filt_filename) as f:
+            f.write(NO_PROBES_MESSAGE)
+        return [filt_filename]
+
     # Save raw results (ALL)
     raw_filename = os.path.join(output_dir, f"Probes_{file_base_name}_ALL.txt")
-    df.to_csv(raw_filename, sep="\t", index=False)
-
-    # Filter for final results - UPDATED: Include dustmasker in filter logic
-    use_dustmasker = DEFAULT_SETTINGS.get("use_dustmasker", False)
-
-    if use_dustmasker:
-        # Include dustmasker in filter criteria
-        filtered_df = df[
-            (df["GCFilter"] == 1)
-            & (df["PNASFilter"] == 1)
-            & (df["MaskedFilter"] == 1)  # Include dustmasker filter
-        ]
-    else:
-        # Original filter criteria (dustmasker disabled)
-        filtered_df = df[(df["GCFilter"] == 1) & (df["PNASFilter"] == 1)]
+    with atomic_write(raw_filename) as f:
+        df.to_csv(f, sep="\t", index=False)
 
     # Save filtered results (FILT)
-    filt_filename = os.path.join(output_dir, f"Probes_{file_base_name}_FILT.txt")
-    filtered_df.to_csv(filt_filename, sep="\t", index=False)
+    with atomic_write(filt_filename) as f:
+        filtered_df.to_csv(f, sep="\t", index=False)
+
+    return [raw_filename, filt_filename]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Oligostan smiFISH probe design")
+    parser.add_argument(
+        "files", nargs="*", help="FASTA files (default: choose them in a dialog)"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="skip inputs the journal records as done and unchanged",
+    )
+    parser.add_argument(
+        "--journal", default=DEFAULT_JOURNAL, help="run journal (JSON lines)"
+    )
+    parser.add_argument(
+        "--store",
+        default=DEFAULT_SETTINGS["output_store"],
+        help="write all probes to this SQLite file instead of Probes_* folders "
+        "(export TSVs with output_store.py)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=DEFAULT_SETTINGS["design_jobs"],
+        help="worker processes designing files in parallel",
+    )
+    parser.add_argument(
+        "--design-cache",
+        default=DEFAULT_SETTINGS["design_cache"],
+        help="reuse designs of unchanged sequences cached in this directory",
+    )
+    parser.add_argument(
+        "--stats",
+        default=DEFAULT_SETTINGS["stats_report"],
+        help="write the batch statistics to <STATS>_summary/_transcripts/"
+        "_histograms.txt",
+    )
+    return parser.parse_args()
 
 
 def main():
     """Main application entry point"""
+    from rich.progress import track
+
+    args = parse_args()
+
+    # Settings resolved once and passed to every stage of the run
+    settings = design_settings()
+
     print("Oligostan Python - smiFISH Probe Design Tool")
     print("=" * 50)
 
     # Show dustmasker status
-    if DEFAULT_SETTINGS.get("use_dustmasker", False):
+    if settings.get("use_dustmasker", False):
         print("🔍 dustmasker filter: ENABLED")
     else:
         print("🔍 dustmasker filter: DISABLED (default, matching R script)")
 
-    # Select FASTA files
-    files = select_fasta_files()
+    journal = RunJournal(args.journal)
+    if args.resume:
+        journal.load()
+
+    # Select FASTA files (a resumed run defaults to the journal's inputs)
+    files = list(args.files)
+    if not files and args.resume:
+        files = journal.inputs
+    if not files:
+        files = select_fasta_files()
 
     if not files:
         print("No files selected. Exiting.")
@@ -135,19 +683,102 @@ def main():
 
     print(f"Selected {len(files)} files for processing")
 
+    fingerprint = settings.fingerprint()
+    journal.start(files, resume=args.resume)
+    store = ProbeStore(args.store) if args.store else None
+
+    # Inputs finished by an earlier run, with unchanged outputs (or rows
+    # still in this run's store)
+    skipped_count = 0
+    if args.resume:
+        pending = [f for f in files if not journal.is_done(f, fingerprint, store)]
+        skipped_count = len(files) - len(pending)
+        print(f"Resuming: {skipped_count} files already done")
+    else:
+        pending = files
+
+    cache = None
+    if args.design_cache:
+        cache = DesignCache(args.design_cache, settings["design_cache_size"])
+
+    # Probe density, coverage and filter statistics, gathered while designing
+    stats = DesignStats()
+
+    # Records, not files, are scheduled: one input can use every worker
+    parallel = args.jobs > 1 and bool(pending)
+    if parallel:
+        designs = design_files_parallel(pending, args.jobs, cache, stats, settings)
+    else:
+        designs = ((file_path, None, None) for file_path in pending)
+
     # Process files with progress tracking
     success_count = 0
-    for file_path in track(files, description="Processing files..."):
+    for file_path, probes_data, error in track(
+        designs, total=len(pending), description="Processing files..."
+    ):
         try:
-            process_single_file(file_path)
+            if error is not None:
+                raise error
+            if parallel:
+                output_files = write_file_outputs(
+                    file_path, probes_data, store, settings
+                )
+            else:
+                output_files = process_single_file(
+                    file_path, store, cache, stats, settings
+                )
+            journal.record_done(file_path, output_files, fingerprint, store)
             success_count += 1
             print(f"✅ Successfully processed: {os.path.basename(file_path)}")
         except Exception as e:
+            journal.record_failed(file_path, e)
             print(f"❌ Error processing {os.path.basename(file_path)}: {e}")
             continue
 
+    if store is not None:
+        store.close()
+        print(f"Probes stored in: {args.store}")
+
     print(f"\nBatch processing completed!")
-    print(f"Successfully processed {success_count}/{len(files)} files")
+    print(f"Successfully processed {success_count}/{len(pending)} files")
+    if skipped_count:
+        print(f"Skipped {skipped_count} files completed by a previous run")
+    print(f"Run journal: {args.journal}")
+    if cache is not None:
+        cache_stats = cache.stats()
+        print(
+            f"Design cache: {cache_stats['hits']} hits, {cache_stats['misses']} "
+            f"misses ({cache_stats['incremental']} redesigned incrementally), "
+            f"{cache_stats['entries']} entries "
+            f"({cache_stats['bytes'] / 2**20:.1f} MB)"
+        )
+    print_stats_summary(stats)
+    if args.stats:
+        for path in stats.write(args.stats):
+            print(f"Statistics saved to: {path}")
+
+
+def print_stats_summary(stats):
+    """Batch-level probe statistics of a DesignStats"""
+    summary = stats.summary()
+    if not summary["transcripts"]:
+        return
+    print(
+        f"Probes: {summary['filt_probes']} passing of {summary['all_probes']} "
+        f"({100 * summary['pass_rate']:.1f}%) on {summary['transcripts']} "
+        f"transcripts ({summary['transcripts_without_probes']} without probes)"
+    )
+    print(
+        f"Density: {summary['probes_per_kb']:.2f} probes/kb, "
+        f"{100 * summary['coverage']:.1f}% of bases covered"
+    )
+    failures = [
+        f"{rule} {summary[f'failed_{rule}']}"
+        for rule in FILTER_RULES
+        if summary[f"failed_{rule}"]
+    ]
+    if failures:
+        print(f"Probes failing each filter: {', '.join(failures)}")
 
 
 if __name__ == "__main__":
@@ -1,18 +1,15 @@
 # oligostan_core.py - UPDATED with dustmasker integration
-import pandas as pd
 import numpy as np
-from thermodynamics import dg_calc_rna_37, dg37_score_calc
+from thermodynamics import get_thermo_model, thermo_model_from_settings
+from composition import SequenceComposition
+from probe_batch import ProbeBatch, FLAG_BITS
 from filters import (
-    is_ok_4_pnas_filter,
-    is_ok_4_gc_filter,
     dustmasker_filter,
-    is_it_ok_4_a_comp,
-    is_it_ok_4_a_stack,
-    is_it_ok_4_c_comp,
-    is_it_ok_4_c_stack,
-    is_it_ok_4_c_spec_stack,
+    dustmasker_mask_sequence,
+    composition_filter_flags,
+    window_filter_flags,
 )
-from config import DEFAULT_SETTINGS, FLAP_SEQUENCES
+from config import DEFAULT_SETTINGS
 
 
 def which_max_r(x):
@@ -26,128 +23,278 @@ def which_max_r(x):
         return [max_indices[0] + 1, max_val]  # Return 1-based index
 
 
-def get_probes_from_rna_dg37(
-    seq,
+def best_window_scores(
+    composition,
+    nb_positions,
     min_size_probe=26,
     max_size_probe=32,
     desired_dg=-32,
-    min_score_value=0.9,
-    inc_betw_prob=2,
+    window_mask=None,
+    thermo_model=None,
+    with_dg=False,
 ):
-    """Exact translation of getProbesFromRNAdG37 from R"""
-    if isinstance(seq, list):
-        seq = "".join(seq).upper()
-
-    diff_size = max_size_probe - min_size_probe
-
-    # R: dGCalc.RNA.37(Seq, ProbeLength = MaxSizeProbe) -> TheTmsTmp
-    the_tms_tmp = dg_calc_rna_37(seq, probe_length=max_size_probe)
-    nb_of_probes = len(the_tms_tmp)
-
-    # Build matrix like R: start with max size, then add smaller sizes
-    if diff_size > 0:
-        # R: for (i in seq(DiffSize - 1, 0, -1))
-        # R builds columns from right to left: max_size, max_size-1, ..., min_size
-        all_columns = [the_tms_tmp]  # Start with max size
-
-        for i in range(diff_size - 1, -1, -1):
-            probe_length = min_size_probe + i
-            dg_values = dg_calc_rna_37(seq, probe_length=probe_length)
-            # Truncate to match shortest length
-            min_len = min(len(dg_values), nb_of_probes)
-            all_columns.insert(0, dg_values[:min_len])  # Insert at beginning
-
-        # Build matrix: rows = positions, columns = probe sizes (min to max)
-        max_len = max(len(col) for col in all_columns)
-        the_tms_matrix = np.full((max_len, diff_size + 1), np.nan)
-
-        for col_idx, column in enumerate(all_columns):
-            the_tms_matrix[: len(column), col_idx] = column
-
-    else:
-        # Only one size
-        the_tms_matrix = np.array(the_tms_tmp).reshape(-1, 1)
-
+    """
+    Best probe size and dG score of each start position (0 .. nb_positions-1)
+    Vectorized form of R's TmScores / apply(TmScores, 1, WhichMax) step:
+    returns (sizes, scores) arrays, ties resolving to MinSizeProbe, plus the
+    dG of each best window with with_dg=True.
+    """
+    if thermo_model is None:
+        thermo_model = get_thermo_model()
+    if nb_positions <= 0:
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0))
+        return empty + (np.zeros(0),) if with_dg else empty
+
+    # Columns = probe sizes (min to max), each window dG truncated to the
+    # positions where a MaxSizeProbe window fits, like R's TheTmsTmp matrix
+    tm_dg = np.empty((nb_positions, max_size_probe - min_size_probe + 1))
+    for col, probe_length in enumerate(range(min_size_probe, max_size_probe + 1)):
+        tm_dg[:, col] = thermo_model.window_dg(composition, probe_length)[:nb_positions]
     # R: dG37ScoreCalc(TheTmsTmp, Desireddg) -> TmScores
-    tm_scores = np.zeros_like(the_tms_matrix)
-    for col in range(the_tms_matrix.shape[1]):
-        valid_mask = ~np.isnan(the_tms_matrix[:, col])
-        if np.any(valid_mask):
-            tm_scores[valid_mask, col] = dg37_score_calc(
-                the_tms_matrix[valid_mask, col], desired_dg
-            )
+    tm_scores = (-0.1 * np.abs(tm_dg - desired_dg)) + 1
 
-    # R: t(apply(TmScores, 1, WhichMax)) -> BestScores
-    best_scores = []
-    for row in range(tm_scores.shape[0]):
-        row_data = tm_scores[row, :]
-        if not np.all(np.isnan(row_data)) and not np.all(row_data == 0):
-            valid_data = row_data[~np.isnan(row_data)]
-            if len(valid_data) > 0:
-                result = which_max_r(valid_data)
-                best_scores.append(result)
-            else:
-                best_scores.append([0, 0])
-        else:
-            best_scores.append([0, 0])
+    # Filter-before-select: failing windows can never win a position
+    if window_mask is not None:
+        tm_scores = np.where(window_mask[:nb_positions], tm_scores, -np.inf)
 
-    best_scores = np.array(best_scores)
-
-    # R: BestScores[, 1] + (MinSizeProbe - 1) -> BestScores[, 1]
-    # Convert column index to actual probe size
-    for i in range(len(best_scores)):
-        if best_scores[i, 0] != 0:  # Not a tie
-            # R adds (MinSizeProbe - 1) to the column index
-            best_scores[i, 0] = best_scores[i, 0] + (min_size_probe - 1)
-        else:  # Tie case - use minimum size
-            best_scores[i, 0] = min_size_probe
+    # R: t(apply(TmScores, 1, WhichMax)) -> BestScores
+    scores = tm_scores.max(axis=1)
+    is_max = tm_scores == scores[:, None]
+    first_max = is_max.argmax(axis=1)
+    tied = is_max.sum(axis=1) >= 2
+    if window_mask is not None:
+        # Ties must resolve to a passing size, not MinSizeProbe
+        tied &= ~np.isfinite(scores)
+
+    # R: BestScores[, 1] + (MinSizeProbe - 1); ties use MinSizeProbe
+    sizes = np.where(tied, min_size_probe, first_max + min_size_probe)
+
+    # Rows of zero scores count as no best score
+    all_zero = (tm_scores == 0).all(axis=1)
+    sizes[all_zero] = min_size_probe
+    scores[all_zero] = 0
+
+    if with_dg:
+        # Kept so selected probes need no dG37 rescoring
+        return sizes, scores, tm_dg[np.arange(nb_positions), sizes - min_size_probe]
+    return sizes, scores
+
+
+def composition_masked_bases(composition, start, end):
+    """Dustmasker flags of bases start..end-1 recovered from a composition"""
+    if composition is None or composition.cum_masked is None:
+        return None
+    return np.diff(composition.cum_masked[start : end + 1]) > 0
 
-    # R: cbind(BestScores, seq(1:length(BestScores[, 1]))) -> BestScores
-    positions = np.arange(1, len(best_scores) + 1).reshape(-1, 1)
-    best_scores_with_pos = np.column_stack([best_scores, positions])
 
+def greedy_select(
+    sizes, scores, min_score_value=0.9, inc_betw_prob=2, pointeur=0, offset=0
+):
+    """
+    Greedy probe walk of getProbesFromRNAdG37 over best_window_scores output
+    sizes/scores describe start positions offset+1, offset+2, ... (1-based).
+    Starting from pointeur, yields (size, score, position, next pointeur) of
+    every selected probe; pointeur carries over between consecutive calls.
+    """
     # R: BestScores[BestScores[, 2] >= MinScoreValue, ] -> ValidedScores
-    validated_scores = best_scores_with_pos[
-        best_scores_with_pos[:, 1] >= min_score_value
-    ]
-
-    if len(validated_scores) == 0:
-        return None
+    validated = np.flatnonzero(scores >= min_score_value)
+    # 1-based positions, already in increasing order
+    validated_positions = validated + offset + 1
 
-    # Apply spacing constraint exactly like R
-    the_probes = []
+    idx = np.searchsorted(validated_positions, pointeur)
+    while idx < len(validated):
+        row = validated[idx]
+        probe_size = int(sizes[row])
+        position = int(validated_positions[idx])
 
-    # R: ValidedScores[order(ValidedScores[, 3]), ] -> ValidedScores
-    if len(validated_scores.shape) == 1:
-        validated_scores = validated_scores.reshape(1, -1)
+        # R: Pointeur <- (ValiTmp[1, 3] + ValiTmp[1, 1] + IncBetwProb)
+        pointeur = position + probe_size + inc_betw_prob
+        yield probe_size, scores[row], position, pointeur
+        idx = np.searchsorted(validated_positions, pointeur)
 
-    validated_scores = validated_scores[np.argsort(validated_scores[:, 2])]
 
-    pointeur = 0  # R starts with 0
-    while pointeur < len(seq):
-        # R: ValidedScores[ValidedScores[, 3] >= Pointeur, ]
-        valid_tmp = validated_scores[validated_scores[:, 2] >= pointeur]
+def iter_window_scores(
+    seq,
+    min_size_probe=26,
+    max_size_probe=32,
+    desired_dg=-32,
+    window_mask=None,
+    composition=None,
+    thermo_model=None,
+    chunk_size=None,
+    masked_bases=None,
+):
+    """
+    (chunk start, sizes, scores, dgs) of best_window_scores over all start
+    positions of seq, chunk_size positions at a time (see get_probe_batch)
+    """
+    if thermo_model is None:
+        thermo_model = get_thermo_model()
+
+    nb_positions = len(seq) - max_size_probe + 1
+    if chunk_size is None or chunk_size >= nb_positions:
+        chunk_size = max(nb_positions, 1)
+    elif masked_bases is None and composition is not None:
+        masked_bases = composition_masked_bases(composition, 0, len(seq))
+
+    for chunk_start in range(0, max(nb_positions, 0), chunk_size):
+        chunk_positions = min(chunk_size, nb_positions - chunk_start)
+        chunk_end = chunk_start + chunk_positions + max_size_probe - 1
+
+        if chunk_positions == nb_positions:
+            # Whole sequence in one go
+            chunk_composition = composition
+            if chunk_composition is None:
+                chunk_composition = SequenceComposition(seq, masked_bases=masked_bases)
+            chunk_mask = window_mask
+        else:
+            chunk_composition = SequenceComposition(
+                seq[chunk_start:chunk_end],
+                masked_bases=(
+                    None
+                    if masked_bases is None
+                    else masked_bases[chunk_start:chunk_end]
+                ),
+            )
+            chunk_mask = window_mask
+            if window_mask is not None and not callable(window_mask):
+                chunk_mask = window_mask[chunk_start : chunk_start + chunk_positions]
+
+        if callable(chunk_mask):
+            chunk_mask = chunk_mask(chunk_composition)
+
+        yield (chunk_start,) + best_window_scores(
+            chunk_composition,
+            chunk_positions,
+            min_size_probe,
+            max_size_probe,
+            desired_dg,
+            chunk_mask,
+            thermo_model,
+            with_dg=True,
+        )
 
-        if len(valid_tmp) > 0:
-            if len(valid_tmp.shape) == 1:
-                valid_tmp = valid_tmp.reshape(1, -1)
 
-            # Take first valid probe
-            probe_size = int(valid_tmp[0, 0])
-            score = valid_tmp[0, 1]
-            position = int(valid_tmp[0, 2])
+def get_probe_batch(
+    seq,
+    min_size_probe=26,
+    max_size_probe=32,
+    desired_dg=-32,
+    min_score_value=0.9,
+    inc_betw_prob=2,
+    window_mask=None,
+    composition=None,
+    thermo_model=None,
+    chunk_size=None,
+    masked_bases=None,
+):
+    """Exact translation of getProbesFromRNAdG37 from R, as a ProbeBatch
+
+    window_mask (optional): boolean matrix (positions x sizes) from
+    build_window_filter_mask, or a function building it from a
+    SequenceComposition. Failing windows are never selected, so the
+    greedy walk can fill their slot with a nearby passing window.
+    composition (optional): SequenceComposition of seq, shared with the filters
+    thermo_model (optional): NearestNeighborModel, default Sugimoto RNA/DNA
+    chunk_size (optional): score and select chunk_size start positions at a
+    time (each chunk reads max_size_probe - 1 extra bases), so long sequences
+    use bounded memory; the output is identical.
+    masked_bases (optional): dustmasker flags per base for chunk compositions
+    when no composition is given
+    """
+    if isinstance(seq, list):
+        seq = "".join(seq).upper()
+    if thermo_model is None:
+        thermo_model = get_thermo_model()
 
-            # R: substr(Seq, start = ValiTmp[1, 3], stop = (ValiTmp[1, 3] + ValiTmp[1, 1] - 1))
-            probe_seq = seq[position - 1 : position - 1 + probe_size].upper()
+    probe_sizes = []
+    probe_scores = []
+    probe_positions = []
+    probe_dgs = []
+    pointeur = 0  # R starts with 0
+    for chunk_start, sizes, scores, dgs in iter_window_scores(
+        seq,
+        min_size_probe,
+        max_size_probe,
+        desired_dg,
+        window_mask,
+        composition,
+        thermo_model,
+        chunk_size,
+        masked_bases,
+    ):
+        # Greedy walk; Pointeur carries over from the previous chunk
+        for probe_size, score, position, pointeur in greedy_select(
+            sizes, scores, min_score_value, inc_betw_prob, pointeur, chunk_start
+        ):
+            # The probe is the substring of Seq at (position, size)
+            probe_sizes.append(probe_size)
+            probe_scores.append(score)
+            probe_positions.append(position)
+            probe_dgs.append(dgs[position - chunk_start - 1])
+
+    batch = ProbeBatch(seq, probe_sizes, probe_scores, probe_positions)
+    batch.set_dg37(probe_dgs, thermo_model)
+    return batch
+
+
+def get_probes_from_rna_dg37(seq, *args, **kwargs):
+    """getProbesFromRNAdG37 as [size, score, position, seq] lists (None if none)
+    Adapter over get_probe_batch, same arguments"""
+    if isinstance(seq, list):
+        seq = "".join(seq).upper()
+    batch = get_probe_batch(seq, *args, **kwargs)
+    if len(batch) == 0:
+        return None
+    return batch.to_probe_list()
+
+
+def build_sequence_composition(seq, **params):
+    """
+    SequenceComposition shared by the dG engine and all filters of one sequence
+    In filter-before-select mode with dustmasker enabled, dustmasker runs once
+    on the whole transcript so the masking flag is a window lookup too.
+    """
+    masked_bases = None
+    if params.get("filter_before_select", False) and params.get(
+        "use_dustmasker", False
+    ):
+        masked_bases = dustmasker_mask_sequence(seq.upper())
+
+    return SequenceComposition(seq, masked_bases=masked_bases)
+
+
+def build_window_filter_mask(seq, min_size_probe=26, max_size_probe=32, **params):
+    """
+    Filter-before-select mode: GC, PNAS and dustmasker flags for every
+    candidate window, combined into the mask used by get_probes_from_rna_dg37
+    seq can be a sequence string or a prebuilt SequenceComposition.
+    """
+    if isinstance(seq, SequenceComposition):
+        composition = seq
+    else:
+        composition = build_sequence_composition(
+            seq, **dict(params, filter_before_select=True)
+        )
 
-            the_probes.append([probe_size, score, position, probe_seq])
+    nb_positions = composition.length - max_size_probe + 1
+    probe_lengths = list(range(min_size_probe, max_size_probe + 1))
 
-            # R: Pointeur <- (ValiTmp[1, 3] + ValiTmp[1, 1] + IncBetwProb)
-            pointeur = position + probe_size + inc_betw_prob
-        else:
-            break
+    flags = window_filter_flags(
+        composition,
+        probe_lengths,
+        nb_positions,
+        min_gc=params.get("min_gc", DEFAULT_SETTINGS["min_gc"]),
+        max_gc=params.get("max_gc", DEFAULT_SETTINGS["max_gc"]),
+        pnas_filter_option=params.get(
+            "pnas_filter_option", DEFAULT_SETTINGS["pnas_filter_option"]
+        ),
+        max_masked_percent=params.get(
+            "max_masked_percent", DEFAULT_SETTINGS["max_masked_percent"]
+        ),
+    )
 
-    return the_probes
+    return flags["GCFilter"] & flags["PNASFilter"] & flags["MaskedFilter"]
 
 
 def optimize_dg37_selection(sequences, dg37_range=None, **params):
@@ -155,102 +302,87 @@ def optimize_dg37_selection(sequences, dg37_range=None, **params):
     return params.get("fixed_dg37_value", -32.0)
 
 
-def process_probes_for_output(probes, seq_data, dg37_value, **params):
-    """Process probes exactly like R script - UPDATED with optional dustmasker"""
-    processed_probes = []
+def score_probe_batch(batch, composition=None, **params):
+    """Fill dG37, GC%, filter flags and masked % of a ProbeBatch (R output)
+
+    composition (optional): SequenceComposition of the batch's sequence; the
+    GC/PNAS flags of all probes are then looked up from its prefix sums.
+    Without it only the probe sequences are scanned (every flag depends on
+    the probe's own bases), which keeps long sequences cheap. A composition
+    carrying a dustmasker mask also gives MaskedFilter and masked %.
+    """
+    thermo_model = thermo_model_from_settings(**params)
+    probe_sizes = batch.sizes
+
+    # Whole-transcript dustmasker mask (filter-before-select mode): the
+    # output flag uses the mask the probes were selected against
+    sequence_mask = composition is not None and composition.cum_masked is not None
+
+    if composition is None:
+        # Probe sequences laid end to end, each probe its own window
+        composition = SequenceComposition("".join(batch.probe_sequences()))
+        probe_starts = np.cumsum(probe_sizes) - probe_sizes
+    else:
+        probe_starts = batch.starts
+
+    # All GC/PNAS filters at once from the shared prefix sums
+    window_flags = composition_filter_flags(
+        composition,
+        probe_starts,
+        probe_sizes,
+        min_gc=params.get("min_gc", DEFAULT_SETTINGS["min_gc"]),
+        max_gc=params.get("max_gc", DEFAULT_SETTINGS["max_gc"]),
+        pnas_filter_option=params.get(
+            "pnas_filter_option", DEFAULT_SETTINGS["pnas_filter_option"]
+        ),
+    )
+    for name in FLAG_BITS:
+        if name in window_flags and name != "MaskedFilter":
+            batch.set_flag(name, window_flags[name])
+
+    # Calculate GC percentage
+    gc_counts = composition.count("G", probe_starts, probe_sizes) + composition.count(
+        "C", probe_starts, probe_sizes
+    )
+    batch.gc_percent = gc_counts / probe_sizes
+
+    # Actual dG37 of each probe: kept from selection if designed with this
+    # model, otherwise (e.g. imported probes) scored in one batch call
+    if batch.dg37 is None or batch.dg37_model != thermo_model.key:
+        batch.set_dg37(thermo_model.batch_dg(batch.probe_sequences()), thermo_model)
 
     # RESTORED: Apply dustmasker filter if enabled
     use_dustmasker = params.get("use_dustmasker", False)
     max_masked_percent = params.get("max_masked_percent", 0.1)
 
-    if use_dustmasker and probes:
-        # Extract sequences for dustmasker
-        probe_sequences = [probe[3] for probe in probes]
+    if use_dustmasker and sequence_mask:
+        masked_percentages = composition.masked_fraction(probe_starts, probe_sizes)
+        dustmasker_results = masked_percentages <= max_masked_percent
+    elif use_dustmasker and len(batch):
         dustmasker_results, masked_percentages = dustmasker_filter(
-            probe_sequences, max_masked_percent
+            batch.probe_sequences(), max_masked_percent
         )
     else:
         # Default: pass all probes (MaskedFilter <- FALSE behavior)
-        dustmasker_results = [True] * len(probes) if probes else []
-        masked_percentages = [0.0] * len(probes) if probes else []
-
-    for i, probe in enumerate(probes):
-        probe_size, score, position, sequence = probe
-
-        # Ensure sequence is uppercase
-        sequence = sequence.upper()
-
-        # R position calculation:
-        # (seqlength - ProbeList[[probeListNb]][i, 3] + 1) -> EndPosTmp
-        # (EndPosTmp - ProbeList[[probeListNb]][i, 1]) -> StartPosTmp
-        seq_length = len(seq_data["sequence"])
-        the_end_pos = seq_length - position + 1
-        the_start_pos = the_end_pos - probe_size  # FIXED: Removed +1 to match R exactly
-
-        # Recalculate actual dG37 for this probe
-        actual_dg37 = dg_calc_rna_37(sequence, probe_length=len(sequence))[0]
-
-        # Calculate GC percentage
-        gc_count = sequence.count("G") + sequence.count("C")
-        gc_percentage = gc_count / len(sequence)
-
-        # All filters
-        gc_filter_pass = (
-            1
-            if is_ok_4_gc_filter(
-                sequence, DEFAULT_SETTINGS["min_gc"], DEFAULT_SETTINGS["max_gc"]
-            )
-            else 0
-        )
-        a_comp_pass = 1 if is_it_ok_4_a_comp(sequence) else 0
-        a_stack_pass = 1 if is_it_ok_4_a_stack(sequence) else 0
-        c_comp_pass = 1 if is_it_ok_4_c_comp(sequence) else 0
-        c_stack_pass = 1 if is_it_ok_4_c_stack(sequence) else 0
-        c_spec_pass = 1 if is_it_ok_4_c_spec_stack(sequence) else 0
-        pnas_filter_pass = (
-            1
-            if is_ok_4_pnas_filter(sequence, DEFAULT_SETTINGS["pnas_filter_option"])
-            else 0
-        )
+        dustmasker_results = [True] * len(batch)
+        masked_percentages = [0.0] * len(batch)
 
-        # RESTORED: dustmasker filter results
-        dustmasker_pass = (
-            1 if (i < len(dustmasker_results) and dustmasker_results[i]) else 0
-        )
-        repeat_masker_pc = masked_percentages[i] if i < len(masked_percentages) else 0.0
+    batch.set_flag("MaskedFilter", np.array(dustmasker_results, dtype=bool))
+    batch.masked_percent = np.array(masked_percentages, dtype=np.float64)
+    return batch
 
-        # PNAS sum
-        nb_of_pnas = (
-            a_comp_pass + a_stack_pass + c_comp_pass + c_stack_pass + c_spec_pass
-        )
 
-        # Format exactly like R output
-        probe_info = {
-            "dGOpt": dg37_value,  # NUMBER, not string
-            "ProbesNames": seq_data["name"] + f" probe {i+1}",
-            "theStartPos": the_start_pos,  # FIXED: Now matches R positions
-            "theEndPos": the_end_pos,
-            "ProbeSize": probe_size,
-            "Seq": sequence,
-            "dGScore": score,
-            "dG37": actual_dg37,
-            "GCpc": gc_percentage,
-            "GCFilter": gc_filter_pass,
-            "aCompFilter": a_comp_pass,
-            "aStackFilter": a_stack_pass,
-            "cCompFilter": c_comp_pass,
-            "cStackFilter": c_stack_pass,
-            "cSpecStackFilter": c_spec_pass,
-            "NbOfPNAS": nb_of_pnas,
-            "PNASFilter": pnas_filter_pass,
-            "MaskedFilter": dustmasker_pass,  # RESTORED: dustmasker filter result
-            "RepeatMaskerPC": repeat_masker_pc,  # RESTORED: masked percentage
-            "InsideUTR": 0,
-            "HybFlpX": sequence + FLAP_SEQUENCES["X"],
-            "HybFlpY": sequence + FLAP_SEQUENCES["Y"],
-            "HybFlpZ": sequence + FLAP_SEQUENCES["Z"],
-        }
-
-        processed_probes.append(probe_info)
-
-    return processed_probes
+def process_probes_for_output(probes, seq_data, dg37_value, composition=None, **params):
+    """Process probes exactly like R script - UPDATED with optional dustmasker
+
+    probes: [size, score, position, seq] lists or a ProbeBatch
+    Returns one dict per probe; see score_probe_batch and
+    ProbeBatch.to_dataframe for the array-backed path.
+    """
+    if isinstance(probes, ProbeBatch):
+        batch = probes
+    else:
+        batch = ProbeBatch.from_probe_list(probes, seq_data["sequence"])
+
+    score_probe_batch(batch, composition, **params)
+    return batch.to_dicts(seq_data["name"], dg37_value)
@@ -0,0 +1,131 @@
+# bench_scheduler.py - per-file dispatch vs the longest-first scheduler
+# on a skewed transcript length distribution
+#
+#   python bench_scheduler.py --jobs 8 [--structures]
+#
+# Wall-clock gains need as many cores as jobs; the simulated makespans
+# (estimated costs list-scheduled on jobs workers) show the expected gain.
+import sys
+import os
+import argparse
+import heapq
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Add the PARENT directory to path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import random_sequence, write_fasta
+from config import DesignSettings
+from main import design_files_parallel, design_sequences
+from scheduler import (
+    position_count,
+    record_cost,
+    select_cost,
+    split_ranges,
+    window_cost,
+)
+from sequence_utils import read_fasta_sequences
+
+
+def skewed_lengths(rng, nb_transcripts, nb_giants):
+    """Mostly 0.1-5 kb transcripts, plus a few of 100-400 kb"""
+    lengths = [
+        int(min(max(rng.lognormvariate(7.5, 0.8), 100), 20000))
+        for _ in range(nb_transcripts - nb_giants)
+    ]
+    lengths += [rng.randint(100000, 400000) for _ in range(nb_giants)]
+    rng.shuffle(lengths)
+    return lengths
+
+
+def _design_file(path, settings):
+    return design_sequences(read_fasta_sequences(path), settings=settings)
+
+
+def per_file_dispatch(files, jobs, settings):
+    """One task per input in input order (design_files_parallel before)"""
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(_design_file, path, settings) for path in files]
+        return [future.result() for future in futures]
+
+
+def makespan(costs, jobs):
+    """Finish time of costs list-scheduled in order on jobs workers"""
+    loads = [0.0] * jobs
+    for cost in costs:
+        heapq.heapreplace(loads, loads[0] + cost)
+    return max(loads)
+
+
+def scheduled_costs(lengths, settings):
+    """Task costs of the scheduler (split records; select stage last)"""
+    costs, followers = [], []
+    for length in lengths:
+        ranges = split_ranges(
+            position_count(length, settings),
+            settings["schedule_split_length"],
+        )
+        if len(ranges) < 2:
+            costs.append(record_cost(length, settings))
+        else:
+            costs += [window_cost(end - first, settings) for first, end in ranges]
+            followers.append(select_cost(length, settings))
+    return sorted(costs, reverse=True) + sorted(followers, reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--transcripts", type=int, default=400)
+    parser.add_argument("--giants", type=int, default=4)
+    parser.add_argument("--structures", action="store_true")
+    args = parser.parse_args()
+
+    settings = DesignSettings(structure_scoring=args.structures)
+    if not shutil.which("dustmasker"):
+        settings = settings.replace(use_dustmasker=False)
+    rng = random.Random(0)
+    lengths = skewed_lengths(rng, args.transcripts, args.giants)
+    print(
+        f"{len(lengths)} transcripts, {sum(lengths) / 1e6:.1f} Mb, "
+        f"median {sorted(lengths)[len(lengths) // 2]} nt, max {max(lengths)} nt; "
+        f"{args.jobs} jobs on {os.cpu_count()} CPUs"
+    )
+
+    per_file = makespan(
+        [record_cost(length, settings) for length in lengths], args.jobs
+    )
+    scheduled = makespan(scheduled_costs(lengths, settings), args.jobs)
+    print(
+        f"Simulated makespan: per-file {per_file:.3g}, longest-first {scheduled:.3g} "
+        f"({per_file / scheduled:.2f}x)"
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for i, length in enumerate(lengths):
+            path = os.path.join(tmp, f"transcript{i}.fa")
+            files.append(write_fasta(path, {f"t{i}": random_sequence(rng, length)}))
+
+        start = time.perf_counter()
+        per_file_dispatch(files, args.jobs, settings)
+        per_file = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _, _, error in design_files_parallel(files, args.jobs, settings=settings):
+            if error is not None:
+                raise error
+        scheduled = time.perf_counter() - start
+
+    print(
+        f"Wall clock: per-file {per_file:.2f} s, longest-first {scheduled:.2f} s "
+        f"({per_file / scheduled:.2f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+# helpers.py - random sequences and FASTA inputs shared by the tests
+import random
+from pathlib import Path
+
+
+def random_sequence(seed, length, alphabet="ACGT"):
+    """Random sequence of length bases
+    seed: a number, or a random.Random whose draws go on from call to call"""
+    rng = seed if isinstance(seed, random.Random) else random.Random(seed)
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+
+def write_fasta(path, records):
+    """
+    Write a FASTA file, returns its path as a string
+    records: {header: sequence}, or sequences (headed 0, 1, ...); the
+    directory of path is created if needed.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if not isinstance(records, dict):
+        records = dict(enumerate(records))
+    path.write_text("".join(f">{name}\n{seq}\n" for name, seq in records.items()))
+    return str(path)
@@ -0,0 +1,57 @@
+# test_chunked_scoring.py - chunked scoring selects exactly the same probes
+import sys
+import os
+from functools import partial
+
+# Add the PARENT directory to path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import random_sequence
+from oligostan_core import (
+    build_window_filter_mask,
+    get_probes_from_rna_dg37,
+    process_probes_for_output,
+)
+from composition import SequenceComposition
+from config import DEFAULT_SETTINGS
+
+
+def test_chunks_match_whole_sequence():
+    for seed, alphabet in [(0, "ACGT"), (1, "AACGTTN")]:
+        seq = random_sequence(seed, 4000, alphabet)
+        whole = get_probes_from_rna_dg37(seq, desired_dg=-32)
+        # Chunk sizes that cut through selected probes and spacing gaps
+        for chunk_size in [1, 29, 500, 3969]:
+            assert (
+                get_probes_from_rna_dg37(seq, desired_dg=-32, chunk_size=chunk_size)
+                == whole
+            )
+
+
+def test_chunked_filter_before_select():
+    seq = random_sequence(2, 3000)
+    mask_fn = partial(build_window_filter_mask, min_size_probe=26, max_size_probe=32)
+    whole = get_probes_from_rna_dg37(
+        seq, window_mask=build_window_filter_mask(seq, 26, 32)
+    )
+    assert whole
+    assert get_probes_from_rna_dg37(seq, window_mask=mask_fn, chunk_size=250) == whole
+
+
+def test_output_without_full_composition():
+    seq = random_sequence(3, 3000)
+    probes = get_probes_from_rna_dg37(seq)
+    seq_data = {"name": "gene", "sequence": seq}
+    settings = dict(DEFAULT_SETTINGS, use_dustmasker=False)
+
+    expected = process_probes_for_output(
+        probes, seq_data, -32, composition=SequenceComposition(seq), **settings
+    )
+    assert process_probes_for_output(probes, seq_data, -32, **settings) == expected
+
+
+if __name__ == "__main__":
+    test_chunks_match_whole_sequence()
+    test_chunked_filter_before_select()
+    test_output_without_full_composition()
+    print("✅ chunked scoring tests passed")
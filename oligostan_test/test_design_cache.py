@@ -0,0 +1,84 @@
+# test_design_cache.py - cached designs give byte-identical outputs
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+# Add the PARENT directory to path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import random_sequence, write_fasta
+from design_cache import DesignCache, design_key
+from main import process_single_file
+from config import DEFAULT_SETTINGS
+
+
+def test_cached_outputs_identical(tmp_path):
+    records = [random_sequence(0, 3000), "ACGT" * 5, random_sequence(1, 1500)]
+    cache = DesignCache(str(tmp_path / "cache"))
+
+    fresh = process_single_file(write_fasta(tmp_path / "fresh" / "gene.fa", records))
+    first = process_single_file(
+        write_fasta(tmp_path / "first" / "gene.fa", records), cache=cache
+    )
+    # Same transcripts under another file name: all hits, names rewritten
+    renamed = write_fasta(tmp_path / "renamed" / "other.fa", records)
+    renamed_outputs = process_single_file(renamed, cache=cache)
+    second = process_single_file(
+        write_fasta(tmp_path / "second" / "gene.fa", records), cache=cache
+    )
+
+    for outputs in (first, second):
+        for path, expected in zip(outputs, fresh):
+            assert Path(path).read_bytes() == Path(expected).read_bytes()
+    renamed_all = Path(renamed_outputs[0]).read_text()
+    assert renamed_all == Path(fresh[0]).read_text().replace(
+        "gene probe", "other probe"
+    )
+
+    stats = cache.stats()
+    assert (stats["misses"], stats["hits"], stats["entries"]) == (3, 6, 3)
+
+
+def test_key_follows_settings():
+    seq = random_sequence(2, 100)
+    key = design_key(seq, DEFAULT_SETTINGS)
+    assert design_key(seq, dict(DEFAULT_SETTINGS)) == key
+    assert design_key(seq, dict(DEFAULT_SETTINGS, score_min=0.8)) != key
+    assert design_key(seq[1:], DEFAULT_SETTINGS) != key
+    # Output-only settings do not invalidate designs
+    assert design_key(seq, dict(DEFAULT_SETTINGS, design_jobs=4)) == key
+
+
+def test_size_eviction(tmp_path):
+    cache = DesignCache(str(tmp_path), max_bytes=0)
+    cache.store("ACGT", DEFAULT_SETTINGS, None)
+    assert cache.stats()["entries"] == 0
+    assert cache.evictions == 1
+    assert cache.lookup("ACGT", DEFAULT_SETTINGS, "gene") == (False, None)
+
+
+def test_directory_scanned_on_eviction_only(tmp_path):
+    cache = DesignCache(str(tmp_path), max_bytes=100000)
+    scans = []
+    entries = cache._entries
+    cache._entries = lambda: scans.append(1) or entries()
+    for i in range(200):
+        # About 1 kB entries: the cache holds about 100
+        cache.store(random_sequence(i, 50), DEFAULT_SETTINGS, "x" * 1000)
+        assert cache._total_bytes == cache.stats()["bytes"] <= 100000
+        scans.pop()  # stats()
+    # Each eviction frees 10% of max_bytes: a few scans for 200 stores
+    assert cache.evictions > 0
+    assert len(scans) < 200 // 10
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        test_cached_outputs_identical(Path(tmp))
+    test_key_follows_settings()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_size_eviction(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_directory_scanned_on_eviction_only(Path(tmp))
+    print("✅ design cache tests passed")
@@ -0,0 +1,186 @@
+# test_design_service.py - local design service over HTTP and a Unix socket
+import sys
+import os
+import json
+import socket
+import tempfile
+import threading
+import http.client
+from pathlib import Path
+
+# Add the PARENT directory to path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import random_sequence, write_fasta
+import design_service
+from design_cache import DesignCache
+from design_service import DesignService, make_server
+from main import build_output_tables, design_sequences
+from sequence_utils import read_fasta_sequences
+
+
+def expected_design(tmp_path, name, sequence):
+    """What main.py writes for a FASTA file holding sequence"""
+    fasta = write_fasta(tmp_path / f"{name}.fa", {name: sequence})
+    all_df, filtered_df = build_output_tables(
+        design_sequences(read_fasta_sequences(fasta))
+    )
+    return all_df.to_dict("records"), filtered_df.to_dict("records")
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        super().__init__("localhost")
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+
+def request(connection, method, path, payload=None):
+    body = None if payload is None else json.dumps(payload)
+    connection.request(method, path, body=body)
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def serve(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_queued_requests_share_a_batch(tmp_path):
+    service = DesignService(max_batch=8, max_wait_ms=50)
+    sequences = {f"gene{i}": random_sequence(i, 1500) for i in range(5)}
+    # Queued before the worker starts, so all five are batched together
+    futures = {name: service.submit(name, seq) for name, seq in sequences.items()}
+    with service.start(warmup=False):
+        for name, future in futures.items():
+            result = future.result(timeout=60)
+            all_records, filtered_records = expected_design(
+                tmp_path, name, sequences[name]
+            )
+            assert result["probes"] == all_records
+            assert result["filtered"] == filtered_records
+
+    metrics = service.metrics.snapshot()
+    assert metrics["requests"] == 5
+    assert metrics["batches"] == 1
+    assert metrics["latency_ms"]["max"] > 0
+
+
+def test_anonymous_requests_keep_no_design_state(tmp_path):
+    cache = DesignCache(str(tmp_path / "cache"))
+    service = DesignService(max_batch=8, max_wait_ms=50, cache=cache)
+    sequences = [random_sequence(40 + i, 1200) for i in range(3)]
+    futures = [service.submit(None, seq) for seq in sequences]
+    with service.start(warmup=False):
+        results = [future.result(timeout=60) for future in futures]
+        service.design("gene", random_sequence(43, 1200), timeout=60)
+    for result, sequence in zip(results, sequences):
+        assert result["name"] == "query"
+        assert result["probes"] == expected_design(tmp_path, "query", sequence)[0]
+    assert cache.lookup_state("query:0", service.settings) is None
+    assert cache.lookup_state("gene:0", service.settings) is not None
+
+
+def test_failed_request_does_not_stop_the_worker():
+    build = design_service.build_output_tables
+
+    def failing_build(probes_data, settings=None):
+        if probes_data is not None and probes_data["ProbesNames"][0].startswith("bad"):
+            raise RuntimeError("output tables failed")
+        return build(probes_data, settings)
+
+    design_service.build_output_tables = failing_build
+    try:
+        service = DesignService(max_batch=8, max_wait_ms=50)
+        bad = service.submit("bad", random_sequence(30, 1000))
+        good = service.submit("good", random_sequence(31, 1000))
+        with service.start(warmup=False):
+            try:
+                bad.result(timeout=60)
+            except RuntimeError:
+                pass
+            else:
+                raise AssertionError("failed request answered")
+            assert good.result(timeout=60)["nb_probes"] > 0
+            # Still serving after the failure
+            assert service.alive()
+            later = service.design("later", random_sequence(32, 1000), timeout=60)
+            assert later["nb_probes"] > 0
+        assert not service.alive()
+        assert service.metrics.snapshot()["errors"] == 1
+    finally:
+        design_service.build_output_tables = build
+
+
+def test_http_service(tmp_path):
+    service = DesignService(max_wait_ms=20).start(warmup=False)
+    server = make_server(service, port=0)
+    serve(server)
+    try:
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+        assert request(connection, "GET", "/health") == (200, {"status": "ok"})
+
+        sequence = random_sequence(10, 2000)
+        payload = [{"name": "a", "sequence": sequence}, {"name": "b", "sequence": "A"}]
+        status, results = request(connection, "POST", "/design", payload)
+        assert status == 200
+        assert [result["name"] for result in results] == ["a", "b"]
+        assert results[0]["probes"] == expected_design(tmp_path, "a", sequence)[0]
+        assert results[1]["nb_probes"] == 0
+
+        status, error = request(connection, "POST", "/design", {"sequence": 5})
+        assert status == 400 and "sequence" in error["error"]
+
+        # Per-request settings, served next to the service's own
+        strict = {"name": "a", "sequence": sequence, "settings": {"max_gc": 0.5}}
+        status, results = request(connection, "POST", "/design", [strict, payload[0]])
+        assert status == 200
+        assert len(results[0]["filtered"]) < len(results[1]["filtered"])
+        assert results[1]["filtered"] == expected_design(tmp_path, "a", sequence)[1]
+        status, error = request(
+            connection, "POST", "/design", dict(strict, settings={"design_jobs": 2})
+        )
+        assert status == 400 and "design_jobs" in error["error"]
+
+        status, metrics = request(connection, "GET", "/metrics")
+        assert status == 200 and metrics["requests"] == 4
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.stop()
+
+
+def test_unix_socket_service():
+    service = DesignService().start(warmup=False)
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = os.path.join(tmp, "design.sock")
+        server = make_server(service, socket_path=socket_path)
+        serve(server)
+        try:
+            connection = UnixHTTPConnection(socket_path)
+            sequence = random_sequence(20, 1000)
+            status, result = request(
+                connection, "POST", "/design", {"name": "u", "sequence": sequence}
+            )
+            assert status == 200 and result["nb_probes"] > 0
+        finally:
+            server.shutdown()
+            server.server_close()
+            service.stop()
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        test_queued_requests_share_a_batch(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_anonymous_requests_keep_no_design_state(Path(tmp))
+    test_failed_request_does_not_stop_the_worker()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_http_service(Path(tmp))
+    test_unix_socket_service()
+    print("✅ design service tests passed")
@@ -0,0 +1,95 @@
+# test_design_stats.py - batch statistics gathered while designing
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Add the PARENT directory to path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import random_sequence, write_fasta
+from design_stats import DesignStats, FILTER_RULES, covered_bases
+from main import design_files_parallel, process_single_file
+
+
+def write_inputs(tmp_path):
+    """Two inputs: one with a probe-less record, one plain"""
+    first = write_fasta(
+        tmp_path / "first.fa",
+        {"a": random_sequence(0, 3000), "short": "ACGT", "b": random_sequence(1, 800)},
+    )
+    second = write_fasta(tmp_path / "second.fa", {"c": random_sequence(2, 2000)})
+    return [first, second]
+
+
+def test_covered_bases_merges_overlaps():
+    starts = np.array([50, 0, 10, 100])
+    ends = np.array([60, 20, 30, 101])
+    assert covered_bases(starts, ends) == 30 + 10 + 1
+    assert covered_bases(np.zeros(0), np.zeros(0)) == 0
+
+
+def test_stats_match_written_outputs(tmp_path):
+    stats = DesignStats()
+    outputs = []
+    for path in write_inputs(tmp_path):
+        outputs += process_single_file(path, stats=stats)
+
+    all_df = pd.concat(
+        pd.read_csv(path, sep="\t") for path in outputs if path.endswith("_ALL.txt")
+    )
+    filt_df = pd.concat(
+        pd.read_csv(path, sep="\t") for path in outputs if path.endswith("_FILT.txt")
+    )
+    summary = stats.summary()
+    assert summary["transcripts"] == 4
+    assert summary["transcripts_without_probes"] >= 1
+    assert summary["bases"] == 3000 + 4 + 800 + 2000
+    assert summary["all_probes"] == len(all_df)
+    assert summary["filt_probes"] == len(filt_df)
+    for rule in FILTER_RULES:
+        if rule in all_df.columns:
+            assert summary[f"failed_{rule}"] == (all_df[rule] != 1).sum()
+
+    # Probes do not overlap, so coverage is their total size
+    assert stats.covered_bases == filt_df["ProbeSize"].sum()
+    table = stats.transcript_table()
+    assert table["Transcript"].tolist() == [
+        "first:0",
+        "first:1",
+        "first:2",
+        "second:0",
+    ]
+    assert table["FiltProbes"].sum() == len(filt_df)
+
+    histograms = stats.histograms()
+    coverage = histograms[histograms["Histogram"] == "coverage"]
+    assert coverage["Count"].sum() == 4
+    paths = stats.write(str(tmp_path / "batch"))
+    assert all(os.path.exists(path) for path in paths)
+
+
+def test_parallel_stats_match_sequential(tmp_path):
+    files = write_inputs(tmp_path)
+    sequential = DesignStats()
+    for path in files:
+        process_single_file(path, stats=sequential)
+
+    parallel = DesignStats()
+    for _, _, error in design_files_parallel(files, 2, stats=parallel):
+        assert error is None
+
+    assert parallel.summary() == sequential.summary()
+    assert sorted(parallel.transcripts) == sorted(sequential.transcripts)
+
+
+if __name__ == "__main__":
+    test_covered_bases_merges_overlaps()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_stats_match_written_outputs(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_parallel_stats_match_sequential(Path(tmp))
+    print("✅ design stats tests passed")
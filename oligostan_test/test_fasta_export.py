@@ -0,0 +1,58 @@
+# test_fasta_export.py - streamed table to FASTA conversion
+import sys
+import os
+import tempfile
+import pandas as pd
+
+# Add the PARENT directory to path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fasta_export import convert_table_to_fasta, list_table_columns
+
+
+def test_convert_skips_missing_values_across_chunks(tmp_path):
+    table = tmp_path / "probes.txt"
+    pd.DataFrame(
+        {
+            "ProbesNames": ["A probe 1", "A probe 2", None, " A probe 4 "],
+            "dG37": [-32.1, -31.5, -33.0, -32.8],
+            "Seq": ["ACGTACGT", None, "GGGGCCCC", " TTTTAAAA "],
+        }
+    ).to_csv(table, sep="\t", index=False)
+
+    output = tmp_path / "probes.fasta"
+    progress = []
+    nb_records = convert_table_to_fasta(
+        str(table),
+        "ProbesNames",
+        "Seq",
+        str(output),
+        chunksize=2,
+        progress_callback=lambda written, read: progress.append((written, read)),
+    )
+
+    assert nb_records == 2
+    assert output.read_text() == ">A probe 1\nACGTACGT\n>A probe 4\nTTTTAAAA\n"
+    assert progress == [(1, 2), (2, 4)]
+
+
+def test_list_columns_and_unknown_column(tmp_path):
+    table = tmp_path / "probes.csv"
+    table.write_text("Name,Sequence\nP1,ACGT\n")
+    assert list_table_columns(str(table)) == ["Name", "Sequence"]
+
+    try:
+        convert_table_to_fasta(str(table), "Name", "Seq", str(tmp_path / "x.fa"))
+    except ValueError as e:
+        assert "Sequence column 'Seq' not found" in str(e)
+    else:
+        raise AssertionError("missing column not reported")
+
+
+if __name__ == "__main__":
+    from pathlib import Path
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test_convert_skips_missing_values_across_chunks(Path(tmp))
+        test_list_columns_and_unknown_column(Path(tmp))
+    print("✅ fasta export tests passed")
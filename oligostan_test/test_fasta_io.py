@@ -0,0 +1,194 @@
+# test_fasta_io.py - compressed FASTA inputs and indexed record access
+import sys
+import os
+import bz2
+import gzip
+import random
+import tempfile
+from pathlib import Path
+
+# Add the PARENT directory to path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fasta_io
+from fasta_io import (
+    FastaIndex,
+    command_reader,
+    compression_of,
+    fasta_base_name,
+    open_fasta,
+)
+from sequence_utils import (
+    create_output_directory,
+    read_fasta_records,
+    read_fasta_sequences,
+)
+
+
+def fasta_text(seed=0, nb_records=12, width=60):
+    """Records of varied lengths (some empty or one line), with IUPAC codes"""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(nb_records):
+        length = rng.choice([0, 7, width, width + 1, rng.randint(100, 30000)])
+        sequence = "".join(rng.choice("ACGTacgtNRY") for _ in range(length))
+        lines.append(f">tx{i} description {i}")
+        lines += [sequence[j : j + width] for j in range(0, length, width)]
+    return "\n".join(lines) + "\n"
+
+
+def write_bgzf(path, text):
+    from Bio import bgzf
+
+    with bgzf.BgzfWriter(path, "wb") as f:
+        f.write(text.encode())
+
+
+def test_compressed_inputs_read_like_plain(tmp_path):
+    text = fasta_text()
+    plain = tmp_path / "gene.fa"
+    plain.write_text(text)
+    with gzip.open(tmp_path / "gene_gz.fa.gz", "wt") as f:
+        f.write(text)
+    with bz2.open(tmp_path / "gene_bz2.fasta.bz2", "wt") as f:
+        f.write(text)
+    write_bgzf(str(tmp_path / "gene_bgzf.fa.gz"), text)
+
+    expected = read_fasta_sequences(str(plain))
+    for name, compression in [
+        ("gene_gz.fa.gz", "gzip"),
+        ("gene_bz2.fasta.bz2", "bz2"),
+        ("gene_bgzf.fa.gz", "bgzf"),
+    ]:
+        path = str(tmp_path / name)
+        assert compression_of(path) == compression
+        sequences = read_fasta_sequences(path)
+        base_name = name.split(".")[0]
+        assert [s["sequence"] for s in sequences] == [s["sequence"] for s in expected]
+        assert {s["name"] for s in sequences} == {base_name}
+        assert create_output_directory(path).endswith(f"Probes_{base_name}")
+
+    assert fasta_base_name("/data/x.y.fasta.zst") == "x.y"
+    assert fasta_base_name("gene.fa") == "gene"
+
+
+def test_bgzf_blocks_inflated_in_parallel(tmp_path):
+    text = fasta_text(seed=1, nb_records=40)
+    path = str(tmp_path / "big.fa.bgz")
+    write_bgzf(path, text)
+    # Small batches: many tasks in flight, returned in order
+    batch = fasta_io.BGZF_BATCH
+    fasta_io.BGZF_BATCH = 2
+    try:
+        with open_fasta(path, threads=3) as handle:
+            assert handle.read() == text
+    finally:
+        fasta_io.BGZF_BATCH = batch
+
+
+def test_decompression_command_and_missing_zstd(tmp_path):
+    path = str(tmp_path / "gene.fa.gz")
+    with gzip.open(path, "wt") as f:
+        f.write(fasta_text(seed=2))
+    # pigz/lbzip2/zstd run like this when installed
+    with command_reader(["gzip", "-dc", path]) as handle:
+        assert handle.read() == fasta_text(seed=2)
+    try:
+        with command_reader(["gzip", "-dc", str(tmp_path / "missing.gz")]) as handle:
+            handle.read()
+    except OSError:
+        pass
+    else:
+        raise AssertionError("a failed decompression went unnoticed")
+
+    zst = str(tmp_path / "gene.fa.zst")
+    Path(zst).write_bytes(b"\x28\xb5\x2f\xfd" + b"\0" * 16)
+    assert compression_of(zst) == "zstd"
+    commands = fasta_io.ZSTD_COMMANDS
+    fasta_io.ZSTD_COMMANDS = []
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        try:
+            with open_fasta(zst) as handle:
+                handle.read()
+        except ValueError as error:
+            assert "zstandard" in str(error)
+        else:
+            raise AssertionError("zstd file read without a decompressor")
+    finally:
+        fasta_io.ZSTD_COMMANDS = commands
+
+
+def test_indexed_records_match_full_read(tmp_path):
+    text = fasta_text(seed=3)
+    plain = str(tmp_path / "tx.fa")
+    Path(plain).write_text(text)
+    bgzf_path = str(tmp_path / "tx.fa.gz")
+    write_bgzf(bgzf_path, text)
+    expected = read_fasta_sequences(plain)
+    wanted = [11, 0, 5, 3]
+
+    for path in (plain, bgzf_path):
+        index = FastaIndex(path)
+        assert os.path.exists(path + ".fai")
+        assert list(index.names) == [f"tx{i}" for i in range(12)]
+        # Read back from the saved index files
+        index = FastaIndex(path)
+        assert index.fetch("tx3") == index.fetch(3)
+        records = read_fasta_records(path, wanted)
+        assert records == [dict(expected[i], name="tx", id="tx") for i in wanted]
+    assert os.path.exists(bgzf_path + ".gzi")
+
+    # samtools faidx layout: name, length, offset, line bases, line width
+    Path(tmp_path / "small.fa").write_text(">a x\nACGT\nAC\n>b\nGG\n")
+    assert FastaIndex(str(tmp_path / "small.fa")).rows == [
+        ("a", 6, 5, 4, 5),
+        ("b", 2, 16, 2, 3),
+    ]
+
+    Path(tmp_path / "ragged.fa").write_text(">a\nACG\nACGT\n")
+    try:
+        FastaIndex(str(tmp_path / "ragged.fa"))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("indexed a file with unequal line lengths")
+
+
+def test_stale_index_not_trusted(tmp_path):
+    path = str(tmp_path / "edited.fa")
+    Path(path).write_text(">a\nACGTACGTAA\n>b\nGGGGCCCCTT\n")
+    FastaIndex(path)
+    # Record a lengthened after indexing
+    Path(path).write_text(">a\nACGTACGTAAACGTACGTAA\n>b\nGGGGCCCCTT\n")
+    # Timestamps may be coarser than the time between the two writes
+    os.utime(path, ns=(os.stat(path + ".fai").st_mtime_ns + 10**9,) * 2)
+    expected = read_fasta_sequences(path)
+    assert read_fasta_records(path, [1]) == [expected[1]]
+    # Rebuilt on open
+    assert FastaIndex(path).fetch("b") == "GGGGCCCCTT"
+
+    # An index dated after the edit (e.g. copied along) fails its fetch
+    Path(path).write_text(">a\nACGTACGTAA\n>b\nGGGGCCCCTT\n")
+    os.utime(path + ".fai", ns=(os.stat(path).st_mtime_ns + 10**9,) * 2)
+    try:
+        FastaIndex(path).fetch("b")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("fetched a record at the offsets of another file")
+    assert read_fasta_records(path, [1]) == [read_fasta_sequences(path)[1]]
+
+
+if __name__ == "__main__":
+    for test in (
+        test_compressed_inputs_read_like_plain,
+        test_bgzf_blocks_inflated_in_parallel,
+        test_decompression_command_and_missing_zstd,
+        test_indexed_records_match_full_read,
+        test_stale_index_not_trusted,
+    ):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ FASTA I/O tests passed")
@@ -0,0 +1,104 @@
+# test_filter_before_select.py - vectorized window flags vs per-probe rules
+import sys
+import os
+
+# Add the PARENT directory to path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from helpers import random_sequence
+from filters import (
+    window_filter_flags,
+    is_ok_4_gc_filter,
+    is_ok_4_pnas_filter,
+    is_it_ok_4_a_comp,
+    is_it_ok_4_a_stack,
+    is_it_ok_4_c_comp,
+    is_it_ok_4_c_stack,
+    is_it_ok_4_c_spec_stack,
+)
+from composition import SequenceComposition
+from oligostan_core import (
+    build_window_filter_mask,
+    get_probes_from_rna_dg37,
+    score_probe_batch,
+)
+from probe_batch import ProbeBatch
+from config import DEFAULT_SETTINGS
+
+SCALAR_RULES = {
+    "GCFilter": is_ok_4_gc_filter,
+    "aCompFilter": is_it_ok_4_a_comp,
+    "aStackFilter": is_it_ok_4_a_stack,
+    "cCompFilter": is_it_ok_4_c_comp,
+    "cStackFilter": is_it_ok_4_c_stack,
+    "cSpecStackFilter": is_it_ok_4_c_spec_stack,
+}
+
+
+def test_window_flags_match_per_probe_rules():
+    """Every window flag must equal the scalar rule applied to the substring"""
+    probe_lengths = list(range(26, 33))
+    for seed, alphabet in enumerate(["ACGT", "AACCCCGT", "AAAACGGT"]):
+        seq = random_sequence(seed, 150, alphabet)
+        nb_positions = len(seq) - max(probe_lengths) + 1
+        flags = window_filter_flags(
+            SequenceComposition(seq),
+            probe_lengths,
+            nb_positions,
+            pnas_filter_option=[1, 2, 3, 4, 5],
+        )
+
+        for pos in range(nb_positions):
+            for col, length in enumerate(probe_lengths):
+                window = seq[pos : pos + length]
+                for key, rule in SCALAR_RULES.items():
+                    assert flags[key][pos, col] == rule(window), (key, window)
+                assert flags["PNASFilter"][pos, col] == is_ok_4_pnas_filter(
+                    window, [1, 2, 3, 4, 5]
+                )
+
+
+def test_filter_before_select_only_yields_passing_probes():
+    """Selected probes all pass GC/PNAS and are at least as many as before"""
+    settings = dict(DEFAULT_SETTINGS, use_dustmasker=False)
+    seq = random_sequence(42, 3000)
+
+    window_mask = build_window_filter_mask(seq, 26, 32, **settings)
+    baseline = get_probes_from_rna_dg37(seq, desired_dg=-32)
+    prefiltered = get_probes_from_rna_dg37(seq, desired_dg=-32, window_mask=window_mask)
+
+    def passing(probes):
+        return [
+            p
+            for p in probes
+            if is_ok_4_gc_filter(p[3], settings["min_gc"], settings["max_gc"])
+            and is_ok_4_pnas_filter(p[3], settings["pnas_filter_option"])
+        ]
+
+    assert len(passing(prefiltered)) == len(prefiltered)
+    assert len(prefiltered) >= len(passing(baseline))
+
+
+def test_masked_filter_uses_selection_mask():
+    """Output MaskedFilter/masked % come from the whole-sequence mask"""
+    seq = random_sequence(7, 400)
+    masked_bases = np.zeros(len(seq), dtype=bool)
+    masked_bases[100:180] = True
+    composition = SequenceComposition(seq, masked_bases=masked_bases)
+    probes = [[30, 0.0, position] for position in (1, 81, 95, 179, 300)]
+    batch = ProbeBatch.from_probe_list(probes, seq)
+    settings = dict(DEFAULT_SETTINGS, use_dustmasker=True, max_masked_percent=0.1)
+    score_probe_batch(batch, composition, **settings)
+
+    expected = composition.masked_fraction(batch.starts, batch.sizes)
+    assert np.allclose(batch.masked_percent, expected)
+    assert batch.flag("MaskedFilter").tolist() == [1, 0, 0, 1, 1]
+
+
+if __name__ == "__main__":
+    test_window_flags_match_per_probe_rules()
+    test_filter_before_select_only_yields_passing_probes()
+    test_masked_filter_uses_selection_mask()
+    print("✅ filter-before-select tests passed")
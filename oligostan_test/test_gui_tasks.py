@@ -0,0 +1,96 @@
+# test_gui_tasks.py - worker/queue protocol of the GUI background tasks
+import sys
+import os
+import time
+import threading
+
+# Add the PARENT directory to path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gui_tasks import BackgroundTask
+
+
+class FakeRoot:
+    """Stands in for tk.Tk: after() callbacks are run by pump()"""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, ms, callback):
+        self.scheduled.append(callback)
+
+    def pump(self, timeout=5.0):
+        deadline = time.time() + timeout
+        while self.scheduled and time.time() < deadline:
+            self.scheduled.pop(0)()
+            time.sleep(0.001)
+
+
+def test_messages_are_delivered_on_polling_thread():
+    events = []
+    callback_threads = set()
+
+    def work(task, n):
+        for i in range(n):
+            task.log(f"step {i}")
+            task.progress(i + 1, n)
+        return n * 2
+
+    def record(kind):
+        def callback(*args):
+            callback_threads.add(threading.get_ident())
+            events.append((kind,) + args)
+
+        return callback
+
+    root = FakeRoot()
+    task = BackgroundTask(
+        root,
+        work,
+        args=(5,),
+        on_done=record("done"),
+        on_log=record("log"),
+        on_progress=record("progress"),
+    ).start()
+    root.pump()
+
+    assert task.finished
+    assert callback_threads == {threading.get_ident()}
+    assert [e[1] for e in events if e[0] == "log"] == [f"step {i}" for i in range(5)]
+    # Progress is coalesced, but the final value is always delivered
+    assert [e for e in events if e[0] == "progress"][-1] == ("progress", 5, 5)
+    assert events[-1] == ("done", 10)
+
+
+def test_cancel_and_error():
+    started = threading.Event()
+
+    def endless(task):
+        started.set()
+        while True:
+            task.check_cancelled()
+            time.sleep(0.001)
+
+    outcome = []
+    root = FakeRoot()
+    task = BackgroundTask(
+        root, endless, on_cancel=lambda: outcome.append("cancelled")
+    ).start()
+    started.wait(5)
+    task.cancel()
+    root.pump()
+    assert outcome == ["cancelled"]
+
+    def broken(task):
+        raise ValueError("bad column")
+
+    root = FakeRoot()
+    BackgroundTask(root, broken, on_error=outcome.append).start()
+    root.pump()
+    assert isinstance(outcome[-1], ValueError)
+
+
+if __name__ == "__main__":
+    test_messages_are_delivered_on_polling_thread()
+    test_cancel_and_error()
+    print("✅ GUI task tests passed")
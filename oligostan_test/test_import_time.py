@@ -0,0 +1,64 @@
+# test_import_time.py - the design core starts without pandas, Biopython or tkinter
+import sys
+import os
+import subprocess
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules the design core must not import at startup
+HEAVY_MODULES = ["pandas", "Bio", "tkinter", "rich"]
+
+# Modules importable without the heavy dependencies
+CORE_MODULES = [
+    "oligostan_core",
+    "thermodynamics",
+    "filters",
+    "composition",
+    "probe_batch",
+    "sequence_utils",
+    "secondary_structure",
+]
+
+
+def import_time(module):
+    """(cumulative import time in ms, top-level packages imported) of module
+    measured in a fresh interpreter with python -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PACKAGE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # Lines: "import time: self [us] | cumulative | imported package"
+    total_us = 0
+    packages = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        packages.add(name.strip().split(".")[0])
+        if name.strip() == module:
+            total_us = int(cumulative)
+    return total_us / 1000, packages
+
+
+def test_core_imports_no_heavy_modules():
+    for module in CORE_MODULES:
+        _, packages = import_time(module)
+        loaded = [name for name in HEAVY_MODULES if name in packages]
+        assert not loaded, f"{module} imports {', '.join(loaded)} at startup"
+
+
+def test_main_defers_gui_modules():
+    _, packages = import_time("main")
+    assert "tkinter" not in packages
+    assert "rich" not in packages
+
+
+if __name__ == "__main__":
+    test_core_imports_no_heavy_modules()
+    test_main_defers_gui_modules()
+    for module in CORE_MODULES + ["main"]:
+        print(f"{module}: {import_time(module)[0]:.1f} ms")
+    print("✅ import time tests passed")
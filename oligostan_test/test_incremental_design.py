@@ -0,0 +1,154 @@
+# test_incremental_design.py - incremental redesign equals a full design
+import sys
+import os
+import random
+import tempfile
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+
+# Add the PARENT directory to path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import random_sequence, write_fasta
+from composition import SequenceComposition
+from design_cache import DesignCache
+from incremental_design import design_many_with_state, design_with_state, redesign
+from main import design_record, design_records, process_single_file
+from oligostan_core import build_window_filter_mask, get_probe_batch
+
+
+def edit(rng, seq):
+    """Substitution, insertion or deletion of 1-20 bases"""
+    i = rng.randrange(len(seq))
+    n = rng.choice([1, 4, 20])
+    kind = rng.choice(["substitute", "insert", "delete"])
+    if kind == "substitute":
+        return seq[:i] + random_sequence(rng, n) + seq[i + n :]
+    if kind == "insert":
+        return seq[:i] + random_sequence(rng, n) + seq[i:]
+    return seq[:i] + seq[i + n :]
+
+
+def assert_same_batch(batch, expected):
+    assert batch.to_probe_list() == expected.to_probe_list()
+    assert np.array_equal(batch.scores, expected.scores)
+
+
+def test_redesign_matches_full_design():
+    rng = random.Random(0)
+    mask = partial(build_window_filter_mask, min_size_probe=26, max_size_probe=32)
+    for trial in range(40):
+        window_mask = mask if trial % 4 == 0 else None
+        seq = random_sequence(rng, rng.choice([60, 2000]))
+        _, state = design_with_state(seq, window_mask=window_mask)
+        for _ in range(3):
+            seq = edit(rng, seq)
+            batch, state = redesign(
+                state, seq, window_mask=window_mask, chunk_size=rng.choice([None, 300])
+            )
+            assert_same_batch(batch, get_probe_batch(seq, window_mask=window_mask))
+
+
+def test_redesign_follows_mask_edits():
+    rng = random.Random(1)
+    seq = random_sequence(rng, 1500)
+    masked = np.zeros(len(seq), dtype=bool)
+    mask = partial(build_window_filter_mask, min_size_probe=26, max_size_probe=32)
+    _, state = design_with_state(seq, masked_bases=masked, window_mask=mask)
+
+    # Same bases, newly masked stretch
+    masked = masked.copy()
+    masked[700:760] = True
+    batch, _ = redesign(state, seq, masked_bases=masked, window_mask=mask)
+    full = get_probe_batch(
+        seq, composition=SequenceComposition(seq, masked_bases=masked), window_mask=mask
+    )
+    assert_same_batch(batch, full)
+
+
+def test_changed_parameters_fall_back():
+    rng = random.Random(2)
+    seq = random_sequence(rng, 1000)
+    _, state = design_with_state(seq)
+    batch, new_state = redesign(state, seq, min_score_value=0.8)
+    assert_same_batch(batch, get_probe_batch(seq, min_score_value=0.8))
+    assert new_state.params["min_score_value"] == 0.8
+
+
+def test_cached_record_redesigned(tmp_path):
+    rng = random.Random(3)
+    seq = random_sequence(rng, 4000)
+    edited = seq[:2000] + "GATTACA" + seq[2010:]
+    cache = DesignCache(str(tmp_path / "cache"))
+
+    for directory, sequence in (("v1", seq), ("v2", edited), ("fresh", edited)):
+        write_fasta(tmp_path / directory / "gene.fa", {"gene": sequence})
+    process_single_file(str(tmp_path / "v1" / "gene.fa"), cache=cache)
+    outputs = process_single_file(str(tmp_path / "v2" / "gene.fa"), cache=cache)
+    expected = process_single_file(str(tmp_path / "fresh" / "gene.fa"))
+
+    assert cache.incremental == 1
+    for path, expected_path in zip(outputs, expected):
+        assert Path(path).read_bytes() == Path(expected_path).read_bytes()
+
+
+def test_designs_scored_together_match_single():
+    rng = random.Random(4)
+    mask = partial(build_window_filter_mask, min_size_probe=26, max_size_probe=32)
+    sequences = [random_sequence(rng, n) for n in (500, 10, 32, 33, 1200, 0, 700)]
+    masks = [np.array([rng.random() < 0.05 for _ in seq]) for seq in sequences]
+    for window_mask in (None, mask):
+        for masked_bases in (None, masks):
+            designs = design_many_with_state(
+                sequences, masked_bases, window_mask, chunk_size=400
+            )
+            for i, (batch, state) in enumerate(designs):
+                expected, expected_state = design_with_state(
+                    sequences[i],
+                    None if masked_bases is None else masked_bases[i],
+                    window_mask=window_mask,
+                )
+                assert_same_batch(batch, expected)
+                for name in ("sizes", "scores", "dgs"):
+                    assert np.array_equal(
+                        getattr(state, name), getattr(expected_state, name)
+                    )
+
+
+def test_records_designed_together(tmp_path):
+    rng = random.Random(5)
+    records = [
+        {"id": f"g{i}", "name": f"g{i}", "sequence": random_sequence(rng, 800)}
+        for i in range(4)
+    ]
+    expected = [design_record(record, i) for i, record in enumerate(records)]
+    cache = DesignCache(str(tmp_path / "cache"))
+    for tables in (
+        design_records(records),
+        # Designed, then answered by the cache
+        design_records(records, cache=cache),
+        design_records(records, cache=cache),
+    ):
+        for table, expected_table in zip(tables, expected):
+            assert table.equals(expected_table)
+    assert cache.hits == 4
+
+    # An edited record is redesigned from its state, the others together
+    records[2] = dict(records[2], sequence=edit(rng, records[2]["sequence"]))
+    tables = design_records(records, [0, 1, 2, None], cache)
+    assert cache.incremental == 1
+    assert tables[2].equals(design_record(records[2], 2))
+
+
+if __name__ == "__main__":
+    test_redesign_matches_full_design()
+    test_redesign_follows_mask_edits()
+    test_changed_parameters_fall_back()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_cached_record_redesigned(Path(tmp))
+    test_designs_scored_together_match_single()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_records_designed_together(Path(tmp))
+    print("✅ incremental design tests passed")
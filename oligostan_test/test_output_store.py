@@ -0,0 +1,45 @@
+# test_output_store.py - consolidated SQLite output exports the same TSVs
+import sys
+import os
+import tempfile
+
+# Add the PARENT directory to path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import random_sequence, write_fasta
+from main import process_single_file
+from output_store import ProbeStore
+
+
+def test_store_export_matches_per_file_outputs(tmp_path):
+    inputs = []
+    for name, length in [("geneA", 2000), ("geneB", 1500), ("tiny", 20)]:
+        sequence = random_sequence(len(inputs), length)
+        inputs.append(write_fasta(tmp_path / f"{name}.fa", {name: sequence}))
+
+    with ProbeStore(str(tmp_path / "batch.sqlite")) as store:
+        for fasta in inputs:
+            assert process_single_file(fasta, store) == []
+        # Re-processing an input replaces its rows
+        process_single_file(inputs[0], store)
+        exported = store.export(str(tmp_path / "export"))
+        sources = store.sources()
+
+    assert len(sources) == 3
+    # No Probes_<name> folders were created in store mode
+    assert not any(p.name.startswith("Probes_") for p in tmp_path.iterdir())
+
+    for fasta in inputs:
+        for path in process_single_file(fasta):
+            exported_path = tmp_path / "export" / os.path.basename(path)
+            assert str(exported_path) in exported
+            with open(path) as expected:
+                assert exported_path.read_text() == expected.read()
+
+
+if __name__ == "__main__":
+    from pathlib import Path
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test_store_export_matches_per_file_outputs(Path(tmp))
+    print("✅ output store tests passed")
@@ -0,0 +1,81 @@
+# test_panel_check.py - cross-gene hits found by the k-mer/minimizer index
+import sys
+import os
+import random
+import pandas as pd
+
+# Add the PARENT directory to path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from panel_check import check_panel, load_filt_outputs
+from sequence_utils import reverse_complement
+
+
+def make_panel(seed=0, nb_genes=10, probes_per_gene=10):
+    rng = random.Random(seed)
+    genes = {
+        f"G{i}": "".join(rng.choice("ACGT") for _ in range(1500))
+        for i in range(nb_genes)
+    }
+    rows = []
+    for gene, seq in genes.items():
+        for j in range(probes_per_gene):
+            start = rng.randrange(0, len(seq) - 30)
+            rows.append([f"{gene} probe {j + 1}", seq[start : start + 30], gene])
+    probes_df = pd.DataFrame(rows, columns=["ProbesNames", "Seq", "ProbeGene"])
+    targets = [{"id": g, "name": g, "sequence": s} for g, s in genes.items()]
+    return genes, probes_df, targets
+
+
+def test_planted_cross_hybridisation_is_reported():
+    genes, probes_df, targets = make_panel()
+
+    # G1 probe matching G2's transcript with 2 mismatches
+    planted = list(genes["G2"][100:130])
+    for pos in (5, 20):
+        planted[pos] = "A" if planted[pos] != "A" else "C"
+    # G3 probe complementary to the first G0 probe
+    probes_df.loc[len(probes_df)] = ["G1 planted", "".join(planted), "G1"]
+    probes_df.loc[len(probes_df)] = [
+        "G3 planted",
+        reverse_complement(probes_df["Seq"][0]),
+        "G3",
+    ]
+
+    report_df = check_panel(probes_df, targets)
+
+    target_hits = report_df[report_df["HitType"] == "target"]
+    assert (
+        (target_hits["ProbesNames"] == "G1 planted") & (target_hits["HitGene"] == "G2")
+    ).any()
+    assert (
+        target_hits[target_hits["ProbesNames"] == "G1 planted"]["MatchedBases"].max()
+        == 28
+    )
+
+    probe_hits = report_df[report_df["HitType"] == "probe"]
+    pair = {probes_df["ProbesNames"][0], "G3 planted"}
+    assert any(
+        {row.ProbesNames, row.HitName} == pair for row in probe_hits.itertuples()
+    )
+
+    # A gene's own probes never count as cross-hybridisation
+    assert (report_df["ProbeGene"] != report_df["HitGene"]).all()
+
+
+def test_load_filt_outputs_skips_placeholders(tmp_path):
+    pd.DataFrame({"ProbesNames": ["A probe 1"], "Seq": ["ACGT" * 7]}).to_csv(
+        tmp_path / "Probes_A_FILT.txt", sep="\t", index=False
+    )
+    (tmp_path / "Probes_B_FILT.txt").write_text(
+        "No probes found after filtering. Change filtering parameters.\n"
+    )
+    probes_df = load_filt_outputs(
+        [tmp_path / "Probes_A_FILT.txt", tmp_path / "Probes_B_FILT.txt"]
+    )
+    assert list(probes_df["ProbeGene"]) == ["A"]
+
+
+if __name__ == "__main__":
+    test_planted_cross_hybridisation_is_reported()
+    print("✅ panel check tests passed")
@@ -0,0 +1,76 @@
+# test_probe_batch.py - ProbeBatch matches the historical lists and dicts
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+# Add the PARENT directory to path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import random_sequence
+from oligostan_core import (
+    get_probe_batch,
+    get_probes_from_rna_dg37,
+    process_probes_for_output,
+    score_probe_batch,
+)
+from probe_batch import ProbeBatch, FLAG_BITS
+from thermodynamics import dg_calc_rna_37, get_thermo_model
+from config import DEFAULT_SETTINGS
+
+
+def test_batch_matches_probe_lists():
+    seq = random_sequence(0, 3000)
+    batch = get_probe_batch(seq, desired_dg=-32)
+    probes = get_probes_from_rna_dg37(seq, desired_dg=-32)
+
+    assert batch.to_probe_list() == probes
+    assert ProbeBatch.from_probe_list(probes, seq).to_probe_list() == probes
+    assert len(get_probe_batch("A" * 20)) == 0
+    assert get_probes_from_rna_dg37("A" * 20) is None
+
+
+def test_scored_batch_columns():
+    seq = random_sequence(1, 3000)
+    settings = dict(DEFAULT_SETTINGS, use_dustmasker=False)
+    batch = score_probe_batch(get_probe_batch(seq), **settings)
+    records = process_probes_for_output(
+        batch.to_probe_list(), {"name": "gene", "sequence": seq}, -32, **settings
+    )
+
+    # Vectorised dG37 equals the per-probe calculation
+    for i in range(len(batch)):
+        probe_seq = batch.probe_sequence(i)
+        assert batch.dg37[i] == dg_calc_rna_37(probe_seq, len(probe_seq))[0]
+
+    pd.testing.assert_frame_equal(
+        batch.to_dataframe("gene", -32), pd.DataFrame(records)
+    )
+    assert batch.to_dicts("gene", -32) == records
+
+    # dG37 kept from selection unless scored with another model
+    xia = dict(settings, thermo_model="xia_rna_rna", salt_conc=1.0)
+    rescored = score_probe_batch(get_probe_batch(seq), **xia)
+    model = get_thermo_model("xia_rna_rna", 1.0)
+    assert rescored.dg37_model == model.key
+    assert np.array_equal(rescored.dg37, model.batch_dg(batch.probe_sequences()))
+
+
+def test_flags_round_trip():
+    batch = ProbeBatch("ACGT" * 10, [26, 26, 26], [1.0, 0.9, 0.8], [1, 3, 5])
+    for name in FLAG_BITS:
+        batch.set_flag(name, np.array([True, False, True]))
+    batch.set_flag("GCFilter", np.array([False, True, True]))
+
+    assert batch.flags.dtype == np.uint8
+    assert batch.flag("GCFilter").tolist() == [0, 1, 1]
+    assert batch.flag("MaskedFilter").tolist() == [1, 0, 1]
+    assert batch.nb_of_pnas().tolist() == [5, 0, 5]
+
+
+if __name__ == "__main__":
+    test_batch_matches_probe_lists()
+    test_scored_batch_columns()
+    test_flags_round_trip()
+    print("✅ probe batch tests passed")
@@ -0,0 +1,99 @@
+# test_probe_tables.py - cached parallel table loading and indexed join
+import sys
+import os
+import tempfile
+import pandas as pd
+
+# Add the PARENT directory to path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from probe_tables import (
+    load_probe_tables,
+    read_probe_table,
+    table_version,
+    preview_probe_tables,
+    indexed_left_join,
+)
+
+
+def write_tables(directory):
+    paths = []
+    for gene in ["A", "B", "C"]:
+        path = os.path.join(directory, f"{gene}.csv")
+        pd.DataFrame(
+            {
+                "ProbesNames": [f"{gene} probe {i + 1}" for i in range(4)],
+                "Seq": ["ACGT" * 7] * 4,
+                "dG37": [-32.0, -31.5, -33.0, -32.5],
+                "PNASFilter": [1, 0, 1, 1],
+            }
+        ).to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def test_load_keeps_file_order_and_caches(tmp_path):
+    paths = write_tables(str(tmp_path))
+    cache_dir = str(tmp_path / "cache")
+
+    combined = load_probe_tables(paths, n_jobs=3, cache_dir=cache_dir)
+    assert len(combined) == 12
+    assert list(combined["SourceFile"].unique()) == ["A.csv", "B.csv", "C.csv"]
+    assert combined["ProbesNames"].dtype == "category"
+    assert combined["PNASFilter"].dtype.kind == "i"
+    assert len(os.listdir(cache_dir)) == 3
+
+    # A cached read is used until the file changes
+    cached = read_probe_table(paths[0], cache_dir=cache_dir)
+    pd.testing.assert_frame_equal(cached, pd.read_csv(paths[0]))
+    version = table_version(paths[0])
+    pd.DataFrame({"ProbesNames": ["A probe 9"]}).to_csv(paths[0], index=False)
+    os.utime(paths[0], ns=(0, 0))
+    # What the GUI compares before reusing its loaded tables
+    assert table_version(paths[0]) != version
+    assert table_version(str(tmp_path / "missing.csv")) is None
+    assert list(read_probe_table(paths[0], cache_dir=cache_dir)["ProbesNames"]) == [
+        "A probe 9"
+    ]
+
+
+def test_preview_reads_only_what_it_shows(tmp_path):
+    paths = write_tables(str(tmp_path))
+    pd.DataFrame({"ProbesNames": ["D probe 1"], "Extra": ["x"]}).to_csv(
+        tmp_path / "D.csv", index=False
+    )
+    paths.append(str(tmp_path / "D.csv"))
+
+    columns, head = preview_probe_tables(paths, nrows=6)
+    assert columns == ["ProbesNames", "Seq", "dG37", "PNASFilter", "Extra"]
+    assert list(head["ProbesNames"]) == [f"A probe {i}" for i in range(1, 5)] + [
+        "B probe 1",
+        "B probe 2",
+    ]
+    assert list(head.columns) == columns
+
+
+def test_indexed_join_matches_left_merge():
+    left = pd.DataFrame(
+        {
+            "Name": pd.Categorical(["p1", "p2", "p3", "p1", None]),
+            "Start": [1, 2, 3, 4, 5],
+        }
+    )
+    right = pd.DataFrame(
+        {"ProbeName": ["p3", "p1"], "NumberOfHits": [2, 1], "Start": [10, 20]}
+    )
+    expected = left.merge(right, left_on="Name", right_on="ProbeName", how="left")
+    joined = indexed_left_join(left, right, "Name", "ProbeName")
+    pd.testing.assert_frame_equal(joined, expected.drop(columns=["ProbeName"]))
+
+
+if __name__ == "__main__":
+    from pathlib import Path
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test_load_keeps_file_order_and_caches(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_preview_reads_only_what_it_shows(Path(tmp))
+    test_indexed_join_matches_left_merge()
+    print("✅ probe table tests passed")
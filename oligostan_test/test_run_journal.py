@@ -0,0 +1,102 @@
+# test_run_journal.py - atomic writes and resumable batch journal
+import sys
+import os
+import tempfile
+
+# Add the PARENT directory to path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import write_fasta
+from output_store import ProbeStore
+from run_journal import RunJournal, atomic_write
+
+
+def test_atomic_write_keeps_old_file_on_error(tmp_path):
+    path = tmp_path / "Probes_x_ALL.txt"
+    with atomic_write(str(path)) as f:
+        f.write("complete\n")
+
+    try:
+        with atomic_write(str(path)) as f:
+            f.write("partial")
+            raise RuntimeError("killed")
+    except RuntimeError:
+        pass
+
+    assert path.read_text() == "complete\n"
+    assert os.listdir(tmp_path) == ["Probes_x_ALL.txt"]
+
+
+def test_resume_skips_only_verified_inputs(tmp_path):
+    inputs = []
+    for name in ["a", "b", "c"]:
+        inputs.append(write_fasta(tmp_path / f"{name}.fa", {name: "ACGT"}))
+    journal_path = str(tmp_path / "journal.jsonl")
+
+    journal = RunJournal(journal_path)
+    journal.start(inputs)
+    outputs = []
+    for fasta in inputs[:2]:
+        output = fasta + ".out"
+        with atomic_write(output) as f:
+            f.write("probes\n")
+        outputs.append(output)
+        journal.record_done(fasta, [output], fingerprint="settings-1")
+    journal.record_failed(inputs[2], "crashed")
+
+    # Simulate a crash in the middle of writing a record
+    with open(journal_path, "a") as f:
+        f.write('{"event": "done", "inp')
+
+    resumed = RunJournal(journal_path).load()
+    assert resumed.inputs == [os.path.abspath(path) for path in inputs]
+    assert [resumed.is_done(path, "settings-1") for path in inputs] == [
+        True,
+        True,
+        False,
+    ]
+    # Changed settings or a modified output mean the input is redone
+    assert not resumed.is_done(inputs[0], "settings-2")
+    with open(outputs[1], "a") as f:
+        f.write("truncated?")
+    assert not resumed.is_done(inputs[1], "settings-1")
+
+    # Records appended after the torn line are still readable
+    resumed.start(inputs, resume=True)
+    resumed.record_done(inputs[2], [outputs[0]], fingerprint="settings-1")
+    assert RunJournal(journal_path).load().is_done(inputs[2], "settings-1")
+
+
+def test_store_runs_check_the_store(tmp_path):
+    fasta = write_fasta(tmp_path / "a.fa", {"a": "ACGT"})
+    journal_path = str(tmp_path / "journal.jsonl")
+    journal = RunJournal(journal_path)
+    journal.start([fasta])
+    with ProbeStore(str(tmp_path / "a.db")) as store:
+        store.write_source(fasta, "a", None, None)
+        journal.record_done(fasta, [], fingerprint="settings-1", store=store)
+
+    resumed = RunJournal(journal_path).load()
+    with ProbeStore(str(tmp_path / "a.db")) as store:
+        assert resumed.is_done(fasta, "settings-1", store)
+    # Another (empty) store, or TSV outputs this time
+    with ProbeStore(str(tmp_path / "b.db")) as store:
+        assert not resumed.is_done(fasta, "settings-1", store)
+    assert not resumed.is_done(fasta, "settings-1")
+
+    # A TSV run resumed with --store
+    resumed.record_done(fasta, [], fingerprint="settings-1")
+    with ProbeStore(str(tmp_path / "a.db")) as store:
+        assert not resumed.is_done(fasta, "settings-1", store)
+
+
+if __name__ == "__main__":
+    from pathlib import Path
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test_atomic_write_keeps_old_file_on_error(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_resume_skips_only_verified_inputs(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_store_runs_check_the_store(Path(tmp))
+    print("✅ run journal tests passed")
@@ -0,0 +1,85 @@
+# test_secondary_structure.py - hairpin/homodimer stage and its memoisation
+import sys
+import os
+import random
+
+# Add the PARENT directory to path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import secondary_structure
+from secondary_structure import (
+    add_secondary_structure_scores,
+    clear_structure_cache,
+    dimer_dg,
+    hairpin_dg,
+    score_structures_batch,
+    structure_scores,
+    STRUCTURE_MODEL,
+)
+from thermodynamics import get_thermo_model
+from config import FLAP_SEQUENCES
+
+
+def test_hairpin_and_dimer_energies():
+    model = get_thermo_model(STRUCTURE_MODEL)
+
+    # 6-bp GC stem closing a 4-nt loop folds; a poly-A cannot pair at all
+    assert hairpin_dg("GCGCGCTTTTGCGCGC", model) < -3.0
+    assert hairpin_dg("AAAAAAAAAAAAAAAAAAAA", model) == 0.0
+
+    # Self-complementary sequences dimerise much more than random-ish ones
+    assert dimer_dg("ACGTACGTACGT", "ACGTACGTACGT", model) < -10.0
+    assert dimer_dg("AAAAAAAAAAAA", "AAAAAAAAAAAA", model) == 0.0
+
+
+def test_batch_matches_single_and_is_memoised():
+    rng = random.Random(1)
+    seqs = ["".join(rng.choice("ACGT") for _ in range(30)) for _ in range(20)]
+
+    clear_structure_cache()
+    batch = score_structures_batch(seqs + seqs[:5], n_jobs=1)
+    assert len(secondary_structure._structure_cache) == len(set(seqs))
+    assert batch[: len(seqs)] == [structure_scores(seq) for seq in seqs]
+    assert batch[len(seqs) :] == batch[:5]
+
+
+def test_full_cache_evicting_batch_keys():
+    # A batch mixing cached and new sequences, the new ones evicting the
+    # cached ones from a full cache
+    cache_max = secondary_structure.STRUCTURE_CACHE_MAX
+    secondary_structure.STRUCTURE_CACHE_MAX = 2
+    try:
+        clear_structure_cache()
+        first = score_structures_batch(["ACGTACGTAC", "GGGCCCAAAT"], n_jobs=1)
+        second = score_structures_batch(["ACGTACGTAC", "TTTTGGGGCC"], n_jobs=1)
+        assert second[0] == first[0]
+        assert second[1] == structure_scores("TTTTGGGGCC")
+    finally:
+        secondary_structure.STRUCTURE_CACHE_MAX = cache_max
+        clear_structure_cache()
+
+
+def test_stage_adds_flap_columns():
+    probe_seq = "GAGTGCAATGGATAAGCCTCGCCCTG"
+    probes_data = [
+        {
+            "Seq": probe_seq,
+            **{f"HybFlp{k}": probe_seq + flap for k, flap in FLAP_SEQUENCES.items()},
+        }
+    ]
+    add_secondary_structure_scores(probes_data, structure_jobs=1)
+
+    probe = probes_data[0]
+    for suffix in ("", "FlpX", "FlpY", "FlpZ"):
+        assert probe[f"HairpinDG{suffix}"] <= 0.0
+        assert probe[f"HomodimerDG{suffix}"] <= 0.0
+    assert 40.0 < probe["Tm"] < 90.0
+    assert probe["StructureFilter"] in (0, 1)
+
+
+if __name__ == "__main__":
+    test_hairpin_and_dimer_energies()
+    test_batch_matches_single_and_is_memoised()
+    test_full_cache_evicting_batch_keys()
+    test_stage_adds_flap_columns()
+    print("✅ secondary structure tests passed")
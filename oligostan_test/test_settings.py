@@ -0,0 +1,73 @@
+# test_settings.py - immutable run settings passed through every stage
+import sys
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# Add the PARENT directory to path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import random_sequence
+from config import DEFAULT_SETTINGS, DesignSettings, design_settings
+from main import build_output_tables, design_sequences
+from run_journal import settings_fingerprint
+
+
+def test_settings_immutable_and_hashable():
+    settings = DesignSettings()
+    assert settings == DesignSettings(DEFAULT_SETTINGS)
+    assert hash(settings) == hash(DesignSettings())
+    assert settings.min_gc == settings["min_gc"] == DEFAULT_SETTINGS["min_gc"]
+    assert settings.pnas_filter_option == tuple(DEFAULT_SETTINGS["pnas_filter_option"])
+    assert design_settings(settings) is settings
+    assert design_settings({"min_gc": 0.3}) == settings.replace(min_gc=0.3)
+
+    changed = settings.replace(min_gc=0.45)
+    assert changed != settings and changed.min_gc == 0.45
+    assert len({settings, changed, DesignSettings()}) == 2
+    try:
+        settings.min_gc = 0.1
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("DesignSettings changed in place")
+
+    assert pickle.loads(pickle.dumps(changed)) == changed
+    # Same journal fingerprint as the settings dict
+    assert settings.fingerprint() == settings_fingerprint(DEFAULT_SETTINGS)
+    assert changed.fingerprint() != settings.fingerprint()
+
+
+def test_configurations_run_side_by_side():
+    records = [
+        {"id": f"g{i}", "name": f"g{i}", "sequence": random_sequence(i, 3000)}
+        for i in range(4)
+    ]
+    configurations = [
+        DesignSettings(use_dustmasker=False),
+        DesignSettings(use_dustmasker=False, min_gc=0.45, max_gc=0.55),
+        DesignSettings(use_dustmasker=False, pnas_filter_option=[1, 2]),
+    ]
+    before = dict(DEFAULT_SETTINGS)
+
+    def filtered(settings):
+        return build_output_tables(
+            design_sequences(records, settings=settings), settings
+        )[1]
+
+    alone = [filtered(settings) for settings in configurations]
+    with ThreadPoolExecutor(len(configurations)) as pool:
+        together = list(pool.map(filtered, configurations * 3))
+
+    assert DEFAULT_SETTINGS == before
+    assert len(alone[1]) < len(alone[0]) < len(alone[2])
+    for i, df in enumerate(together):
+        pd.testing.assert_frame_equal(df, alone[i % len(configurations)])
+
+
+if __name__ == "__main__":
+    test_settings_immutable_and_hashable()
+    test_configurations_run_side_by_side()
+    print("✅ settings tests passed")
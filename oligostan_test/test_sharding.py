@@ -0,0 +1,103 @@
+# test_sharding.py - sharded runs give the outputs of a single run
+import sys
+import os
+import subprocess
+import tempfile
+from pathlib import Path
+
+# Add the PARENT directory to path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import random_sequence, write_fasta
+from main import process_single_file
+from sharding import (
+    assign_shards,
+    build_manifest,
+    merge_shards,
+    read_manifest,
+    shard_loads,
+    write_manifest,
+)
+
+SHARDING = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sharding.py"
+)
+
+
+def write_inputs(directory):
+    """Multi-record, single-record and empty inputs"""
+    directory.mkdir()
+    write_fasta(
+        directory / "first.fa",
+        {
+            f"r{i}": random_sequence(i, length)
+            for i, length in enumerate([2500, 300, 4, 1200, 900])
+        },
+    )
+    write_fasta(directory / "second.fa", {"s": random_sequence(10, 1800)})
+    (directory / "empty.fa").write_text("")
+    return sorted(str(path) for path in directory.glob("*.fa"))
+
+
+def test_assignment_deterministic_and_balanced():
+    manifest = [
+        {"source": "/a/x.fa", "record": i, "length": length}
+        for i, length in enumerate([100, 900, 400, 400, 300, 200, 50, 700])
+    ]
+    sized = assign_shards([dict(row) for row in manifest], 3, "size")
+    assert sized == assign_shards([dict(row) for row in manifest], 3, "size")
+    bases = [bases for _, bases in shard_loads(sized).values()]
+    assert max(bases) - min(bases) <= 100
+
+    # Hashing ignores the directory, so every node agrees
+    hashed = assign_shards([dict(row) for row in manifest], 3, "hash")
+    moved = [dict(row, source="/b/x.fa") for row in manifest]
+    assert [row["shard"] for row in hashed] == [
+        row["shard"] for row in assign_shards(moved, 3, "hash")
+    ]
+    assert all(0 <= row["shard"] < 3 for row in hashed)
+
+
+def test_shards_in_separate_processes_match_single_run(tmp_path):
+    expected = {}
+    for path in write_inputs(tmp_path / "single"):
+        for output in process_single_file(path):
+            expected[os.path.relpath(output, tmp_path / "single")] = Path(
+                output
+            ).read_bytes()
+
+    for method in ("hash", "size"):
+        files = write_inputs(tmp_path / method)
+        manifest_path = str(tmp_path / f"{method}.tsv")
+        write_manifest(assign_shards(build_manifest(files), 3, method), manifest_path)
+        assert len(read_manifest(manifest_path)) == 5 + 1 + 1
+
+        shard_paths = [str(tmp_path / f"{method}.shard{i}") for i in range(3)]
+        runs = [
+            subprocess.Popen(
+                [sys.executable, SHARDING, "run", manifest_path, str(i), "--out", out]
+            )
+            for i, out in enumerate(shard_paths)
+        ]
+        assert [run.wait() for run in runs] == [0, 0, 0]
+
+        try:
+            merge_shards(manifest_path, shard_paths[:2])
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("merged without the output of every shard")
+
+        outputs = merge_shards(manifest_path, shard_paths)
+        merged = {
+            os.path.relpath(output, tmp_path / method): Path(output).read_bytes()
+            for output in outputs
+        }
+        assert merged == expected
+
+
+if __name__ == "__main__":
+    test_assignment_deterministic_and_balanced()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_shards_in_separate_processes_match_single_run(Path(tmp))
+    print("✅ sharding tests passed")
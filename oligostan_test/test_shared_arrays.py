@@ -0,0 +1,73 @@
+# test_shared_arrays.py - shared transcriptome views and parallel design
+import sys
+import os
+import random
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Add the PARENT directory to path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import random_sequence, write_fasta
+from shared_arrays import SharedArrays, SharedTranscriptome
+from main import design_files_parallel, design_sequences
+from sequence_utils import read_fasta_sequences
+
+
+def _read_record(args):
+    handle, i = args
+    with SharedTranscriptome.attach(handle) as transcriptome:
+        return transcriptome.names[i], transcriptome.sequence(i)
+
+
+def test_arrays_round_trip():
+    arrays = {
+        "codes": np.arange(10, dtype=np.uint8),
+        "empty": np.zeros(0, dtype=np.int64),
+        "matrix": np.arange(12, dtype=np.float64).reshape(3, 4),
+    }
+    with SharedArrays.create(arrays) as shared:
+        attached = SharedArrays.attach(shared.handle())
+        for name, array in arrays.items():
+            assert np.array_equal(attached[name], array)
+            assert attached[name].dtype == array.dtype
+        assert not attached["matrix"].flags.writeable
+        path = shared.path
+    assert not os.path.exists(path)
+
+
+def test_workers_read_shared_records():
+    rng = random.Random(0)
+    names = [f"gene{i}" for i in range(4)]
+    seqs = [random_sequence(rng, n) for n in (50, 0, 1000, 7)]
+
+    with SharedTranscriptome.from_sequences(names, seqs) as transcriptome:
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            jobs = [(transcriptome.handle(), i) for i in range(len(seqs))]
+            assert list(pool.map(_read_record, jobs)) == list(zip(names, seqs))
+
+
+def test_parallel_design_matches_sequential(tmp_path):
+    rng = random.Random(1)
+    files = []
+    for i in range(3):
+        sequence = random_sequence(rng, 2000 + 1000 * i)
+        files.append(write_fasta(tmp_path / f"gene{i}.fa", {f"gene{i}": sequence}))
+
+    designed = {path: df for path, df, error in design_files_parallel(files, 2)}
+    assert sorted(designed) == files
+    for path in files:
+        expected = design_sequences(read_fasta_sequences(path))
+        pd.testing.assert_frame_equal(designed[path], expected)
+
+
+if __name__ == "__main__":
+    test_arrays_round_trip()
+    test_workers_read_shared_records()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_parallel_design_matches_sequential(Path(tmp))
+    print("✅ shared arrays tests passed")
@@ -0,0 +1,136 @@
+# test_specificity.py - seed-and-extend search vs a brute-force scan
+import sys
+import os
+import random
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Add the PARENT directory to path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import random_sequence
+from sequence_utils import reverse_complement
+from specificity import (
+    DEFAULT_SEED,
+    HIT_COLUMNS,
+    SpecificityIndex,
+    seed_for,
+    specificity_table,
+)
+
+
+def brute_force_hits(probe, references, max_mismatches):
+    """Every (record, start, strand, mismatches) by comparing all windows"""
+    hits = []
+    for strand, query in ((1, probe), (-1, reverse_complement(probe))):
+        query = np.frombuffer(query.encode(), dtype=np.uint8)
+        for record, ref in enumerate(references):
+            if len(ref) < len(query):
+                continue
+            windows = sliding_window_view(
+                np.frombuffer(ref.encode(), dtype=np.uint8), len(query)
+            )
+            mismatches = ((windows != query) | (windows == ord("N"))).sum(axis=1)
+            for start in np.flatnonzero(mismatches <= max_mismatches):
+                hits.append((record, int(start), strand, int(mismatches[start])))
+    return sorted(hits)
+
+
+def mutated_probes(rng, references, nb_probes):
+    probes = []
+    for _ in range(nb_probes):
+        ref = rng.choice(references)
+        length = rng.randint(26, 32)
+        start = rng.randrange(len(ref) - length + 1)
+        probe = list(ref[start : start + length])
+        for _ in range(rng.choice([0, 1, 2, 3])):
+            probe[rng.randrange(length)] = rng.choice("ACGT")
+        probe = "".join(probe)
+        probes.append(reverse_complement(probe) if rng.random() < 0.5 else probe)
+    return probes
+
+
+def test_all_hits_within_mismatches_found():
+    rng = random.Random(0)
+    references = [random_sequence(rng, rng.randint(40, 1500)) for _ in range(20)]
+    references[2] = references[2][:50] + "NNNN" + references[2][54:]
+    # A duplicated transcript: its probes hit two records
+    references.append(references[0])
+    probes = mutated_probes(rng, references, 60)
+
+    for seed, max_mismatches in (("11111111", 2), ("1101101", 2), ("1" * 13, 1)):
+        index = SpecificityIndex(
+            [f"t{i}" for i in range(len(references))], references, seed
+        )
+        hits = index.find_hits(probes, max_mismatches)
+        for i, probe in enumerate(probes):
+            mine = hits["probe"] == i
+            found = zip(
+                hits["record"][mine],
+                hits["start"][mine],
+                hits["strand"][mine],
+                hits["mismatches"][mine],
+            )
+            assert sorted(found) == brute_force_hits(probe, references, max_mismatches)
+
+
+def test_blast_style_table():
+    rng = random.Random(1)
+    references = [random_sequence(rng, 600) for _ in range(3)]
+    references.append(references[1])
+    index = SpecificityIndex(["a", "b", "c", "b copy"], references)
+    probes = [
+        references[0][100:126],
+        reverse_complement(references[1][10:40]),
+        "ACGT" * 7,
+    ]
+    table = specificity_table(["p1", "p2", "p3"], probes, index)
+
+    assert list(table.columns) == HIT_COLUMNS
+    assert table["NumberOfHits"].tolist() == [1, 2, 0]
+    assert table["UniqueHitName"][0] == "a"
+    assert table["UniqueHitName"].isna().tolist() == [False, True, True]
+    assert (table["Start"][0], table["End"][0]) == (101, 126)
+    assert table["PercentAlignment"][0] == 100
+
+
+def test_seed_too_long_for_mismatches():
+    index = SpecificityIndex(["a"], ["ACGT" * 50], seed="1" * 13)
+    try:
+        index.find_hits(["ACGT" * 7], max_mismatches=2)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("13 nt seed accepted 2 mismatches on 28 nt probes")
+
+
+def test_shorter_seed_for_more_mismatches():
+    assert seed_for(26, 2) == DEFAULT_SEED
+    assert seed_for(26, 3) == "111111"
+    assert seed_for(32, 3) == DEFAULT_SEED
+
+    # 3 mismatches on 26-32 nt probes, as allowed by the analyzer GUI
+    rng = random.Random(2)
+    references = [random_sequence(rng, rng.randint(100, 800)) for _ in range(10)]
+    probes = mutated_probes(rng, references, 30)
+    seed = seed_for(min(map(len, probes)), 3)
+    index = SpecificityIndex([f"t{i}" for i in range(10)], references, seed)
+    hits = index.find_hits(probes, 3)
+    for i, probe in enumerate(probes):
+        mine = hits["probe"] == i
+        found = zip(
+            hits["record"][mine],
+            hits["start"][mine],
+            hits["strand"][mine],
+            hits["mismatches"][mine],
+        )
+        assert sorted(found) == brute_force_hits(probe, references, 3)
+
+
+if __name__ == "__main__":
+    test_all_hits_within_mismatches_found()
+    test_blast_style_table()
+    test_seed_too_long_for_mismatches()
+    test_shorter_seed_for_more_mismatches()
+    print("✅ specificity tests passed")
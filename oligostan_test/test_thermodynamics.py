@@ -0,0 +1,86 @@
+# test_thermodynamics.py - compiled NN models vs the R-style reference loop
+import sys
+import os
+import random
+import numpy as np
+
+# Add the PARENT directory to path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from thermodynamics import (
+    convert_rna_seq_2_delta_g_at_37,
+    dg_calc_batch,
+    dg_calc_rna_37,
+    get_thermo_model,
+)
+
+
+def reference_dg_calc(rna_seq, probe_length, salt_conc=0.115):
+    """Original per-window loop of dGCalc.RNA.37"""
+    dg_values = convert_rna_seq_2_delta_g_at_37(rna_seq)["dG"].values
+    rolling_sum = [
+        np.sum(dg_values[i : i + probe_length - 1])
+        for i in range(len(dg_values) - probe_length + 2)
+    ]
+    return [dg - ((np.log(salt_conc) * -0.175) - 0.2) for dg in rolling_sum]
+
+
+def test_sugimoto_model_is_bit_identical_to_reference():
+    rng = random.Random(7)
+    seq = "".join(rng.choice("ACGTN") for _ in range(500))
+    for probe_length in range(26, 33):
+        for salt_conc in (0.115, 0.3):
+            expected = reference_dg_calc(seq, probe_length, salt_conc)
+            got = dg_calc_rna_37(seq, probe_length=probe_length, salt_conc=salt_conc)
+            assert list(got) == expected
+
+
+def test_uracil_adds_no_dimer_dg():
+    """U is not in the dimer table: ACGU sequences score as in the R loop"""
+    rng = random.Random(11)
+    seq = "".join(rng.choice("ACGU") for _ in range(300))
+    expected = reference_dg_calc(seq, 26)
+    assert list(dg_calc_rna_37(seq, probe_length=26)) == expected
+    assert abs(dg_calc_rna_37("AUGCAUGCAU", 5)[0] - (-3.5785)) < 1e-3
+
+
+def test_models_are_cached_and_validated():
+    assert get_thermo_model() is get_thermo_model("sugimoto_rna_dna", 0.115, 37)
+    assert get_thermo_model("xia_rna_rna", 1.0, 37) is not get_thermo_model()
+
+    try:
+        get_thermo_model("sugimoto_rna_dna", temperature=25.0)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("dG37-only model accepted another temperature")
+
+
+def test_santalucia_model_matches_published_example():
+    """CGTTGA at 1 M Na+, 37C: dG = -5.35 kcal/mol (SantaLucia 1998)"""
+    model = get_thermo_model("santalucia_dna_dna", 1.0, 37.0)
+    dg = dg_calc_rna_37("CGTTGA", probe_length=6, model=model)[0]
+    assert abs(dg - (-5.35)) < 0.1
+
+
+def test_batch_dg_matches_single_probes():
+    rng = random.Random(3)
+    probes = [
+        "".join(rng.choice("ACGTNacg") for _ in range(rng.randint(1, 40)))
+        for _ in range(300)
+    ]
+    for model in (get_thermo_model(), get_thermo_model("santalucia_dna_dna", 1.0)):
+        got = dg_calc_batch(probes + [""], model=model)
+        expected = [dg_calc_rna_37(p, len(p), model=model)[0] for p in probes]
+        assert list(got[:-1]) == expected
+        assert np.isnan(got[-1])
+    assert len(dg_calc_batch([])) == 0
+
+
+if __name__ == "__main__":
+    test_sugimoto_model_is_bit_identical_to_reference()
+    test_uracil_adds_no_dimer_dg()
+    test_models_are_cached_and_validated()
+    test_santalucia_model_matches_published_example()
+    test_batch_dg_matches_single_probes()
+    print("✅ thermodynamics tests passed")
@@ -0,0 +1,227 @@
+# output_store.py - one SQLite database for a whole batch instead of per-file TSVs
+import argparse
+import json
+import os
+import sqlite3
+import time
+import pandas as pd
+
+from run_journal import atomic_write
+
+NO_PROBES_MESSAGE = "No probes found after filtering. Change filtering parameters.\n"
+
+# Bookkeeping columns of the probes table, not part of the R output
+_SOURCE_COLUMN = "_source"
+_ROW_COLUMN = "_row"
+_FILTERED_COLUMN = "_filtered"
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _sql_type(dtype):
+    if pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    return "TEXT"
+
+
+class ProbeStore:
+    """
+    Consolidated output of a batch: every input's ALL table in one SQLite file
+    Rows are keyed by source file (absolute input path) and keep their
+    position in the ALL table plus a flag for the FILT selection, so the
+    per-file R-compatible TSVs can be exported on demand. Each source is
+    replaced in a single transaction.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS sources ("
+            "source TEXT PRIMARY KEY, base_name TEXT, columns TEXT, "
+            "nb_probes INTEGER, nb_filtered INTEGER, written REAL)"
+        )
+        self.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS probes ("
+            f"{_SOURCE_COLUMN} TEXT, {_ROW_COLUMN} INTEGER, "
+            f"{_FILTERED_COLUMN} INTEGER)"
+        )
+        self.connection.execute(
+            f"CREATE INDEX IF NOT EXISTS probes_source "
+            f"ON probes ({_SOURCE_COLUMN}, {_ROW_COLUMN})"
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _probe_columns(self):
+        rows = self.connection.execute("PRAGMA table_info(probes)").fetchall()
+        return [row[1] for row in rows]
+
+    def _add_missing_columns(self, df):
+        existing = set(self._probe_columns())
+        for col in df.columns:
+            if col not in existing:
+                self.connection.execute(
+                    f"ALTER TABLE probes ADD COLUMN {_quote(col)} "
+                    f"{_sql_type(df[col].dtype)}"
+                )
+
+    def write_source(self, source, base_name, all_df, filtered_df):
+        """Store (or replace) the ALL/FILT tables of one input file
+        all_df/filtered_df as built by main.build_output_tables (None: no probes)"""
+        source = os.path.abspath(source)
+        with self.connection:
+            self.connection.execute(
+                f"DELETE FROM probes WHERE {_SOURCE_COLUMN} = ?", (source,)
+            )
+            columns = []
+            nb_filtered = 0
+            if all_df is not None:
+                columns = list(all_df.columns)
+                self._add_missing_columns(all_df)
+                nb_filtered = len(filtered_df)
+
+                table = all_df.reset_index(drop=True)
+                filtered = all_df.index.isin(filtered_df.index)
+                names = [_SOURCE_COLUMN, _ROW_COLUMN, _FILTERED_COLUMN] + columns
+                placeholders = ", ".join("?" * len(names))
+                values = zip(
+                    [source] * len(table),
+                    range(len(table)),
+                    filtered.astype(int).tolist(),
+                    *(table[col].astype(object).tolist() for col in columns),
+                )
+                self.connection.executemany(
+                    f"INSERT INTO probes ({', '.join(map(_quote, names))}) "
+                    f"VALUES ({placeholders})",
+                    values,
+                )
+
+            self.connection.execute(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    source,
+                    base_name,
+                    json.dumps(columns),
+                    0 if all_df is None else len(all_df),
+                    nb_filtered,
+                    time.time(),
+                ),
+            )
+
+    def written(self, source):
+        """Time the tables of source were stored (None: not in the store)"""
+        row = self.connection.execute(
+            "SELECT written FROM sources WHERE source = ?", (os.path.abspath(source),)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def sources(self):
+        """DataFrame of the stored inputs"""
+        return pd.read_sql_query(
+            "SELECT source, base_name, nb_probes, nb_filtered FROM sources "
+            "ORDER BY source",
+            self.connection,
+        )
+
+    def read_source(self, source, filtered_only=False):
+        """(columns, ALL or FILT DataFrame) of a stored input; df None if no probes"""
+        source = os.path.abspath(source)
+        row = self.connection.execute(
+            "SELECT columns FROM sources WHERE source = ?", (source,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"{source} is not in {self.path}")
+        columns = json.loads(row[0])
+        if not columns:
+            return columns, None
+
+        query = (
+            f"SELECT {', '.join(map(_quote, columns))} FROM probes "
+            f"WHERE {_SOURCE_COLUMN} = ?"
+        )
+        if filtered_only:
+            query += f" AND {_FILTERED_COLUMN} = 1"
+        query += f" ORDER BY {_ROW_COLUMN}"
+        return columns, pd.read_sql_query(query, self.connection, params=(source,))
+
+    def export_source(self, source, output_dir, base_name=None):
+        """Write Probes_<base>_ALL.txt / _FILT.txt of one input, like main.py"""
+        if base_name is None:
+            base_name = self.connection.execute(
+                "SELECT base_name FROM sources WHERE source = ?",
+                (os.path.abspath(source),),
+            ).fetchone()[0]
+        filt_filename = os.path.join(output_dir, f"Probes_{base_name}_FILT.txt")
+
+        columns, all_df = self.read_source(source)
+        if all_df is None:
+            with atomic_write(filt_filename) as f:
+                f.write(NO_PROBES_MESSAGE)
+            return [filt_filename]
+
+        raw_filename = os.path.join(output_dir, f"Probes_{base_name}_ALL.txt")
+        with atomic_write(raw_filename) as f:
+            all_df.to_csv(f, sep="\t", index=False)
+        _, filtered_df = self.read_source(source, filtered_only=True)
+        with atomic_write(filt_filename) as f:
+            filtered_df.to_csv(f, sep="\t", index=False)
+        return [raw_filename, filt_filename]
+
+    def export(self, output_dir, sources=None):
+        """Export several (default: all) inputs into output_dir"""
+        os.makedirs(output_dir, exist_ok=True)
+        stored = self.sources()
+        if sources is not None:
+            wanted = {os.path.abspath(source) for source in sources}
+            stored = stored[stored["source"].isin(wanted)]
+
+        written = []
+        used_names = {}
+        for source, base_name in zip(stored["source"], stored["base_name"]):
+            # Same file name in different input directories
+            count = used_names.get(base_name, 0)
+            used_names[base_name] = count + 1
+            if count:
+                print(f"Warning: several inputs named {base_name}, see {source}")
+                base_name = f"{base_name}_{count + 1}"
+            written.extend(self.export_source(source, output_dir, base_name))
+        return written
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="List or export the per-file tables of an Oligostan output store"
+    )
+    parser.add_argument("store", help="SQLite store written by main.py --store")
+    parser.add_argument(
+        "--out", help="export Probes_*_ALL/FILT.txt into this directory"
+    )
+    parser.add_argument(
+        "--source", nargs="*", help="input FASTA files to export (default: all)"
+    )
+    args = parser.parse_args()
+
+    with ProbeStore(args.store) as store:
+        if args.out is None:
+            print(store.sources().to_string(index=False))
+            return
+        written = store.export(args.out, args.source or None)
+        print(f"Exported {len(written)} files to: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+# panel_check.py - cross-hybridisation check for multiplexed probe panels
+import argparse
+import glob
+import os
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from composition import encode_sequence
+from sequence_utils import read_fasta_sequences, reverse_complement
+from thermodynamics import thermo_model_from_settings
+
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+_INVALID = np.iinfo(np.uint64).max
+
+REPORT_COLUMNS = [
+    "ProbeGene",
+    "ProbesNames",
+    "Seq",
+    "HitType",
+    "HitGene",
+    "HitName",
+    "HitStart",
+    "Overlap",
+    "MatchedBases",
+    "LongestRun",
+]
+
+
+def encode_kmers(seq, k=12):
+    """2-bit encoded k-mers of seq (k-mers containing N are set to _INVALID)"""
+    codes = encode_sequence(seq.upper())
+    if len(codes) < k:
+        return np.zeros(0, dtype=np.uint64)
+
+    powers = 4 ** np.arange(k - 1, -1, -1, dtype=np.uint64)
+    windows = sliding_window_view(codes, k)
+    kmers = (windows.astype(np.uint64) * powers).sum(axis=1, dtype=np.uint64)
+    kmers[~(windows < 4).all(axis=1)] = _INVALID
+    return kmers
+
+
+def minimizer_positions(kmers, w=8):
+    """Positions of the (w, k) minimizers: smallest hashed k-mer of each window"""
+    if len(kmers) == 0:
+        return np.zeros(0, dtype=np.int64)
+    hashes = kmers * _HASH_MULTIPLIER  # wraps modulo 2^64
+    hashes[kmers == _INVALID] = _INVALID
+    if len(hashes) <= w:
+        positions = np.array([np.argmin(hashes)])
+    else:
+        windows = sliding_window_view(hashes, w)
+        positions = np.unique(windows.argmin(axis=1) + np.arange(len(windows)))
+    return positions[kmers[positions] != _INVALID]
+
+
+class KmerIndex:
+    """
+    Sorted k-mer -> (record, position) index over a set of sequences
+    With w > 1 only the (w, k) minimizers are stored: every shared stretch of
+    at least w + k - 1 nt still contains one of them.
+    """
+
+    def __init__(self, sequences, k=12, w=1):
+        self.k = k
+        kmers, records, positions = [], [], []
+        for record, seq in enumerate(sequences):
+            seq_kmers = encode_kmers(seq, k)
+            if w > 1:
+                pos = minimizer_positions(seq_kmers, w)
+            else:
+                pos = np.flatnonzero(seq_kmers != _INVALID)
+            kmers.append(seq_kmers[pos])
+            records.append(np.full(len(pos), record, dtype=np.int64))
+            positions.append(pos.astype(np.int64))
+
+        kmers = np.concatenate(kmers) if kmers else np.zeros(0, dtype=np.uint64)
+        order = np.argsort(kmers, kind="stable")
+        self.kmers = kmers[order]
+        self.records = np.concatenate(records)[order] if records else kmers
+        self.positions = np.concatenate(positions)[order] if positions else kmers
+
+    def lookup(self, query_kmers):
+        """All (query index, record, position) hits for an array of k-mers"""
+        lo = np.searchsorted(self.kmers, query_kmers, side="left")
+        hi = np.searchsorted(self.kmers, query_kmers, side="right")
+        counts = hi - lo
+        query_idx = np.repeat(np.arange(len(query_kmers)), counts)
+        # Index ranges [lo, hi) flattened without a Python loop
+        starts = np.repeat(lo - np.cumsum(counts) + counts, counts)
+        hit_idx = starts + np.arange(counts.sum())
+        return query_idx, self.records[hit_idx], self.positions[hit_idx]
+
+
+def load_filt_outputs(paths):
+    """Concatenate Probes_<name>_FILT.txt tables, adding a ProbeGene column"""
+    tables = []
+    for path in paths:
+        gene = os.path.basename(path)
+        gene = gene[len("Probes_") :] if gene.startswith("Probes_") else gene
+        gene = gene[: -len("_FILT.txt")] if gene.endswith("_FILT.txt") else gene
+        try:
+            df = pd.read_csv(path, sep="\t", usecols=["ProbesNames", "Seq"])
+        except ValueError:
+            # "No probes found" placeholder files have no table
+            continue
+        df["ProbeGene"] = gene
+        tables.append(df)
+
+    if not tables:
+        return pd.DataFrame(columns=["ProbesNames", "Seq", "ProbeGene"])
+    return pd.concat(tables, ignore_index=True)
+
+
+def rescore_probes(probes_df, **params):
+    """dG37 of imported probes under the given (default: current) settings
+    All sequences are scored in one NearestNeighborModel.batch_dg call."""
+    model = thermo_model_from_settings(**params)
+    return model.batch_dg([str(seq) for seq in probes_df["Seq"]])
+
+
+def find_filt_outputs(inputs):
+    """Expand directories into the Probes_*_FILT.txt files they contain"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, "**", "Probes_*_FILT.txt")
+            paths.extend(sorted(glob.glob(pattern, recursive=True)))
+        else:
+            paths.append(item)
+    return paths
+
+
+def _diagonal_match(query, subject, offset):
+    """Overlap, matched bases and longest matched run of query placed at offset"""
+    q_start = max(0, -offset)
+    s_start = max(0, offset)
+    overlap = min(len(query) - q_start, len(subject) - s_start)
+    matched = 0
+    longest = 0
+    run = 0
+    for a, b in zip(
+        query[q_start : q_start + overlap], subject[s_start : s_start + overlap]
+    ):
+        if a == b:
+            matched += 1
+            run += 1
+            longest = max(longest, run)
+        else:
+            run = 0
+    return overlap, matched, longest
+
+
+def _candidate_hits(query_seqs, index, k):
+    """Unique (query, record, diagonal) triples sharing at least one k-mer"""
+    kmers, owners, offsets = [], [], []
+    for q, seq in enumerate(query_seqs):
+        seq_kmers = encode_kmers(seq, k)
+        valid = np.flatnonzero(seq_kmers != _INVALID)
+        kmers.append(seq_kmers[valid])
+        owners.append(np.full(len(valid), q, dtype=np.int64))
+        offsets.append(valid.astype(np.int64))
+    if not kmers:
+        return np.zeros((0, 3), dtype=np.int64)
+
+    kmers = np.concatenate(kmers)
+    owners = np.concatenate(owners)
+    offsets = np.concatenate(offsets)
+
+    query_idx, records, positions = index.lookup(kmers)
+    diagonals = positions - offsets[query_idx]
+    triples = np.column_stack([owners[query_idx], records, diagonals])
+    return np.unique(triples, axis=0)
+
+
+def check_panel(
+    probes_df, targets=None, k=11, w=4, min_matched=24, check_probe_pairs=True
+):
+    """
+    Report cross-gene near-complementary probe/target and probe/probe pairs
+    probes_df: ProbeGene / ProbesNames / Seq (see load_filt_outputs)
+    targets: list of {"name", "sequence"} records as returned by
+    read_fasta_sequences, i.e. already in probe orientation
+    A pair is reported when at least min_matched bases agree on the best
+    k-mer-seeded diagonal, so a few mismatches are tolerated.
+    """
+    probe_seqs = [seq.upper() for seq in probes_df["Seq"]]
+    probe_genes = list(probes_df["ProbeGene"])
+    probe_names = list(probes_df["ProbesNames"])
+    rows = []
+
+    def report(q, query, hit_type, hit_gene, hit_name, subject, offset):
+        overlap, matched, longest = _diagonal_match(query, subject, offset)
+        if matched >= min_matched:
+            rows.append(
+                [
+                    probe_genes[q],
+                    probe_names[q],
+                    probe_seqs[q],
+                    hit_type,
+                    hit_gene,
+                    hit_name,
+                    offset + 1,
+                    overlap,
+                    matched,
+                    longest,
+                ]
+            )
+
+    # Probe binding another gene's transcript: probe ~ target (probe sense)
+    if targets:
+        target_seqs = [t["sequence"].upper() for t in targets]
+        index = KmerIndex(target_seqs, k=k, w=w)
+        for q, t, offset in _candidate_hits(probe_seqs, index, k):
+            if targets[t]["name"] != probe_genes[q]:
+                report(
+                    q,
+                    probe_seqs[q],
+                    "target",
+                    targets[t]["name"],
+                    targets[t]["id"],
+                    target_seqs[t],
+                    offset,
+                )
+
+    # Probe/probe duplexes: probe A ~ reverse complement of probe B
+    if check_probe_pairs:
+        index = KmerIndex(probe_seqs, k=k, w=1)
+        query_seqs = [reverse_complement(seq) for seq in probe_seqs]
+        for q, p, offset in _candidate_hits(query_seqs, index, k):
+            # Symmetric relation: keep one orientation per cross-gene pair
+            if probe_genes[q] != probe_genes[p] and q < p:
+                report(
+                    q,
+                    query_seqs[q],
+                    "probe",
+                    probe_genes[p],
+                    probe_names[p],
+                    probe_seqs[p],
+                    offset,
+                )
+
+    report_df = pd.DataFrame(rows, columns=REPORT_COLUMNS)
+    # Several diagonals of one pair can pass; keep the best one
+    report_df = report_df.sort_values("MatchedBases", ascending=False)
+    report_df = report_df.drop_duplicates(["ProbesNames", "HitType", "HitName"])
+    return report_df.reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check a multiplexed probe panel for cross-gene hybridisation"
+    )
+    parser.add_argument(
+        "inputs", nargs="+", help="Probes_*_FILT.txt files or directories"
+    )
+    parser.add_argument(
+        "--targets", nargs="*", default=[], help="FASTA files of the target genes"
+    )
+    parser.add_argument("--out", default="panel_cross_hybridisation.txt")
+    parser.add_argument("-k", type=int, default=11, help="k-mer size")
+    parser.add_argument("-w", type=int, default=4, help="minimizer window")
+    parser.add_argument("--min-matched", type=int, default=24)
+    args = parser.parse_args()
+
+    probes_df = load_filt_outputs(find_filt_outputs(args.inputs))
+    targets = []
+    for fasta in args.targets:
+        targets.extend(read_fasta_sequences(fasta))
+
+    print(f"Loaded {len(probes_df)} probes and {len(targets)} target sequences")
+    if len(probes_df):
+        # Panels may mix designs made with other settings
+        dg37 = rescore_probes(probes_df)
+        print(f"Probe dG37 with current settings: {dg37.min():.2f} to {dg37.max():.2f}")
+    report_df = check_panel(
+        probes_df, targets, k=args.k, w=args.w, min_matched=args.min_matched
+    )
+    report_df.to_csv(args.out, sep="\t", index=False)
+    print(f"Found {len(report_df)} cross-gene pairs, saved to: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# probe_batch.py - compact array-backed probes of one sequence
+import numpy as np
+
+from config import FLAP_SEQUENCES
+
+# Filter results packed as bits of ProbeBatch.flags
+FLAG_BITS = {
+    "GCFilter": 1 << 0,
+    "aCompFilter": 1 << 1,
+    "aStackFilter": 1 << 2,
+    "cCompFilter": 1 << 3,
+    "cStackFilter": 1 << 4,
+    "cSpecStackFilter": 1 << 5,
+    "PNASFilter": 1 << 6,
+    "MaskedFilter": 1 << 7,
+}
+# Flags summed into NbOfPNAS
+PNAS_FLAGS = [
+    "aCompFilter",
+    "aStackFilter",
+    "cCompFilter",
+    "cStackFilter",
+    "cSpecStackFilter",
+]
+
+
+class ProbeBatch:
+    """
+    Probes selected on one sequence, stored column-wise
+    Probes are (size, score, 1-based position) arrays referring to the parent
+    sequence, so probe and FLAP sequences are only built when exported.
+    score_probe_batch fills the per-probe output columns (dG37, GC%, masked
+    fraction and the filter flags as bits). to_probe_list/to_dicts give the
+    historical [size, score, position, seq] lists and 23-key dicts.
+    """
+
+    __slots__ = (
+        "sequence",
+        "sizes",
+        "scores",
+        "positions",
+        "dg37",
+        "dg37_model",
+        "gc_percent",
+        "masked_percent",
+        "flags",
+    )
+
+    def __init__(self, sequence, sizes, scores, positions):
+        self.sequence = sequence
+        self.sizes = np.asarray(sizes, dtype=np.int64)
+        self.scores = np.asarray(scores, dtype=np.float64)
+        self.positions = np.asarray(positions, dtype=np.int64)
+        self.dg37 = None
+        self.dg37_model = None
+        self.gc_percent = None
+        self.masked_percent = None
+        self.flags = None
+
+    @classmethod
+    def from_probe_list(cls, probes, sequence):
+        """Batch from [size, score, position, seq] lists (None: no probes)"""
+        probes = probes or []
+        return cls(
+            sequence,
+            [probe[0] for probe in probes],
+            [probe[1] for probe in probes],
+            [probe[2] for probe in probes],
+        )
+
+    def set_dg37(self, dg37, thermo_model):
+        """Probe dG37 values and the key of the model they come from"""
+        self.dg37 = np.asarray(dg37, dtype=np.float64)
+        self.dg37_model = thermo_model.key
+
+    def __len__(self):
+        return len(self.sizes)
+
+    @property
+    def starts(self):
+        """0-based start of each probe in the parent sequence"""
+        return self.positions - 1
+
+    def probe_sequence(self, i):
+        start = self.positions[i] - 1
+        return self.sequence[start : start + self.sizes[i]].upper()
+
+    def probe_sequences(self):
+        return [
+            self.sequence[start : start + size].upper()
+            for start, size in zip(self.starts.tolist(), self.sizes.tolist())
+        ]
+
+    def flag(self, name):
+        """0/1 array of one filter flag"""
+        return ((self.flags & FLAG_BITS[name]) != 0).astype(np.int64)
+
+    def set_flag(self, name, passed):
+        if self.flags is None:
+            self.flags = np.zeros(len(self), dtype=np.uint8)
+        bit = np.uint8(FLAG_BITS[name])
+        self.flags = np.where(passed, self.flags | bit, self.flags & ~bit)
+        self.flags = self.flags.astype(np.uint8)
+
+    def nb_of_pnas(self):
+        return sum(self.flag(name) for name in PNAS_FLAGS)
+
+    def to_probe_list(self):
+        """Historical get_probes_from_rna_dg37 output"""
+        return [
+            [size, score, position, seq]
+            for size, score, position, seq in zip(
+                self.sizes.tolist(),
+                self.scores,
+                self.positions.tolist(),
+                self.probe_sequences(),
+            )
+        ]
+
+    def output_columns(self, name, dg37_value):
+        """R output columns (dict of equal-length lists/arrays, R order)"""
+        seqs = self.probe_sequences()
+        seq_length = len(self.sequence)
+
+        # R: (seqlength - ProbeList[[probeListNb]][i, 3] + 1) -> EndPosTmp
+        #    (EndPosTmp - ProbeList[[probeListNb]][i, 1]) -> StartPosTmp
+        end_pos = seq_length - self.positions + 1
+        start_pos = end_pos - self.sizes
+
+        columns = {
+            "dGOpt": [dg37_value] * len(self),
+            "ProbesNames": [f"{name} probe {i+1}" for i in range(len(self))],
+            "theStartPos": start_pos,
+            "theEndPos": end_pos,
+            "ProbeSize": self.sizes,
+            "Seq": seqs,
+            "dGScore": self.scores,
+            "dG37": self.dg37,
+            "GCpc": self.gc_percent,
+        }
+        for flag_name in ["GCFilter"] + PNAS_FLAGS:
+            columns[flag_name] = self.flag(flag_name)
+        columns["NbOfPNAS"] = self.nb_of_pnas()
+        columns["PNASFilter"] = self.flag("PNASFilter")
+        columns["MaskedFilter"] = self.flag("MaskedFilter")
+        columns["RepeatMaskerPC"] = self.masked_percent
+        columns["InsideUTR"] = np.zeros(len(self), dtype=np.int64)
+        for flap in ("X", "Y", "Z"):
+            columns[f"HybFlp{flap}"] = [seq + FLAP_SEQUENCES[flap] for seq in seqs]
+        return columns
+
+    def to_dataframe(self, name, dg37_value):
+        """R output table of this batch (requires score_probe_batch)"""
+        import pandas as pd
+
+        return pd.DataFrame(self.output_columns(name, dg37_value))
+
+    def to_dicts(self, name, dg37_value):
+        """Historical process_probes_for_output records, one dict per probe"""
+        columns = self.output_columns(name, dg37_value)
+        values = [
+            column.tolist() if isinstance(column, np.ndarray) else column
+            for column in columns.values()
+        ]
+        return [dict(zip(columns, row)) for row in zip(*values)]
@@ -0,0 +1,207 @@
+# probe_tables.py - parallel, cached loading of probe tables and indexed joins
+import hashlib
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+
+# Parsed tables are cached here, keyed by path, size and mtime
+TABLE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "oligostan", "tables")
+
+# Bump when the parsing below changes so stale cache entries are ignored
+TABLE_CACHE_VERSION = 1
+
+# Explicit dtypes for the Oligostan output columns, so pandas does not have
+# to infer them; any other column is still inferred
+TEXT_COLUMNS = ["ProbesNames", "Seq", "HybFlpX", "HybFlpY", "HybFlpZ"]
+FLOAT_COLUMNS = ["dGOpt", "dG37", "dGScore", "GCpc", "RepeatMaskerPC", "Tm"]
+
+# Repeated labels stored as categories after combining
+CATEGORICAL_COLUMNS = ["ProbesNames", "SourceFile"]
+
+
+def _has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def table_version(file_path):
+    """(absolute path, size, mtime) of file_path, or None if it is gone"""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns
+
+
+def _cache_path(file_path, usecols, cache_dir):
+    """Cache file for this exact version of file_path, or None if it is gone"""
+    version = table_version(file_path)
+    if version is None:
+        return None
+    key = repr(
+        (
+            TABLE_CACHE_VERSION,
+            *version,
+            tuple(usecols) if usecols is not None else None,
+        )
+    )
+    # Feather when pyarrow is installed, pickle otherwise
+    extension = ".feather" if _has_pyarrow() else ".pkl"
+    return os.path.join(cache_dir, hashlib.sha1(key.encode()).hexdigest() + extension)
+
+
+def _read_cache(cache_file):
+    if cache_file.endswith(".feather"):
+        return pd.read_feather(cache_file)
+    with open(cache_file, "rb") as f:
+        return pickle.load(f)
+
+
+def _write_cache(df, cache_file):
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        if cache_file.endswith(".feather"):
+            df.reset_index(drop=True).to_feather(tmp_file)
+        else:
+            with open(tmp_file, "wb") as f:
+                pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except Exception as e:
+        # Caching is only an optimisation
+        print(f"Warning: could not cache table: {e}")
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+def _column_dtypes(columns):
+    dtypes = {col: str for col in TEXT_COLUMNS if col in columns}
+    dtypes.update({col: "float64" for col in FLOAT_COLUMNS if col in columns})
+    return dtypes
+
+
+def read_probe_table(file_path, usecols=None, cache_dir=TABLE_CACHE_DIR):
+    """
+    Read one .csv/.xlsx probe table (only usecols if given)
+    Known Oligostan columns get explicit dtypes. The parsed table is cached
+    under cache_dir (None disables caching) and reused while the file's size
+    and modification time are unchanged.
+    """
+    cache_file = None
+    if cache_dir is not None:
+        cache_file = _cache_path(file_path, usecols, cache_dir)
+        if cache_file is not None and os.path.exists(cache_file):
+            try:
+                return _read_cache(cache_file)
+            except Exception:
+                # Corrupt or unreadable entry: parse the file again
+                pass
+
+    if file_path.endswith(".xlsx"):
+        columns = list(pd.read_excel(file_path, nrows=0).columns)
+        read = pd.read_excel
+    else:
+        columns = list(pd.read_csv(file_path, nrows=0).columns)
+        read = pd.read_csv
+    if usecols is not None:
+        missing = [col for col in usecols if col not in columns]
+        if missing:
+            raise ValueError(
+                f"Column(s) {', '.join(missing)} not found in "
+                f"{os.path.basename(file_path)}"
+            )
+        columns = list(usecols)
+
+    df = read(file_path, usecols=usecols, dtype=_column_dtypes(columns))
+
+    if cache_file is not None:
+        _write_cache(df, cache_file)
+    return df
+
+
+def preview_probe_tables(file_paths, nrows=20, progress_callback=None):
+    """
+    (columns, head) of several probe tables without loading them
+    columns is the union of all headers in file order; head holds the first
+    nrows rows of the files taken in order, each file read only as far as
+    needed. progress_callback(done, total, file_path) follows each file.
+    """
+    file_paths = list(file_paths)
+    columns = []
+    heads = []
+    remaining = nrows
+    for done, path in enumerate(file_paths, start=1):
+        if path.endswith(".xlsx"):
+            head = pd.read_excel(path, nrows=remaining)
+        else:
+            head = pd.read_csv(path, nrows=remaining)
+        columns.extend(col for col in head.columns if col not in columns)
+        if len(head):
+            heads.append(head)
+            remaining -= len(head)
+        if progress_callback is not None:
+            progress_callback(done, len(file_paths), path)
+
+    head = pd.concat(heads, ignore_index=True) if heads else pd.DataFrame()
+    return columns, head.reindex(columns=columns)
+
+
+def load_probe_tables(
+    file_paths,
+    usecols=None,
+    n_jobs=None,
+    cache_dir=TABLE_CACHE_DIR,
+    progress_callback=None,
+):
+    """
+    Read several probe tables in parallel and concatenate them
+    A SourceFile column records where each row came from, and the columns in
+    CATEGORICAL_COLUMNS become categoricals. progress_callback(done, total,
+    file_path, df) is called as each file finishes; an exception raised from
+    it cancels the files not started yet.
+    """
+    file_paths = list(file_paths)
+    if not file_paths:
+        raise ValueError("No probe table to load")
+    if n_jobs is None:
+        n_jobs = min(len(file_paths), os.cpu_count() or 1)
+
+    tables = [None] * len(file_paths)
+    with ThreadPoolExecutor(max_workers=max(1, n_jobs)) as pool:
+        futures = {
+            pool.submit(read_probe_table, path, usecols, cache_dir): i
+            for i, path in enumerate(file_paths)
+        }
+        try:
+            for done, future in enumerate(as_completed(futures), start=1):
+                i = futures[future]
+                tables[i] = future.result()
+                if progress_callback is not None:
+                    progress_callback(done, len(file_paths), file_paths[i], tables[i])
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    for path, df in zip(file_paths, tables):
+        df["SourceFile"] = os.path.basename(path)  # Track source file
+
+    combined_df = pd.concat(tables, ignore_index=True)
+    for col in CATEGORICAL_COLUMNS:
+        if col in combined_df.columns:
+            combined_df[col] = combined_df[col].astype("category")
+    return combined_df
+
+
+def indexed_left_join(left, right, left_on, right_on):
+    """
+    Left join of right onto left[left_on] == right[right_on]
+    Same rows, order and suffixes as left.merge(..., how="left"), minus the
+    right_on column: right is hash-indexed once on right_on and each row of
+    left (or each category, for a categorical key) is looked up in it.
+    """
+    return left.join(right.set_index(right_on), on=left_on, lsuffix="_x", rsuffix="_y")
@@ -0,0 +1,161 @@
+# run_journal.py - atomic output writes and a resumable record of batch runs
+import contextlib
+import hashlib
+import json
+import os
+import time
+
+DEFAULT_JOURNAL = "oligostan_journal.jsonl"
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode="w"):
+    """
+    Open a temporary file next to path and rename it over path on success
+    Readers (and a resumed run) only ever see the old file or the complete
+    new one; on error the temporary file is removed.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp_path = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def settings_fingerprint(settings):
+    """Stable hash of a settings dict (or DesignSettings, whose
+    fingerprint() it equals), stored with every journal record"""
+    text = json.dumps(dict(settings), sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _input_state(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _store_state(store, input_path):
+    """Output store of an input: its file and when the input's rows were written"""
+    if store is None:
+        return None
+    return {"path": os.path.abspath(store.path), "written": store.written(input_path)}
+
+
+class RunJournal:
+    """
+    Append-only JSON-lines journal of a batch run
+    A "start" record lists the run's inputs; each finished input gets a
+    "done" record with its size/mtime, the settings fingerprint, the
+    SHA-256 of every output and, for a ProbeStore run, the store file and
+    when the input's rows were written to it. Every record is fsync'ed, and
+    a line torn by a crash is ignored when the journal is read back.
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL):
+        self.path = path
+        self.inputs = []
+        self.done = {}
+        self.failed = {}
+
+    def load(self):
+        """Read an existing journal (missing file: empty journal)"""
+        self.inputs = []
+        self.done = {}
+        self.failed = {}
+        if not os.path.exists(self.path):
+            return self
+
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                event = record.get("event")
+                if event == "start":
+                    self.inputs = record["inputs"]
+                elif event == "done":
+                    self.done[record["input"]] = record
+                    self.failed.pop(record["input"], None)
+                elif event == "failed":
+                    self.failed[record["input"]] = record
+        return self
+
+    def _append(self, record):
+        record["time"] = time.time()
+        with open(self.path, "a+b") as f:
+            # Terminate a line torn by a crash so this record stays readable
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+            f.write((json.dumps(record) + "\n").encode())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def start(self, inputs, resume=False):
+        """Begin a run; without resume any previous journal is discarded"""
+        inputs = [os.path.abspath(path) for path in inputs]
+        if not resume and os.path.exists(self.path):
+            os.remove(self.path)
+            self.done = {}
+            self.failed = {}
+        self.inputs = inputs
+        self._append({"event": "start", "inputs": inputs})
+
+    def is_done(self, input_path, fingerprint=None, store=None):
+        """True if input_path finished with the same input, settings and outputs
+        store: the run's ProbeStore, which must hold the rows recorded as done"""
+        record = self.done.get(os.path.abspath(input_path))
+        if record is None:
+            return False
+        try:
+            if _input_state(input_path) != record["input_state"]:
+                return False
+            if fingerprint is not None and record["settings"] != fingerprint:
+                return False
+            if record.get("store") != _store_state(store, input_path):
+                return False
+            return all(
+                os.path.exists(path) and file_sha256(path) == digest
+                for path, digest in record["outputs"].items()
+            )
+        except OSError:
+            return False
+
+    def record_done(self, input_path, output_paths, fingerprint=None, store=None):
+        input_path = os.path.abspath(input_path)
+        record = {
+            "event": "done",
+            "input": input_path,
+            "input_state": _input_state(input_path),
+            "settings": fingerprint,
+            "outputs": {
+                os.path.abspath(path): file_sha256(path) for path in output_paths
+            },
+            "store": _store_state(store, input_path),
+        }
+        self._append(record)
+        self.done[input_path] = record
+        self.failed.pop(input_path, None)
+
+    def record_failed(self, input_path, error):
+        input_path = os.path.abspath(input_path)
+        record = {"event": "failed", "input": input_path, "error": str(error)}
+        self._append(record)
+        self.failed[input_path] = record
@@ -0,0 +1,96 @@
+# scheduler.py - longest-first scheduling of design tasks on a worker pool
+import heapq
+from concurrent.futures import FIRST_COMPLETED, wait
+
+# Relative cost of the design stages, in windows scored at one probe size
+# (about 0.15 us each); measured on random transcripts
+SELECT_PROBE_COST = 50  # greedy walk, flags and output row of one probe
+DUSTMASKER_RUN_COST = 2e5  # starting dustmasker on a record's probes
+DUSTMASKER_PROBE_COST = 200
+STRUCTURE_PROBE_COST = 7e4  # Tm, hairpin and homodimer of a probe and flaps
+
+# Probe tables longer than this go through the structure stage in pieces
+STRUCTURE_TASK_PROBES = 250
+
+
+def position_count(length, settings):
+    """Start positions scored in a sequence of length bases"""
+    return max(length - settings["taille_sonde_max"] + 1, 0)
+
+
+def expected_probes(length, settings):
+    """Probes selected at most in a sequence (tightly packed)"""
+    spacing = settings["taille_sonde_max"] + settings["distance_min_inter_sonde"]
+    return position_count(length, settings) / spacing
+
+
+def window_cost(nb_positions, settings):
+    nb_sizes = settings["taille_sonde_max"] - settings["taille_sonde_min"] + 1
+    return nb_positions * nb_sizes
+
+
+def select_cost(length, settings):
+    """Selection, flags and dustmasker run of one record"""
+    nb_probes = expected_probes(length, settings)
+    cost = nb_probes * SELECT_PROBE_COST
+    if settings.get("use_dustmasker", False):
+        cost += DUSTMASKER_RUN_COST + nb_probes * DUSTMASKER_PROBE_COST
+    return cost
+
+
+def structure_cost(nb_probes):
+    return nb_probes * STRUCTURE_PROBE_COST
+
+
+def record_cost(length, settings):
+    """Estimated cost of designing a record of length bases"""
+    cost = window_cost(position_count(length, settings), settings)
+    cost += select_cost(length, settings)
+    if settings.get("structure_scoring", False):
+        cost += structure_cost(expected_probes(length, settings))
+    return cost
+
+
+def split_ranges(count, size):
+    """[first, end) ranges of at most size items covering range(count)"""
+    if not size:
+        return [(0, count)] if count else []
+    return [(first, min(first + size, count)) for first in range(0, count, size)]
+
+
+class TaskQueue:
+    """Pending tasks, largest estimated cost first (ties: order pushed)"""
+
+    def __init__(self):
+        self._heap = []
+        self._pushed = 0
+
+    def push(self, cost, key, function, *args):
+        """Queue function(*args); key identifies the task to the caller"""
+        heapq.heappush(self._heap, (-cost, self._pushed, key, function, args))
+        self._pushed += 1
+
+    def pop(self):
+        _, _, key, function, args = heapq.heappop(self._heap)
+        return key, function, args
+
+    def __len__(self):
+        return len(self._heap)
+
+
+def run_longest_first(pool, queue, slots):
+    """
+    Run the tasks of queue on pool, yields (key, future) as they finish
+    Only slots tasks are submitted at a time, so a worker coming idle gets
+    the largest task left instead of one queued behind a long task; tasks
+    pushed while iterating (e.g. the next stage of a finished task) are
+    dispatched in cost order too.
+    """
+    running = {}
+    while queue or running:
+        while queue and len(running) < slots:
+            key, function, args = queue.pop()
+            running[pool.submit(function, *args)] = key
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield running.pop(future), future
@@ -0,0 +1,225 @@
+# secondary_structure.py - Tm, hairpin and homodimer scoring stage
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from composition import SequenceComposition, BASE_CODES, NB_CODES
+from thermodynamics import get_thermo_model, KELVIN
+from config import DEFAULT_SETTINGS
+
+# Watson-Crick pairs between base codes (A-T, C-G)
+_PAIRS = np.zeros((NB_CODES, NB_CODES), dtype=bool)
+for _a, _b in ("AT", "TA", "CG", "GC"):
+    _PAIRS[BASE_CODES[_a], BASE_CODES[_b]] = True
+
+# DNA hairpin loop dG37 (kcal/mol) by loop size (SantaLucia & Hicks 2004)
+_HAIRPIN_LOOP_SIZES = np.array([3, 4, 5, 6, 7, 8, 9, 10, 12, 14, 16, 18, 20, 25, 30])
+_HAIRPIN_LOOP_DG37 = np.array(
+    [3.5, 3.5, 3.3, 4.0, 4.2, 4.3, 4.5, 4.6, 5.0, 5.1, 5.3, 5.5, 5.7, 6.1, 6.3]
+)
+
+# Structure model: DNA probe folding on itself, SantaLucia DNA/DNA stacks
+STRUCTURE_MODEL = "santalucia_dna_dna"
+
+# Minimum number of uncached sequences before a process pool is worth it
+PARALLEL_MIN_BATCH = 256
+
+STRUCTURE_CACHE_MAX = 200000
+_structure_cache = {}
+
+
+def hairpin_loop_dg(loop_size, temperature=37.0):
+    """Hairpin loop penalty, treated as purely entropic for other temperatures"""
+    dg37 = np.interp(loop_size, _HAIRPIN_LOOP_SIZES, _HAIRPIN_LOOP_DG37)
+    # Jacobson-Stockmayer extrapolation beyond the tabulated sizes
+    large = loop_size > _HAIRPIN_LOOP_SIZES[-1]
+    dg37 = np.where(
+        large,
+        _HAIRPIN_LOOP_DG37[-1]
+        + 1.75
+        * 1.9872e-3
+        * 310.15
+        * np.log(np.maximum(loop_size, 1) / _HAIRPIN_LOOP_SIZES[-1]),
+        dg37,
+    )
+    return dg37 * (temperature + KELVIN) / 310.15
+
+
+def hairpin_dg(seq, model, max_loop=30):
+    """
+    Most stable single-stem hairpin dG of seq (0.0 if none is favourable)
+    Banded DP over pair span d = j - i: E_d[i] is the best stem whose
+    outermost pair is (i, i + d); it either closes a hairpin loop of
+    d - 1 <= max_loop nt or stacks on E_{d-2}[i + 1].
+    """
+    composition = SequenceComposition(seq)
+    codes = composition.codes
+    n = len(codes)
+    if n < 5:
+        return 0.0
+
+    stack = model.dimer_table[composition.dimer_index]
+    loop_dg = hairpin_loop_dg(np.arange(n), model.temperature)
+
+    best = 0.0
+    previous = {}  # span -> E_span
+    for span in range(4, n):
+        i = np.arange(n - span)
+        paired = _PAIRS[codes[i], codes[i + span]]
+
+        closing = np.full(len(i), np.inf)
+        if span - 1 <= max_loop:
+            closing[:] = loop_dg[span - 1]
+
+        inner = previous.get(span - 2)
+        if inner is not None:
+            stacked = stack[i] + inner[i + 1]
+            closing = np.minimum(closing, stacked)
+
+        energies = np.where(paired, closing, np.inf)
+        previous[span] = energies
+        previous.pop(span - 3, None)
+        if len(energies):
+            best = min(best, float(energies.min()))
+
+    return best
+
+
+def dimer_dg(seq_a, seq_b, model):
+    """
+    Most stable ungapped antiparallel duplex between seq_a and seq_b
+    F[i, j] is the best helix starting at pair (a[i], b[j]) and extending
+    to (a[i + 1], b[j - 1]); each row is one vectorized step.
+    """
+    comp_a = SequenceComposition(seq_a)
+    codes_a = comp_a.codes
+    codes_b = SequenceComposition(seq_b).codes
+    n, m = len(codes_a), len(codes_b)
+    if n < 2 or m < 2:
+        return 0.0
+
+    paired = _PAIRS[codes_a[:, None], codes_b[None, :]]
+    stack = model.dimer_table[comp_a.dimer_index]
+    terminal = model.terminal_table[codes_a]
+
+    helix = np.full((n, m), np.inf)
+    helix[n - 1] = np.where(paired[n - 1], terminal[n - 1], np.inf)
+    for i in range(n - 2, -1, -1):
+        inner = np.full(m, np.inf)
+        inner[1:] = helix[i + 1, :-1]
+        extended = np.minimum(stack[i] + inner, terminal[i])
+        helix[i] = np.where(paired[i], extended, np.inf)
+
+    # Close the helix at its 5' pair, plus duplex initiation
+    total = helix + terminal[:, None] - model.window_offset
+    return min(0.0, float(total.min()))
+
+
+def structure_scores(seq, salt_conc=0.115, temperature=37.0, oligo_conc=2.5e-7):
+    """(Tm, hairpin dG, homodimer dG) of one probe sequence, memoised"""
+    key = (seq, salt_conc, temperature, oligo_conc)
+    if key in _structure_cache:
+        return _structure_cache[key]
+
+    result = _compute_structure_scores(key)
+    _remember(key, result)
+    return result
+
+
+def _compute_structure_scores(key):
+    seq, salt_conc, temperature, oligo_conc = key
+    model = get_thermo_model(STRUCTURE_MODEL, salt_conc, temperature)
+    return (
+        float(model.duplex_tm(seq, oligo_conc)),
+        hairpin_dg(seq, model),
+        dimer_dg(seq, seq, model),
+    )
+
+
+def _remember(key, result):
+    if len(_structure_cache) >= STRUCTURE_CACHE_MAX:
+        # Drop the oldest entry (dicts keep insertion order)
+        del _structure_cache[next(iter(_structure_cache))]
+    _structure_cache[key] = result
+
+
+def clear_structure_cache():
+    _structure_cache.clear()
+
+
+def score_structures_batch(
+    sequences, salt_conc=0.115, temperature=37.0, oligo_conc=2.5e-7, n_jobs=None
+):
+    """
+    structure_scores for a batch of sequences
+    Duplicates and cached sequences are computed once; large batches of new
+    sequences are spread over a process pool (n_jobs=None: all CPUs).
+    """
+    keys = [(seq, salt_conc, temperature, oligo_conc) for seq in sequences]
+    # Cached results are read before anything is stored: storing the new
+    # results may evict them
+    found = {key: _structure_cache[key] for key in keys if key in _structure_cache}
+    missing = list(dict.fromkeys(key for key in keys if key not in found))
+
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+
+    if n_jobs > 1 and len(missing) >= PARALLEL_MIN_BATCH:
+        chunksize = max(1, len(missing) // (n_jobs * 4))
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            results = list(
+                pool.map(_compute_structure_scores, missing, chunksize=chunksize)
+            )
+    else:
+        results = [_compute_structure_scores(key) for key in missing]
+
+    for key, result in zip(missing, results):
+        _remember(key, result)
+        found[key] = result
+
+    return [found[key] for key in keys]
+
+
+def add_secondary_structure_scores(probes_data, **params):
+    """
+    Scoring stage run after process_probes_for_output
+    Adds Tm, hairpin and homodimer dG of each probe and of its HybFlpX/Y/Z
+    concatenations, plus a StructureFilter pass flag. Returns probes_data.
+    """
+    if not probes_data:
+        return probes_data
+
+    salt_conc = params.get("salt_conc", DEFAULT_SETTINGS["salt_conc"])
+    temperature = params.get("temperature", DEFAULT_SETTINGS["temperature"])
+    oligo_conc = params.get("oligo_conc", DEFAULT_SETTINGS["oligo_conc"])
+    min_hairpin_dg = params.get("min_hairpin_dg", DEFAULT_SETTINGS["min_hairpin_dg"])
+    min_homodimer_dg = params.get(
+        "min_homodimer_dg", DEFAULT_SETTINGS["min_homodimer_dg"]
+    )
+
+    columns = {"Seq": "", "HybFlpX": "FlpX", "HybFlpY": "FlpY", "HybFlpZ": "FlpZ"}
+    sequences = [probe[column] for probe in probes_data for column in columns]
+    scores = score_structures_batch(
+        sequences,
+        salt_conc,
+        temperature,
+        oligo_conc,
+        n_jobs=params.get("structure_jobs", DEFAULT_SETTINGS["structure_jobs"]),
+    )
+
+    for p, probe in enumerate(probes_data):
+        probe_scores = scores[p * len(columns) : (p + 1) * len(columns)]
+        probe["Tm"] = probe_scores[0][0]
+
+        structure_pass = True
+        for (column, suffix), (_, hairpin, homodimer) in zip(
+            columns.items(), probe_scores
+        ):
+            probe[f"HairpinDG{suffix}"] = hairpin
+            probe[f"HomodimerDG{suffix}"] = homodimer
+            structure_pass &= hairpin >= min_hairpin_dg
+            structure_pass &= homodimer >= min_homodimer_dg
+
+        probe["StructureFilter"] = 1 if structure_pass else 0
+
+    return probes_data
@@ -1,41 +1,83 @@
 # sequence_utils.py
-from Bio import SeqIO
-from Bio.Seq import Seq
 import os
 
+from fasta_io import FastaIndex, fasta_base_name, index_is_current, open_fasta
+
 
 def read_fasta_sequences(file_path):
-    """Read FASTA sequences and return as list with reverse complement"""
+    """Read FASTA sequences and return as list with reverse complement
+    Compressed files (.gz, .bgz, .bz2, .zst) are decompressed while read."""
+    from Bio import SeqIO
+
     sequences = []
 
-    # Extract base filename without extension (e.g., "humanRNU1_1" from "humanRNU1_1.fa")
-    base_filename = os.path.splitext(os.path.basename(file_path))[0]
+    # Extract base filename without extension (e.g., "humanRNU1_1" from
+    # "humanRNU1_1.fa" or "humanRNU1_1.fa.gz")
+    base_filename = fasta_base_name(file_path)
 
-    for record in SeqIO.parse(file_path, "fasta"):
-        # Use base filename instead of sequence header (FIXED!)
-        seq_id = base_filename
+    with open_fasta(file_path) as handle:
+        for record in SeqIO.parse(handle, "fasta"):
+            # Use base filename instead of sequence header (FIXED!)
+            seq_id = base_filename
 
-        # Reverse complement to work from probe perspective (matching R script)
-        rev_comp_seq = str(record.seq.reverse_complement())
+            # Reverse complement to work from probe perspective (matching R script)
+            rev_comp_seq = str(record.seq.reverse_complement())
 
-        sequences.append(
-            {
-                "id": seq_id,
-                "name": base_filename,  # Use filename base
-                "sequence": rev_comp_seq,
-            }
-        )
+            sequences.append(
+                {
+                    "id": seq_id,
+                    "name": base_filename,  # Use filename base
+                    "sequence": rev_comp_seq,
+                }
+            )
 
     return sequences
 
 
+def read_fasta_records(file_path, indices):
+    """
+    read_fasta_sequences() records of the given record numbers only
+    Plain and bgzip files with an up-to-date .fai index (see fasta_io.py)
+    are read at the records' offsets; other files, or records not matching
+    their index, are streamed once.
+    """
+    indices = list(indices)
+    if index_is_current(file_path):
+        from Bio.Seq import reverse_complement as bio_reverse_complement
+
+        base_filename = fasta_base_name(file_path)
+        try:
+            index = FastaIndex(file_path)
+            return [
+                {
+                    "id": base_filename,
+                    "name": base_filename,
+                    "sequence": bio_reverse_complement(index.fetch(record)),
+                }
+                for record in indices
+            ]
+        except (ValueError, IndexError):
+            pass
+
+    sequences = read_fasta_sequences(file_path)
+    return [sequences[index] for index in indices]
+
+
 def create_output_directory(input_file_path):
     """Create output directory in same location as input file"""
     input_dir = os.path.dirname(input_file_path)
-    base_name = os.path.splitext(os.path.basename(input_file_path))[0]
+    base_name = fasta_base_name(input_file_path)
     output_dir = os.path.join(input_dir, f"Probes_{base_name}")
 
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
     return output_dir
+
+
+_COMPLEMENT = str.maketrans("ACGTUNacgtun", "TGCAANtgcaan")
+
+
+def reverse_complement(seq):
+    """Reverse complement of a DNA/RNA string (U is complemented like T)"""
+    return seq.translate(_COMPLEMENT)[::-1]
@@ -0,0 +1,253 @@
+# sharding.py - split a batch into shards designed on separate nodes
+import argparse
+import csv
+import hashlib
+import heapq
+import os
+import pickle
+
+from run_journal import atomic_write, file_sha256
+
+MANIFEST_COLUMNS = ["source", "record", "length", "shard"]
+SHARD_METHODS = ("hash", "size")
+
+# Manifest row of an input without records: nothing to design, but the
+# merge still writes its "no probes" output
+NO_RECORD = -1
+
+
+def build_manifest(files):
+    """One (source, record, length) row per FASTA record of files"""
+    from Bio import SeqIO
+
+    from fasta_io import open_fasta
+
+    manifest = []
+    for file_path in files:
+        source = os.path.abspath(file_path)
+        nb_records = 0
+        with open_fasta(file_path) as handle:
+            for record, seq_record in enumerate(SeqIO.parse(handle, "fasta")):
+                manifest.append(
+                    {"source": source, "record": record, "length": len(seq_record.seq)}
+                )
+                nb_records += 1
+        if not nb_records:
+            manifest.append({"source": source, "record": NO_RECORD, "length": 0})
+    return manifest
+
+
+def _hash_shard(row, nb_shards):
+    # Keyed on the file name, not its path: the same on every node
+    key = f"{os.path.basename(row['source'])}:{row['record']}".encode()
+    return int(hashlib.sha256(key).hexdigest()[:16], 16) % nb_shards
+
+
+def assign_shards(manifest, nb_shards, method="size"):
+    """
+    Set the shard of every manifest row, deterministically
+    hash: sha256 of "<file name>:<record>", so a record keeps its shard when
+    others are added; size: longest records first, each to the least loaded
+    shard (ties to the lowest shard), balancing the bases of the shards.
+    """
+    if nb_shards < 1:
+        raise ValueError(f"at least one shard is needed, got {nb_shards}")
+    if method not in SHARD_METHODS:
+        raise ValueError(f"unknown shard method {method!r} (use {SHARD_METHODS})")
+
+    if method == "hash":
+        for row in manifest:
+            row["shard"] = _hash_shard(row, nb_shards)
+        return manifest
+
+    loads = [(0, shard) for shard in range(nb_shards)]
+    order = sorted(
+        range(len(manifest)),
+        key=lambda i: (-manifest[i]["length"], manifest[i]["source"], i),
+    )
+    for i in order:
+        load, shard = heapq.heappop(loads)
+        manifest[i]["shard"] = shard
+        heapq.heappush(loads, (load + manifest[i]["length"], shard))
+    return manifest
+
+
+def write_manifest(manifest, path):
+    with atomic_write(path) as f:
+        writer = csv.DictWriter(f, MANIFEST_COLUMNS, delimiter="\t")
+        writer.writeheader()
+        writer.writerows(manifest)
+
+
+def read_manifest(path):
+    with open(path, newline="") as f:
+        return [
+            {
+                "source": row["source"],
+                "record": int(row["record"]),
+                "length": int(row["length"]),
+                "shard": int(row["shard"]),
+            }
+            for row in csv.DictReader(f, delimiter="\t")
+        ]
+
+
+def shard_loads(manifest):
+    """{shard: (records, bases)} of an assigned manifest"""
+    loads = {}
+    for row in manifest:
+        records, bases = loads.get(row["shard"], (0, 0))
+        loads[row["shard"]] = (
+            records + (row["record"] != NO_RECORD),
+            bases + row["length"],
+        )
+    return dict(sorted(loads.items()))
+
+
+def run_shard(manifest_path, shard, output_path, settings=None):
+    """
+    Design the records of one shard, returns the number of records designed
+    The raw probe table of every record (None without probes) is pickled to
+    output_path with the manifest's checksum; merge_shards() builds the
+    ALL/FILT outputs once all shards are done. Every shard and the merge
+    must use the same settings (DesignSettings, default DEFAULT_SETTINGS).
+    """
+    from config import design_settings
+    from main import design_sequences
+    from sequence_utils import read_fasta_records
+
+    settings = design_settings(settings)
+    manifest = read_manifest(manifest_path)
+    records = {}
+    for row in manifest:
+        if row["shard"] == shard and row["record"] != NO_RECORD:
+            records.setdefault(row["source"], []).append(row["record"])
+
+    tables = {}
+    for source, indices in records.items():
+        # Indexed inputs (fasta_io.py) are read at the shard's records only
+        sequences = read_fasta_records(source, indices)
+        for index, seq_data in zip(indices, sequences):
+            tables[(source, index)] = design_sequences([seq_data], settings=settings)
+
+    with atomic_write(output_path, "wb") as f:
+        pickle.dump(
+            {
+                "manifest": file_sha256(manifest_path),
+                "shard": shard,
+                "tables": tables,
+            },
+            f,
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+    return len(tables)
+
+
+def merge_shards(manifest_path, shard_paths, store=None, settings=None):
+    """
+    Combine shard outputs into the outputs of an unsharded run
+    Each input's record tables are concatenated in record order, then
+    written like main.py does: Probes_* folders next to the inputs, or the
+    ProbeStore store. Returns the output files written.
+    """
+    import pandas as pd
+
+    from main import write_file_outputs
+
+    manifest = read_manifest(manifest_path)
+    checksum = file_sha256(manifest_path)
+    tables = {}
+    for path in shard_paths:
+        with open(path, "rb") as f:
+            shard_output = pickle.load(f)
+        if shard_output["manifest"] != checksum:
+            raise ValueError(f"{path} was run from another manifest")
+        tables.update(shard_output["tables"])
+
+    missing = [
+        row
+        for row in manifest
+        if row["record"] != NO_RECORD and (row["source"], row["record"]) not in tables
+    ]
+    if missing:
+        shards = sorted({row["shard"] for row in missing})
+        raise ValueError(
+            f"{len(missing)} records have no design: run shards {shards} first"
+        )
+
+    sources = {}
+    for row in manifest:
+        sources.setdefault(row["source"], []).append(row["record"])
+
+    output_files = []
+    for source, indices in sources.items():
+        record_tables = [
+            tables[(source, index)]
+            for index in sorted(indices)
+            if index != NO_RECORD and tables[(source, index)] is not None
+        ]
+        probes_data = None
+        if record_tables:
+            probes_data = pd.concat(record_tables, ignore_index=True)
+        output_files += write_file_outputs(source, probes_data, store, settings)
+    return output_files
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sharded Oligostan runs: plan shards, run them on separate "
+        "nodes, merge their outputs"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    plan = commands.add_parser("plan", help="write the shard manifest of inputs")
+    plan.add_argument("files", nargs="+", help="FASTA files")
+    plan.add_argument("--shards", type=int, required=True, help="number of shards")
+    plan.add_argument(
+        "--method",
+        choices=SHARD_METHODS,
+        default="size",
+        help="hash of the record, or size-balanced on sequence length",
+    )
+    plan.add_argument("--manifest", default="shards.tsv", help="manifest to write")
+
+    run = commands.add_parser("run", help="design the records of one shard")
+    run.add_argument("manifest", help="manifest written by plan")
+    run.add_argument("shard", type=int, help="shard to design (0 to shards-1)")
+    run.add_argument("--out", help="shard output (default: <manifest>.shard<N>)")
+
+    merge = commands.add_parser("merge", help="write the outputs of all shards")
+    merge.add_argument("manifest", help="manifest written by plan")
+    merge.add_argument("shard_outputs", nargs="+", help="outputs of run")
+    merge.add_argument(
+        "--store",
+        help="write all probes to this SQLite file instead of Probes_* folders",
+    )
+    args = parser.parse_args()
+
+    if args.command == "plan":
+        manifest = assign_shards(build_manifest(args.files), args.shards, args.method)
+        write_manifest(manifest, args.manifest)
+        print(f"Manifest saved to: {args.manifest}")
+        for shard, (records, bases) in shard_loads(manifest).items():
+            print(f"Shard {shard}: {records} records, {bases} bases")
+
+    elif args.command == "run":
+        out = args.out or f"{args.manifest}.shard{args.shard}"
+        nb_records = run_shard(args.manifest, args.shard, out)
+        print(f"Shard {args.shard}: {nb_records} records designed, saved to: {out}")
+
+    else:
+        from output_store import ProbeStore
+
+        store = ProbeStore(args.store) if args.store else None
+        output_files = merge_shards(args.manifest, args.shard_outputs, store)
+        if store is not None:
+            store.close()
+            print(f"Probes stored in: {args.store}")
+        else:
+            print(f"Merged {len(args.shard_outputs)} shards: {len(output_files)} files")
+
+
+if __name__ == "__main__":
+    main()
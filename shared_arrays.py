@@ -0,0 +1,135 @@
+# shared_arrays.py - read-only arrays shared with worker processes through mmap
+import os
+import tempfile
+import numpy as np
+
+# Backing files live in RAM when the platform has a tmpfs for it
+SHARED_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+# Byte alignment of every array in the backing file
+_ALIGN = 64
+
+
+class SharedArrays:
+    """
+    Named NumPy arrays packed into one memory-mapped file
+    The parent writes the arrays once with create(); handle() is a small
+    picklable (path, layout) tuple that workers pass to attach() to get
+    read-only zero-copy views, so the data is in memory once per node no
+    matter how many processes use it. The creating object removes the file
+    on close().
+    """
+
+    def __init__(self, path, layout, owner=False):
+        self.path = path
+        self.layout = layout
+        self.owner = owner
+        self._map = None
+        self.arrays = {}
+        if os.path.getsize(path):
+            self._map = np.memmap(path, dtype=np.uint8, mode="r")
+        for name, dtype, shape, offset in layout:
+            nbytes = int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+            view = (
+                self._map[offset : offset + nbytes] if nbytes else np.zeros(0, np.uint8)
+            )
+            self.arrays[name] = view.view(dtype).reshape(shape)
+
+    @classmethod
+    def create(cls, arrays, directory=SHARED_DIR):
+        """Write arrays (dict name -> array) to a new backing file"""
+        layout = []
+        offset = 0
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            offset = -(-offset // _ALIGN) * _ALIGN
+            layout.append((name, array.dtype.str, array.shape, offset))
+            offset += array.nbytes
+
+        fd, path = tempfile.mkstemp(prefix="oligostan_", suffix=".shm", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for (name, _, _, array_offset), array in zip(layout, arrays.values()):
+                    f.seek(array_offset)
+                    f.write(np.ascontiguousarray(array).tobytes())
+                f.truncate(offset)
+        except BaseException:
+            os.remove(path)
+            raise
+        return cls(path, layout, owner=True)
+
+    @classmethod
+    def attach(cls, handle):
+        path, layout = handle
+        return cls(path, layout)
+
+    def handle(self):
+        return self.path, self.layout
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def __contains__(self, name):
+        return name in self.arrays
+
+    def close(self):
+        self.arrays = {}
+        self._map = None
+        if self.owner and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SharedTranscriptome:
+    """
+    Sequence set of a batch in shared memory
+    Sequences are stored as one ASCII byte array with record offsets; a
+    record is addressed by its index, and sequence(i) decodes only that
+    record. Names travel in the handle.
+    """
+
+    def __init__(self, arrays, names):
+        self.arrays = arrays
+        self.names = names
+
+    @classmethod
+    def from_sequences(cls, names, sequences, directory=SHARED_DIR):
+        lengths = np.array([len(seq) for seq in sequences], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        data = np.frombuffer("".join(sequences).encode("ascii"), dtype=np.uint8)
+        arrays = {"data": data, "offsets": offsets}
+        return cls(SharedArrays.create(arrays, directory), list(names))
+
+    @classmethod
+    def attach(cls, handle):
+        arrays_handle, names = handle
+        return cls(SharedArrays.attach(arrays_handle), names)
+
+    def handle(self):
+        return self.arrays.handle(), self.names
+
+    def __len__(self):
+        return len(self.names)
+
+    def bounds(self, i):
+        """(start, end) byte offsets of record i"""
+        offsets = self.arrays["offsets"]
+        return int(offsets[i]), int(offsets[i + 1])
+
+    def sequence(self, i):
+        start, end = self.bounds(i)
+        return self.arrays["data"][start:end].tobytes().decode("ascii")
+
+    def close(self):
+        self.arrays.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -6,6 +6,28 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import os
 
+from fasta_io import FASTA_FILE_PATTERNS
+from gui_tasks import BackgroundTask
+from probe_tables import (
+    load_probe_tables,
+    preview_probe_tables,
+    indexed_left_join,
+    table_version,
+)
+from specificity import (
+    DEFAULT_MAX_MISMATCHES,
+    MAX_PROBE_LENGTH,
+    SpecificityIndex,
+    seed_for,
+    specificity_table,
+)
+
+# Rows shown in the data preview
+PREVIEW_ROWS = 20
+
+# Characters of BLAST text read per chunk, between progress/cancel checks
+BLAST_READ_CHUNK = 1 << 22
+
 
 class SmFISHBlastAnalyzerGUI:
     def __init__(self, root):
@@ -16,12 +38,20 @@ class SmFISHBlastAnalyzerGUI:
 
         # Variables
         self.blast_file = tk.StringVar()
+        # Alternative to BLAST: built-in search against a reference FASTA
+        self.reference_file = tk.StringVar()
+        self.max_mismatches = tk.IntVar(value=DEFAULT_MAX_MISMATCHES)
+        self.specificity_index = None
+        self.indexed_reference = None  # reference_file the index was built from
         self.csv_files = []
         self.probe_names_column = tk.StringVar()
         self.sequence_column = tk.StringVar()
         self.output_dir = tk.StringVar()
         self.combined_df = None
+        self.combined_files = None  # table_version of the files in combined_df
+        self.preview_df = None
         self.available_columns = []
+        self.task = None
 
         self.create_widgets()
 
@@ -67,6 +97,25 @@ class SmFISHBlastAnalyzerGUI:
             side=tk.RIGHT
         )
 
+        # Or search a reference transcriptome directly (no BLAST run needed)
+        ttk.Label(
+            main_frame, text="   or a reference transcriptome FASTA (built-in search):"
+        ).pack(anchor=tk.W, pady=(0, 5))
+
+        reference_frame = ttk.Frame(main_frame)
+        reference_frame.pack(fill=tk.X, pady=(0, 15))
+
+        ttk.Entry(
+            reference_frame, textvariable=self.reference_file, state="readonly"
+        ).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 5))
+        ttk.Label(reference_frame, text="Max mismatches:").pack(side=tk.LEFT)
+        ttk.Spinbox(
+            reference_frame, from_=0, to=3, width=3, textvariable=self.max_mismatches
+        ).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(
+            reference_frame, text="Browse", command=self.browse_reference_file
+        ).pack(side=tk.RIGHT)
+
         # CSV files selection
         ttk.Label(
             main_frame,
@@ -105,12 +154,21 @@ class SmFISHBlastAnalyzerGUI:
         ).pack(side=tk.LEFT)
 
         # Load and combine button
-        ttk.Button(
-            main_frame,
-            text="Load and Combine Files",
+        load_frame = ttk.Frame(main_frame)
+        load_frame.pack(pady=20)
+
+        self.load_btn = ttk.Button(
+            load_frame,
+            text="Load Columns and Preview",
             command=self.load_and_combine_files,
             style="Accent.TButton",
-        ).pack(pady=20)
+        )
+        self.load_btn.pack(side=tk.LEFT, padx=(0, 5))
+
+        self.cancel_load_btn = ttk.Button(
+            load_frame, text="Cancel", command=self.cancel_task, state="disabled"
+        )
+        self.cancel_load_btn.pack(side=tk.LEFT)
 
     def create_config_tab(self, parent):
         main_frame = ttk.Frame(parent, padding="10")
@@ -223,14 +281,22 @@ class SmFISHBlastAnalyzerGUI:
         ).pack(anchor=tk.W)
 
         # Run analysis button
+        analyze_frame = ttk.Frame(main_frame)
+        analyze_frame.pack(pady=20)
+
         self.analyze_btn = ttk.Button(
-            main_frame,
+            analyze_frame,
             text="Run Analysis",
             command=self.run_analysis,
             state="disabled",
             style="Accent.TButton",
         )
-        self.analyze_btn.pack(pady=20)
+        self.analyze_btn.pack(side=tk.LEFT, padx=(0, 5))
+
+        self.cancel_analysis_btn = ttk.Button(
+            analyze_frame, text="Cancel", command=self.cancel_task, state="disabled"
+        )
+        self.cancel_analysis_btn.pack(side=tk.LEFT)
 
         # Progress bar
         self.progress = ttk.Progressbar(main_frame, mode="indeterminate")
@@ -259,6 +325,59 @@ class SmFISHBlastAnalyzerGUI:
         self.log_text.see(tk.END)
         self.root.update_idletasks()
 
+    def update_progress(self, done, total=None):
+        """Show worker progress: determinate when the total is known"""
+        if total:
+            self.progress.stop()
+            self.progress.config(mode="determinate", maximum=total, value=done)
+        elif str(self.progress.cget("mode")) != "indeterminate":
+            self.progress.config(mode="indeterminate", value=0)
+            self.progress.start()
+
+    def start_task(self, target, args, on_done, on_error, cancel_btn):
+        """Run target on a worker thread; progress and log go through a queue"""
+        self.progress.config(mode="indeterminate", value=0)
+        self.progress.start()
+        self.load_btn.config(state="disabled")
+        self.analyze_btn.config(state="disabled")
+        cancel_btn.config(state="normal")
+
+        def finish():
+            self.task = None
+            self.progress.stop()
+            self.progress.config(mode="indeterminate", value=0)
+            cancel_btn.config(state="disabled")
+            self.load_btn.config(state="normal")
+            self.check_ready_for_analysis()
+
+        def done(result):
+            finish()
+            on_done(result)
+
+        def failed(error):
+            finish()
+            on_error(error)
+
+        def cancelled():
+            finish()
+            self.log_message("Cancelled")
+
+        self.task = BackgroundTask(
+            self.root,
+            target,
+            args=args,
+            on_done=done,
+            on_error=failed,
+            on_cancel=cancelled,
+            on_log=self.log_message,
+            on_progress=self.update_progress,
+        ).start()
+
+    def cancel_task(self):
+        if self.task is not None:
+            self.log_message("Cancelling...")
+            self.task.cancel()
+
     def browse_blast_file(self):
         """Browse for BLAST results file"""
         filename = filedialog.askopenfilename(
@@ -269,6 +388,17 @@ class SmFISHBlastAnalyzerGUI:
             self.blast_file.set(filename)
             self.log_message(f"Selected BLAST file: {os.path.basename(filename)}")
 
+    def browse_reference_file(self):
+        """Browse for a reference transcriptome FASTA file"""
+        filename = filedialog.askopenfilename(
+            title="Select reference transcriptome FASTA file",
+            filetypes=[("FASTA files", FASTA_FILE_PATTERNS), ("All files", "*.*")],
+        )
+        if filename:
+            self.reference_file.set(filename)
+            self.log_message(f"Selected reference: {os.path.basename(filename)}")
+            self.check_ready_for_analysis()
+
     def add_csv_files(self):
         """Add CSV files to the list"""
         filenames = filedialog.askopenfilenames(
@@ -301,88 +431,91 @@ class SmFISHBlastAnalyzerGUI:
         self.log_message("Cleared all CSV files")
 
     def load_and_combine_files(self):
-        """Load and combine all CSV files"""
+        """Read the column headers and a preview of the CSV files
+        The files are only fully loaded and combined when the analysis runs"""
         if not self.csv_files:
             messagebox.showerror("Error", "Please select at least one CSV file")
             return
 
-        try:
-            self.log_message("Loading and combining CSV files...")
-            combined_dfs = []
-
-            for i, csv_file in enumerate(self.csv_files):
-                self.log_message(
-                    f"Loading file {i+1}/{len(self.csv_files)}: {os.path.basename(csv_file)}"
-                )
-
-                if csv_file.endswith(".xlsx"):
-                    df = pd.read_excel(csv_file)
-                else:
-                    df = pd.read_csv(csv_file)
-
-                df["SourceFile"] = os.path.basename(csv_file)  # Track source file
-                combined_dfs.append(df)
-                self.log_message(
-                    f"  - Loaded {len(df)} rows, {len(df.columns)} columns"
-                )
-
-            # Combine all dataframes
-            self.combined_df = pd.concat(combined_dfs, ignore_index=True)
-            self.available_columns = [
-                col for col in self.combined_df.columns if col != "SourceFile"
-            ]
-
-            # Update column dropdowns
-            self.probe_combo["values"] = self.available_columns
-            self.sequence_combo["values"] = self.available_columns
-
-            # Auto-select common column names
-            for col in self.available_columns:
-                if any(keyword in col.lower() for keyword in ["probe", "name", "id"]):
-                    self.probe_names_column.set(col)
-                    break
+        self.log_message("Reading columns and preview rows...")
+        self.start_task(
+            self.preview_files_worker,
+            (list(self.csv_files),),
+            self.files_previewed,
+            self.files_load_failed,
+            self.cancel_load_btn,
+        )
 
-            for col in self.available_columns:
-                if any(
-                    keyword in col.lower()
-                    for keyword in ["seq", "sequence", "dna", "rna"]
-                ):
-                    self.sequence_column.set(col)
-                    break
+    def preview_files_worker(self, task, csv_files):
+        """Runs on the worker thread; reports through task only"""
 
-            # Update preview
-            self.update_preview()
+        def report(done, total, csv_file):
+            task.progress(done, total)
+            task.check_cancelled()
 
-            self.log_message(f"Successfully combined {len(self.csv_files)} files:")
-            self.log_message(f"  - Total rows: {len(self.combined_df)}")
-            self.log_message(f"  - Columns: {', '.join(self.available_columns)}")
+        return preview_probe_tables(csv_files, PREVIEW_ROWS, progress_callback=report)
 
-            # Set default output directory
-            if self.csv_files:
-                default_output = os.path.dirname(self.csv_files[0])
-                self.output_dir.set(default_output)
+    def load_files_worker(self, task, csv_files):
+        """Full load, run by the analysis worker; reports through task only"""
 
-            messagebox.showinfo(
-                "Success",
-                f"Combined {len(self.csv_files)} files successfully!\n"
-                f"Total rows: {len(self.combined_df)}",
+        def report(done, total, csv_file, df):
+            task.log(
+                f"Loaded file {done}/{total}: {os.path.basename(csv_file)} "
+                f"({len(df)} rows, {len(df.columns)} columns)"
             )
+            task.progress(done, total)
+            task.check_cancelled()
+
+        # Files are parsed in parallel and cached until they change
+        return load_probe_tables(csv_files, progress_callback=report)
 
-        except Exception as e:
-            self.log_message(f"Error loading files: {str(e)}")
-            messagebox.showerror("Error", f"Failed to load files: {str(e)}")
+    def files_previewed(self, preview):
+        """Back on the Tk thread: update widgets with the columns and preview"""
+        self.available_columns, self.preview_df = preview
+
+        # Update column dropdowns
+        self.probe_combo["values"] = self.available_columns
+        self.sequence_combo["values"] = self.available_columns
+
+        # Auto-select common column names
+        for col in self.available_columns:
+            if any(keyword in col.lower() for keyword in ["probe", "name", "id"]):
+                self.probe_names_column.set(col)
+                break
+
+        for col in self.available_columns:
+            if any(
+                keyword in col.lower() for keyword in ["seq", "sequence", "dna", "rna"]
+            ):
+                self.sequence_column.set(col)
+                break
+
+        # Update preview
+        self.update_preview()
+
+        self.log_message(f"Read columns of {len(self.csv_files)} files:")
+        self.log_message(f"  - Columns: {', '.join(self.available_columns)}")
+        self.log_message("  - Files will be fully loaded when the analysis starts")
+
+        # Set default output directory
+        if self.csv_files:
+            default_output = os.path.dirname(self.csv_files[0])
+            self.output_dir.set(default_output)
 
         # ADDED - Check if ready after loading files
         self.check_ready_for_analysis()
 
+    def files_load_failed(self, error):
+        self.log_message(f"Error loading files: {str(error)}")
+        messagebox.showerror("Error", f"Failed to load files: {str(error)}")
+
     def update_preview(self):
         """Update the data preview"""
-        if self.combined_df is None:
+        if self.preview_df is None:
             return
 
         # Clear existing data
-        for item in self.preview_tree.get_children():
-            self.preview_tree.delete(item)
+        self.preview_tree.delete(*self.preview_tree.get_children())
 
         # Set up columns (show first 10 columns to avoid overcrowding)
         display_columns = self.available_columns[:10]
@@ -394,9 +527,9 @@ class SmFISHBlastAnalyzerGUI:
             self.preview_tree.heading(col, text=col)
             self.preview_tree.column(col, width=100, minwidth=80)
 
-        # Add sample data (first 20 rows)
-        for idx, row in self.combined_df.head(20).iterrows():
-            values = [str(row[col]) if col in row else "" for col in display_columns]
+        # Add sample data (first PREVIEW_ROWS rows)
+        rows = self.preview_df[display_columns].head(PREVIEW_ROWS).astype(str)
+        for values in rows.itertuples(index=False, name=None):
             self.preview_tree.insert("", "end", values=values)
 
     def browse_output_dir(self):
@@ -411,8 +544,9 @@ class SmFISHBlastAnalyzerGUI:
     def check_ready_for_analysis(self):
         """Check if ready for analysis and enable/disable button"""
         ready = (
-            self.blast_file.get()
-            and self.combined_df is not None
+            self.task is None
+            and (self.blast_file.get() or self.reference_file.get())
+            and self.available_columns
             and self.probe_names_column.get()
             and self.sequence_column.get()
             and self.output_dir.get()
@@ -422,12 +556,20 @@ class SmFISHBlastAnalyzerGUI:
         self.analyze_btn.config(state="normal" if ready else "disabled")
         return ready
 
-    def parse_blast_results(self, blast_text):
-        """Parse BLAST result text and extract required information"""
+    def parse_blast_results(self, blast_text, task=None):
+        """Parse BLAST result text and extract required information
+        task (optional): BackgroundTask receiving characters parsed as progress"""
         queries = re.split(r"Query #\d+: ", blast_text)[1:]
         records = []
+        parsed = 0
+
+        for q, query in enumerate(queries):
+            if task is not None:
+                parsed += len(query)
+                if q % 1000 == 0:
+                    task.check_cancelled()
+                    task.progress(parsed, len(blast_text))
 
-        for query in queries:
             # Extract probe name
             probe_name_search = re.search(r"^(.+?)\s+Query ID:", query)
             probe_name = (
@@ -472,103 +614,197 @@ class SmFISHBlastAnalyzerGUI:
 
         return pd.DataFrame(records)
 
+    def read_blast_file(self, blast_path, task):
+        """Read the BLAST report in chunks, reporting bytes read"""
+        total = os.path.getsize(blast_path)
+        chunks = []
+        nb_read = 0
+        with open(blast_path, "r") as f:
+            while True:
+                task.check_cancelled()
+                chunk = f.read(BLAST_READ_CHUNK)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                nb_read += len(chunk)
+                task.progress(min(nb_read, total), total)
+        return "".join(chunks)
+
     def run_analysis(self):
-        """Run the BLAST analysis"""
+        """Run the BLAST analysis on a worker thread"""
         if not self.check_ready_for_analysis():
             messagebox.showerror("Error", "Please complete all required fields")
             return
 
-        try:
-            self.progress.start()
-            self.analyze_btn.config(state="disabled")
+        # Versions of the files now, so an edited file is loaded again
+        csv_versions = [table_version(path) for path in self.csv_files]
+
+        # Read the Tk variables here, the worker must not touch widgets
+        settings = {
+            "blast_path": self.blast_file.get(),
+            "reference_path": self.reference_file.get(),
+            "max_mismatches": self.max_mismatches.get(),
+            # Reference index, reused while the reference is unchanged
+            "index": (
+                self.specificity_index
+                if self.indexed_reference == self.reference_file.get()
+                else None
+            ),
+            "csv_files": list(self.csv_files),
+            "csv_versions": csv_versions,
+            # Full load of the files, reused while they are unchanged
+            "combined_df": (
+                self.combined_df if self.combined_files == csv_versions else None
+            ),
+            "probe_col": self.probe_names_column.get(),
+            "seq_col": self.sequence_column.get(),
+            "unique_hits_only": self.unique_hits_only.get(),
+            "output_dir": self.output_dir.get(),
+        }
+        self.start_task(
+            self.analysis_worker,
+            (settings,),
+            self.analysis_done,
+            self.analysis_failed,
+            self.cancel_analysis_btn,
+        )
 
+    def analysis_worker(self, task, settings):
+        """Runs on the worker thread; reports through task only"""
+        combined_df = settings["combined_df"]
+        if combined_df is None:
+            task.log("Loading and combining CSV files...")
+            combined_df = self.load_files_worker(task, settings["csv_files"])
+            task.log(f"  - Total rows: {len(combined_df)}")
+        if settings["probe_col"] not in combined_df.columns:
+            raise ValueError(f"Column '{settings['probe_col']}' not found in files")
+
+        index = settings["index"]
+        if settings["reference_path"]:
+            blast_df, index = self.search_reference_worker(task, combined_df, settings)
+        else:
             # Parse BLAST results
-            self.log_message("Parsing BLAST results...")
-            with open(self.blast_file.get(), "r") as f:
-                blast_text = f.read()
-
-            blast_df = self.parse_blast_results(blast_text)
-            self.log_message(f"Parsed {len(blast_df)} probe results from BLAST")
-
-            # Merge with combined CSV data
-            self.log_message("Merging BLAST results with probe data...")
-            probe_col = self.probe_names_column.get()
-            seq_col = self.sequence_column.get()
-
-            merged_df = self.combined_df.merge(
-                blast_df, left_on=probe_col, right_on="ProbeName", how="left"
-            )
-
-            self.log_message(f"Merged data: {len(merged_df)} total rows")
-
-            # Apply filtering if requested
-            if self.unique_hits_only.get():
-                filtered_df = merged_df[merged_df["NumberOfHits"] == 1].copy()
-                self.log_message(
-                    f"Filtered for unique hits: {len(filtered_df)} rows remaining"
-                )
-            else:
-                filtered_df = merged_df.copy()
-                self.log_message("No filtering applied - keeping all results")
-
-            # Remove duplicate ProbeName column
-            if "ProbeName" in filtered_df.columns:
-                filtered_df.drop(columns=["ProbeName"], inplace=True)
-
-            # Save results
-            output_dir = self.output_dir.get()
-
-            # Save BLAST results
+            task.log("Reading BLAST results...")
+            blast_text = self.read_blast_file(settings["blast_path"], task)
+
+            task.log("Parsing BLAST results...")
+            blast_df = self.parse_blast_results(blast_text, task)
+            del blast_text
+            task.log(f"Parsed {len(blast_df)} probe results from BLAST")
+
+        # Merge with combined CSV data
+        task.check_cancelled()
+        task.log("Merging BLAST results with probe data...")
+        task.progress(0)
+        probe_col = settings["probe_col"]
+
+        merged_df = indexed_left_join(combined_df, blast_df, probe_col, "ProbeName")
+
+        task.log(f"Merged data: {len(merged_df)} total rows")
+
+        # Apply filtering if requested
+        if settings["unique_hits_only"]:
+            filtered_df = merged_df[merged_df["NumberOfHits"] == 1].copy()
+            task.log(f"Filtered for unique hits: {len(filtered_df)} rows remaining")
+        else:
+            filtered_df = merged_df.copy()
+            task.log("No filtering applied - keeping all results")
+
+        # Remove duplicate ProbeName column
+        if "ProbeName" in filtered_df.columns:
+            filtered_df.drop(columns=["ProbeName"], inplace=True)
+
+        # Save results
+        task.check_cancelled()
+        output_dir = settings["output_dir"]
+
+        # Save BLAST (or reference search) results
+        if settings["reference_path"]:
+            blast_output = os.path.join(output_dir, "specificity_results.csv")
+        else:
             blast_output = os.path.join(output_dir, "blast_results.csv")
-            blast_df.to_csv(blast_output, index=False)
-            self.log_message(f"BLAST results saved to: {blast_output}")
-
-            # Save merged results
-            if self.unique_hits_only.get():
-                merged_output = os.path.join(
-                    output_dir, "merged_results_unique_hits.csv"
-                )
-            else:
-                merged_output = os.path.join(output_dir, "merged_results_all.csv")
-            filtered_df.to_csv(merged_output, index=False)
-            self.log_message(f"Merged results saved to: {merged_output}")
-
-            # Generate summary
-            self.log_message("\n=== ANALYSIS SUMMARY ===")
-            self.log_message(f"Total probes processed: {len(blast_df)}")
-            self.log_message(
-                f"Probes with unique hits: {len(blast_df[blast_df['NumberOfHits'] == 1])}"
-            )
-            self.log_message(
-                f"Probes with multiple hits: {len(blast_df[blast_df['NumberOfHits'] > 1])}"
-            )
-            self.log_message(
-                f"Probes with no hits: {len(blast_df[blast_df['NumberOfHits'] == 0])}"
-            )
-
-            # Hit count distribution
-            self.log_message("\n=== HIT COUNT DISTRIBUTION ===")
-            hit_counts = blast_df["NumberOfHits"].value_counts().sort_index()
-            for hits, count in hit_counts.items():
-                self.log_message(f"Probes with {hits} hit(s): {count}")
+        blast_df.to_csv(blast_output, index=False)
+        task.log(f"Hit table saved to: {blast_output}")
+
+        # Save merged results
+        if settings["unique_hits_only"]:
+            merged_output = os.path.join(output_dir, "merged_results_unique_hits.csv")
+        else:
+            merged_output = os.path.join(output_dir, "merged_results_all.csv")
+        filtered_df.to_csv(merged_output, index=False)
+        task.log(f"Merged results saved to: {merged_output}")
+
+        # Generate summary
+        task.log("\n=== ANALYSIS SUMMARY ===")
+        task.log(f"Total probes processed: {len(blast_df)}")
+        task.log(
+            f"Probes with unique hits: {len(blast_df[blast_df['NumberOfHits'] == 1])}"
+        )
+        task.log(
+            f"Probes with multiple hits: {len(blast_df[blast_df['NumberOfHits'] > 1])}"
+        )
+        task.log(f"Probes with no hits: {len(blast_df[blast_df['NumberOfHits'] == 0])}")
+
+        # Hit count distribution
+        task.log("\n=== HIT COUNT DISTRIBUTION ===")
+        hit_counts = blast_df["NumberOfHits"].value_counts().sort_index()
+        for hits, count in hit_counts.items():
+            task.log(f"Probes with {hits} hit(s): {count}")
+
+        return (
+            blast_output,
+            merged_output,
+            combined_df,
+            settings["csv_versions"],
+            index,
+            settings["reference_path"],
+        )
 
-            self.progress.stop()
-            self.analyze_btn.config(state="normal")
-
-            messagebox.showinfo(
-                "Analysis Complete",
-                f"Analysis completed successfully!\n\n"
-                f"Results saved to:\n"
-                f"• {os.path.basename(blast_output)}\n"
-                f"• {os.path.basename(merged_output)}",
-            )
+    def search_reference_worker(self, task, combined_df, settings):
+        """NumberOfHits/UniqueHitName table from the built-in reference search"""
+        probes = combined_df.drop_duplicates(settings["probe_col"])
+        names = list(probes[settings["probe_col"]])
+        sequences = [str(seq) for seq in probes[settings["seq_col"]]]
+        max_mismatches = settings["max_mismatches"]
+
+        # The default 8-mer seed covers 2 mismatches in 26 nt probes; more
+        # mismatches or shorter probes need a shorter seed
+        seed = seed_for(
+            min(map(len, sequences), default=MAX_PROBE_LENGTH), max_mismatches
+        )
+        index = settings["index"]
+        if index is None or index.seed != seed:
+            task.log(f"Indexing reference transcriptome (seed {seed})...")
+            index = SpecificityIndex.from_fasta([settings["reference_path"]], seed)
+            task.log(f"  - {len(index.names)} reference sequences")
+        task.check_cancelled()
+
+        task.log(f"Searching {len(names)} probes (<= {max_mismatches} mismatches)...")
+        blast_df = specificity_table(names, sequences, index, max_mismatches)
+        return blast_df, index
+
+    def analysis_done(self, outputs):
+        blast_output, merged_output, combined_df, csv_versions, index, reference = (
+            outputs
+        )
+        # Keep the loaded files and reference index for the next run
+        self.combined_df = combined_df
+        self.combined_files = csv_versions
+        if index is not None:
+            self.specificity_index = index
+            self.indexed_reference = reference
+        messagebox.showinfo(
+            "Analysis Complete",
+            f"Analysis completed successfully!\n\n"
+            f"Results saved to:\n"
+            f"• {os.path.basename(blast_output)}\n"
+            f"• {os.path.basename(merged_output)}",
+        )
 
-        except Exception as e:
-            self.progress.stop()
-            self.analyze_btn.config(state="normal")
-            error_msg = f"Error during analysis: {str(e)}"
-            self.log_message(error_msg)
-            messagebox.showerror("Analysis Error", error_msg)
+    def analysis_failed(self, error):
+        error_msg = f"Error during analysis: {str(error)}"
+        self.log_message(error_msg)
+        messagebox.showerror("Analysis Error", error_msg)
 
 
 def main():
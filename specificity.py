@@ -0,0 +1,338 @@
+# specificity.py - mismatch-tolerant probe specificity against a reference
+import argparse
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from composition import encode_sequence, OTHER_CODE
+from sequence_utils import reverse_complement
+
+# Probes are verified as one 64-bit word (2 bits per base)
+MAX_PROBE_LENGTH = 32
+
+# Default seed: contiguous 8-mer, i.e. 26 nt probes with up to 2 mismatches
+DEFAULT_SEED = "11111111"
+DEFAULT_MAX_MISMATCHES = 2
+
+# Probes searched at a time, bounds the candidate arrays
+PROBE_CHUNK = 256
+
+# Reference positions keyed at a time while building the index
+_INDEX_BLOCK = 1 << 22
+
+# Columns of SmFISHBlastAnalyzerGUI.parse_blast_results
+HIT_COLUMNS = [
+    "ProbeName",
+    "ProbeSequence",
+    "PercentAlignment",
+    "NumberOfHits",
+    "UniqueHitName",
+    "Start",
+    "End",
+]
+
+_INVALID = np.iinfo(np.uint64).max
+# Base i of a word sits in bits 63-2i and 62-2i (first base most significant)
+_SHIFTS = (62 - 2 * np.arange(32)).astype(np.uint64)
+_EVEN_BITS = np.uint64(0x5555555555555555)
+_ALL_BITS = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def parse_seed(seed):
+    """Offsets of the care ("1") positions of a seed such as "11011011" """
+    if not seed or set(seed) - {"0", "1"} or seed[0] != "1" or seed[-1] != "1":
+        raise ValueError(f"Invalid seed '{seed}': use 0/1 and start/end with 1")
+    care = np.array([i for i, c in enumerate(seed) if c == "1"])
+    if len(care) > 31:
+        raise ValueError(f"Seed '{seed}' has more than 31 care positions")
+    return care
+
+
+def seed_for(probe_length, max_mismatches, seed=DEFAULT_SEED):
+    """
+    seed if its span fits max_mismatches + 1 times in probe_length nt, else
+    the longest contiguous seed that does (e.g. 6-mer for 26 nt and 3
+    mismatches: more candidates to verify, no hit missed)
+    """
+    span = probe_length // (max_mismatches + 1)
+    if len(seed) <= span:
+        return seed
+    if span < 1:
+        raise ValueError(
+            f"{probe_length} nt probes cannot be searched with {max_mismatches} "
+            "mismatches"
+        )
+    return "1" * span
+
+
+def _seed_keys(windows, care):
+    """2-bit keys of (..., span) code windows; _INVALID where a care base is N"""
+    cared = windows[..., care]
+    powers = 4 ** np.arange(len(care) - 1, -1, -1, dtype=np.uint64)
+    keys = (cared.astype(np.uint64) * powers).sum(axis=-1, dtype=np.uint64)
+    keys[(cared == OTHER_CODE).any(axis=-1)] = _INVALID
+    return keys
+
+
+def _pack(codes):
+    """(bases, N flags) words of (..., 32) code rows, N as base A plus a flag"""
+    bases = ((codes & 3).astype(np.uint64) << _SHIFTS).sum(axis=-1, dtype=np.uint64)
+    flags = ((codes == OTHER_CODE).astype(np.uint64) << _SHIFTS).sum(
+        axis=-1, dtype=np.uint64
+    )
+    return bases, flags
+
+
+def _window_words(words, starts):
+    """The 32 bases from each start as one word, read across word boundaries"""
+    i = starts >> 5
+    shift = (2 * (starts & 31)).astype(np.uint64)
+    # >> 1 then >> (63 - shift): no shift by 64 when the start is aligned
+    low = (words[i + 1] >> np.uint64(1)) >> (np.uint64(63) - shift)
+    return (words[i] << shift) | low
+
+
+def popcount(words):
+    """Set bits of each uint64"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    bits = np.unpackbits(words.view(np.uint8)).reshape(len(words), 64)
+    return bits.sum(axis=1)
+
+
+class SpecificityIndex:
+    """
+    Seed index and 2-bit packed copy of a reference transcriptome
+    Built once, then find_hits() reports every place where a probe or its
+    reverse complement matches with at most N mismatches (substitutions).
+    A probe is cut into N + 1 disjoint seed placements, one of which must
+    match exactly (pigeonhole), so no hit is missed; candidates are checked
+    with XOR/popcount on the packed words. Seeds may be spaced ("11011011"),
+    the span must then fit N + 1 times in the probe.
+    """
+
+    def __init__(self, names, sequences, seed=DEFAULT_SEED):
+        self.names = list(names)
+        self.seed = seed
+        self.care = parse_seed(seed)
+        self.span = len(seed)
+
+        # Records laid end to end, one N in between so no seed spans two
+        lengths = np.array([len(seq) for seq in sequences], dtype=np.int64)
+        self.starts = np.cumsum(lengths + 1) - lengths - 1
+        self.ends = self.starts + lengths
+        codes = encode_sequence("N".join(sequences))
+
+        nb_words = len(codes) // 32 + 2
+        padded = np.full(nb_words * 32, OTHER_CODE, dtype=np.uint8)
+        padded[: len(codes)] = codes
+        self.words, self.n_flags = _pack(padded.reshape(nb_words, 32))
+
+        keys, positions = [], []
+        position_type = np.min_scalar_type(max(len(codes), 1))
+        for block in range(0, max(len(codes) - self.span + 1, 0), _INDEX_BLOCK):
+            windows = sliding_window_view(
+                codes[block : block + _INDEX_BLOCK + self.span - 1], self.span
+            )
+            block_keys = _seed_keys(windows, self.care)
+            valid = np.flatnonzero(block_keys != _INVALID)
+            keys.append(block_keys[valid])
+            positions.append((valid + block).astype(position_type))
+        keys = np.concatenate(keys) if keys else np.zeros(0, dtype=np.uint64)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.positions = (
+            np.concatenate(positions)[order] if positions else np.zeros(0, np.int64)
+        )
+
+    @classmethod
+    def from_fasta(cls, paths, seed=DEFAULT_SEED):
+        """Index over the records of FASTA files, named by their headers"""
+        from Bio import SeqIO
+
+        from fasta_io import open_fasta
+
+        names, sequences = [], []
+        for path in paths:
+            with open_fasta(path) as handle:
+                for record in SeqIO.parse(handle, "fasta"):
+                    names.append(record.description)
+                    sequences.append(str(record.seq))
+        return cls(names, sequences, seed)
+
+    def _candidates(self, codes, lengths, max_mismatches):
+        """Unique (query, reference start) pairs sharing an exact seed"""
+        offsets = np.arange(max_mismatches + 1) * self.span
+        placements = offsets[:, None] + np.arange(self.span)
+        # (queries, placements) keys; placements past a probe's end are N
+        query_keys = _seed_keys(codes[:, placements], self.care)
+
+        lo = np.searchsorted(self.keys, query_keys.ravel(), side="left")
+        hi = np.searchsorted(self.keys, query_keys.ravel(), side="right")
+        counts = hi - lo
+        hit_idx = np.repeat(lo - np.cumsum(counts) + counts, counts)
+        hit_idx += np.arange(counts.sum())
+        query = np.repeat(np.arange(query_keys.size) // len(offsets), counts)
+        starts = self.positions[hit_idx].astype(np.int64) - np.repeat(
+            np.tile(offsets, len(codes)), counts
+        )
+
+        # Whole probe inside one record
+        record = np.searchsorted(self.starts, starts, side="right") - 1
+        inside = (starts >= 0) & (record >= 0)
+        inside &= starts + lengths[query] <= self.ends[np.maximum(record, 0)]
+        pairs = np.unique(query[inside] * (len(self.words) * 32) + starts[inside])
+        return pairs // (len(self.words) * 32), pairs % (len(self.words) * 32)
+
+    def find_hits(self, probes, max_mismatches=DEFAULT_MAX_MISMATCHES):
+        """
+        All hits of probes with at most max_mismatches mismatches
+        Returns a dict of arrays: probe (index in probes), record, start
+        (0-based in the record), strand (1: probe as given, -1: its reverse
+        complement) and mismatches, sorted by probe then best hit first.
+        """
+        lengths = np.array([len(p) for p in probes], dtype=np.int64)
+        if len(probes) and lengths.max() > MAX_PROBE_LENGTH:
+            raise ValueError(f"Probes longer than {MAX_PROBE_LENGTH} nt")
+        if len(probes) and lengths.min() < (max_mismatches + 1) * self.span:
+            raise ValueError(
+                f"Seed '{self.seed}' cannot guarantee {max_mismatches} mismatches "
+                f"for {lengths.min()} nt probes; build the index with a shorter seed"
+            )
+
+        columns = {name: [] for name in ("probe", "record", "start", "strand")}
+        columns["mismatches"] = []
+        for first in range(0, len(probes), PROBE_CHUNK):
+            chunk = [p.upper() for p in probes[first : first + PROBE_CHUNK]]
+            # Queries: the probes, then their reverse complements
+            queries = chunk + [reverse_complement(p) for p in chunk]
+            query_lengths = np.tile(lengths[first : first + len(chunk)], 2)
+            codes = np.full((len(queries), 32), OTHER_CODE, dtype=np.uint8)
+            filled = np.arange(32) < query_lengths[:, None]
+            codes[filled] = encode_sequence("".join(queries))
+            query_words, query_flags = _pack(codes)
+            query_masks = _ALL_BITS << (64 - 2 * query_lengths).astype(np.uint64)
+
+            query, starts = self._candidates(codes, query_lengths, max_mismatches)
+            # Bit-parallel check: a 2-bit base differs if either bit differs
+            diff = query_words[query] ^ _window_words(self.words, starts)
+            diff = ((diff | (diff >> np.uint64(1))) & _EVEN_BITS) | query_flags[query]
+            diff |= _window_words(self.n_flags, starts)
+            mismatches = popcount(diff & query_masks[query])
+
+            keep = mismatches <= max_mismatches
+            query, starts = query[keep], starts[keep]
+            record = np.searchsorted(self.starts, starts, side="right") - 1
+            columns["probe"].append(query % len(chunk) + first)
+            columns["record"].append(record)
+            columns["start"].append(starts - self.starts[record])
+            columns["strand"].append(np.where(query < len(chunk), 1, -1))
+            columns["mismatches"].append(mismatches[keep].astype(np.int64))
+
+        hits = {
+            name: np.concatenate(values) if values else np.zeros(0, dtype=np.int64)
+            for name, values in columns.items()
+        }
+        order = np.lexsort(
+            (hits["start"], hits["record"], hits["mismatches"], hits["probe"])
+        )
+        return {name: values[order] for name, values in hits.items()}
+
+
+def specificity_table(
+    names, probes, index, max_mismatches=DEFAULT_MAX_MISMATCHES, hits=None
+):
+    """
+    parse_blast_results-style table of probes against a SpecificityIndex
+    NumberOfHits counts the reference records hit (BLAST's alignment
+    sections), UniqueHitName is that record's name when there is exactly
+    one; PercentAlignment, Start and End describe the best hit.
+    """
+    import pandas as pd
+
+    if hits is None:
+        hits = index.find_hits(probes, max_mismatches)
+    nb_probes = len(probes)
+
+    # One hit section per (probe, record), like BLAST
+    sections = np.unique(np.stack((hits["probe"], hits["record"])), axis=1)
+    nb_hits = np.bincount(sections[0], minlength=nb_probes)
+    only_record = np.full(nb_probes, -1)
+    single = nb_hits[sections[0]] == 1
+    only_record[sections[0][single]] = sections[1][single]
+
+    # Hits are sorted best first within each probe
+    best = np.full(nb_probes, -1)
+    first = np.flatnonzero(np.diff(hits["probe"], prepend=-1) != 0)
+    best[hits["probe"][first]] = first
+
+    records = []
+    for i in range(nb_probes):
+        row = {"ProbeName": names[i], "ProbeSequence": probes[i]}
+        if best[i] >= 0:
+            j = best[i]
+            length = len(probes[i])
+            identity = round(100 * (length - hits["mismatches"][j]) / length)
+            row.update(
+                PercentAlignment=int(identity),
+                NumberOfHits=int(nb_hits[i]),
+                UniqueHitName=(
+                    index.names[only_record[i]] if only_record[i] >= 0 else None
+                ),
+                Start=int(hits["start"][j]) + 1,
+                End=int(hits["start"][j]) + length,
+            )
+        else:
+            row.update(
+                PercentAlignment=None,
+                NumberOfHits=0,
+                UniqueHitName=None,
+                Start=None,
+                End=None,
+            )
+        records.append(row)
+    return pd.DataFrame(records, columns=HIT_COLUMNS)
+
+
+def main():
+    from panel_check import find_filt_outputs, load_filt_outputs
+
+    parser = argparse.ArgumentParser(
+        description="Count reference transcripts each probe hits (BLAST replacement)"
+    )
+    parser.add_argument(
+        "inputs", nargs="+", help="Probes_*_FILT.txt files or directories"
+    )
+    parser.add_argument(
+        "--reference", nargs="+", required=True, help="Reference transcriptome FASTA"
+    )
+    parser.add_argument(
+        "--mismatches", type=int, default=DEFAULT_MAX_MISMATCHES, help="max mismatches"
+    )
+    parser.add_argument(
+        "--seed",
+        help=f"seed, e.g. 11011011 (default: {DEFAULT_SEED}, shortened if the "
+        "shortest probe needs it)",
+    )
+    parser.add_argument("--out", default="specificity_results.csv")
+    args = parser.parse_args()
+
+    probes_df = load_filt_outputs(find_filt_outputs(args.inputs))
+    sequences = [str(seq) for seq in probes_df["Seq"]]
+    seed = args.seed
+    if seed is None and sequences:
+        seed = seed_for(min(map(len, sequences)), args.mismatches)
+    index = SpecificityIndex.from_fasta(args.reference, seed or DEFAULT_SEED)
+    print(f"Indexed {len(index.names)} reference sequences (seed {index.seed})")
+
+    table = specificity_table(
+        list(probes_df["ProbesNames"]), sequences, index, args.mismatches
+    )
+    table.to_csv(args.out, index=False)
+    unique = int((table["NumberOfHits"] == 1).sum())
+    print(
+        f"{unique} of {len(table)} probes hit a single transcript, saved to: {args.out}"
+    )
+
+
+if __name__ == "__main__":
+    main()
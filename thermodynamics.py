@@ -1,11 +1,194 @@
 # thermodynamics.py
-import pandas as pd
+import functools
 import numpy as np
-from config import DG37_VALUES
+from numpy.lib.stride_tricks import sliding_window_view
+from config import DG37_VALUES, DEFAULT_SETTINGS, NN_PARAMETER_SETS
+from composition import (
+    SequenceComposition,
+    NB_CODES,
+    BASE_CODES,
+    OTHER_CODE,
+    encode_sequence,
+)
+
+KELVIN = 273.15
+
+
+def _dimer_table(values):
+    """Flat table indexed by SequenceComposition.dimer_index
+    (unknown dimers such as those containing N keep 0, like .get(dimer, 0))"""
+    table = np.zeros(NB_CODES * NB_CODES)
+    for dimer, value in values.items():
+        table[BASE_CODES[dimer[0]] * NB_CODES + BASE_CODES[dimer[1]]] = value
+    return table
+
+
+def _base_table(values):
+    """Flat table indexed by base code"""
+    table = np.zeros(NB_CODES)
+    for base, value in values.items():
+        table[BASE_CODES[base]] = value
+    return table
+
+
+class NearestNeighborModel:
+    """
+    Nearest-neighbour parameter set compiled for one salt/temperature
+    Window dG = sum of dimer dG + terminal terms of both ends + a constant,
+    all precomputed as NumPy tables so scoring is pure table lookups.
+    """
+
+    def __init__(self, name, salt_conc=0.115, temperature=37.0):
+        if name not in NN_PARAMETER_SETS:
+            raise ValueError(
+                f"Unknown thermodynamic model '{name}'. "
+                f"Available: {', '.join(NN_PARAMETER_SETS)}"
+            )
+        params = NN_PARAMETER_SETS[name]
+
+        self.name = name
+        self.salt_conc = salt_conc
+        self.temperature = temperature
+        self.terminal_table = None
+        # Enthalpy/entropy tables (None for dG37-only sets), used for Tm
+        self.dh_table = None
+        self.ds_table = None
+
+        if "dG37" in params:
+            # Free energies only defined at 37C
+            if temperature != 37.0:
+                raise ValueError(
+                    f"Model '{name}' only has dG37 parameters; "
+                    f"temperature must be 37.0 (got {temperature})"
+                )
+            self.dimer_table = _dimer_table(params["dG37"])
+            window_constant = 0.0
+        else:
+            # dG(T) = dH - T * dS, with SantaLucia's entropic salt correction
+            # (0.368 cal/K/mol per phosphate, i.e. per dimer)
+            temp_k = temperature + KELVIN
+            self.dh_table = _dimer_table(params["dH"])
+            self.ds_table = _dimer_table(params["dS"]) + 0.368 * np.log(salt_conc)
+            # Unknown dimers (N) contribute nothing, not just the salt term
+            self.ds_table[self.dh_table == 0] = 0.0
+            self.dimer_table = self.dh_table - temp_k * self.ds_table / 1000
+
+            self.terminal_dh = _base_table(params["terminal_dH"])
+            self.terminal_ds = _base_table(params["terminal_dS"])
+            self.terminal_table = self.terminal_dh - temp_k * self.terminal_ds / 1000
+            self.init_dh = params["init_dH"]
+            self.init_ds = params["init_dS"]
+            window_constant = self.init_dh - temp_k * self.init_ds / 1000
+
+        # Subtracted from every window dG
+        if params["salt_model"] == "oligostan":
+            # R: dG - ((log(SaltConc) * -0.175) - 0.2)
+            self.window_offset = (np.log(salt_conc) * -0.175) - 0.2
+        else:
+            # Salt is already folded into the dimer entropies
+            self.window_offset = -window_constant
+
+    def window_dg(self, composition, probe_length):
+        """dG of every probe_length window of a SequenceComposition"""
+        dg_values = self.dimer_table[composition.dimer_index]
+        if len(dg_values) < probe_length - 1:
+            return np.zeros(0)
+
+        # Rolling sum for probe_length-1 consecutive dimers
+        rolling_sum = sliding_window_view(dg_values, probe_length - 1).sum(axis=1)
+
+        if self.terminal_table is not None:
+            nb_windows = len(rolling_sum)
+            terminal = self.terminal_table[composition.codes]
+            rolling_sum = (
+                rolling_sum
+                + terminal[:nb_windows]
+                + terminal[probe_length - 1 : probe_length - 1 + nb_windows]
+            )
+
+        return rolling_sum - self.window_offset
+
+    @property
+    def key(self):
+        """(name, salt, temperature) this model was compiled for"""
+        return self.name, self.salt_conc, self.temperature
+
+    def batch_dg(self, sequences):
+        """
+        dG of each of N sequences of any lengths (e.g. imported probes)
+        The sequences are encoded once into a padded N x longest uint8 code
+        matrix; the filled cells are masked in from the concatenated codes.
+        Rows of one length are summed together over their own dimers, so
+        each dG is bit-identical to window_dg of that sequence (NaN if empty).
+        """
+        lengths = np.fromiter(map(len, sequences), dtype=np.int64)
+        dg = np.full(len(lengths), np.nan)
+        if not len(lengths) or lengths.max() == 0:
+            return dg
+
+        codes = np.full((len(lengths), lengths.max()), OTHER_CODE, dtype=np.uint8)
+        filled = np.arange(lengths.max()) < lengths[:, None]
+        codes[filled] = encode_sequence("".join(sequences))
+        dimer_dg = self.dimer_table[codes[:, :-1] * NB_CODES + codes[:, 1:]]
+
+        for length in np.unique(lengths[lengths > 0]):
+            rows = np.flatnonzero(lengths == length)
+            rows_dg = dimer_dg[rows, : length - 1].sum(axis=1)
+            if self.terminal_table is not None:
+                rows_dg = (
+                    rows_dg
+                    + self.terminal_table[codes[rows, 0]]
+                    + self.terminal_table[codes[rows, length - 1]]
+                )
+            dg[rows] = rows_dg - self.window_offset
+        return dg
+
+    def duplex_tm(self, seq, oligo_conc=2.5e-7):
+        """Two-state melting temperature (C) of seq with its complement"""
+        if self.dh_table is None:
+            raise ValueError(f"Model '{self.name}' has no dH/dS parameters for Tm")
+
+        composition = SequenceComposition(seq)
+        if composition.length < 2:
+            return float("nan")
+        ends = composition.codes[[0, -1]]
+        dh = (
+            self.dh_table[composition.dimer_index].sum()
+            + self.terminal_dh[ends].sum()
+            + self.init_dh
+        )
+        ds = (
+            self.ds_table[composition.dimer_index].sum()
+            + self.terminal_ds[ends].sum()
+            + self.init_ds
+        )
+        # Tm = dH / (dS + R ln(Ct / 4)), non self-complementary duplex
+        return 1000 * dh / (ds + 1.9872 * np.log(oligo_conc / 4)) - KELVIN
+
+
+def get_thermo_model(name="sugimoto_rna_dna", salt_conc=0.115, temperature=37.0):
+    """Compiled NearestNeighborModel, cached per (name, salt, temperature)"""
+    return _compile_thermo_model(name, float(salt_conc), float(temperature))
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_thermo_model(name, salt_conc, temperature):
+    return NearestNeighborModel(name, salt_conc, temperature)
+
+
+def thermo_model_from_settings(**params):
+    """Thermodynamic model selected by a settings dict (e.g. DEFAULT_SETTINGS)"""
+    return get_thermo_model(
+        params.get("thermo_model", DEFAULT_SETTINGS["thermo_model"]),
+        params.get("salt_conc", DEFAULT_SETTINGS["salt_conc"]),
+        params.get("temperature", DEFAULT_SETTINGS["temperature"]),
+    )
 
 
 def convert_rna_seq_2_delta_g_at_37(rna_seq):
     """Exact translation of ConvertRNASeq2DeltaGat37"""
+    import pandas as pd
+
     rna_seq = rna_seq.upper()
     nb_base = len(rna_seq)
 
@@ -20,23 +203,32 @@ def convert_rna_seq_2_delta_g_at_37(rna_seq):
     return pd.DataFrame({"dim": dim, "dG": dg})
 
 
-def dg_calc_rna_37(rna_seq, probe_length=31, salt_conc=0.115):
-    """Exact translation of dGCalc.RNA.37"""
-    rna_seq_conv = convert_rna_seq_2_delta_g_at_37(rna_seq)
+def dg_calc_rna_37(
+    rna_seq, probe_length=31, salt_conc=0.115, composition=None, model=None
+):
+    """Exact translation of dGCalc.RNA.37
+
+    composition (optional): SequenceComposition of rna_seq, so the dimer
+    lookup is shared across probe lengths and with the filters.
+    model (optional): NearestNeighborModel from get_thermo_model; defaults to
+    the R script's Sugimoto RNA/DNA parameters at salt_conc.
+    """
+    if composition is None:
+        composition = SequenceComposition(rna_seq)
+    if model is None:
+        model = get_thermo_model("sugimoto_rna_dna", salt_conc)
 
-    # Rolling sum for probe_length-1 consecutive dimers
-    rolling_sum = []
-    dg_values = rna_seq_conv["dG"].values
+    return model.window_dg(composition, probe_length)
 
-    for i in range(len(dg_values) - probe_length + 2):
-        if i + probe_length - 1 <= len(dg_values):
-            window_sum = np.sum(dg_values[i : i + probe_length - 1])
-            rolling_sum.append(window_sum)
 
-    # Apply salt correction: dG - ((log(SaltConc) * -0.175) - 0.2)
-    all_dg = [dg - ((np.log(salt_conc) * -0.175) - 0.2) for dg in rolling_sum]
+def dg_calc_batch(sequences, salt_conc=0.115, model=None):
+    """dG of every sequence of a probe list in one call (see batch_dg)
 
-    return all_dg
+    model (optional): NearestNeighborModel, as for dg_calc_rna_37
+    """
+    if model is None:
+        model = get_thermo_model("sugimoto_rna_dna", salt_conc)
+    return model.batch_dg(sequences)
 
 
 def dg37_score_calc(the_dg37, desired_dg=-33):